@@ -0,0 +1,192 @@
+"""
+Local catalog of the Spotify albums seen in the search responses of the scraper, with an inverted index on the
+character trigrams and the tokens of the album names.
+
+Every search response contains albums (names, URIs and release dates) of many other movies than the one being
+searched. movie_music_data_spotify_scraper adds them all to the catalog and tries to resolve each movie against
+the catalog before searching Spotify, using the same rules as for the search responses (select_movie_album):
+the album name must contain the movie name, the album must be released before the cutoff, and the album
+release date closest to the movie release date wins. Since the catalog isn't ranked by a search engine, an
+album of the catalog must also contain one of the album suffixes or keywords, the suffixes being tried in the
+same order as the search tiers, and a movie without a release date is only resolved if a single album of the
+tier qualifies.
+
+Example:
+    album_catalog = AlbumCatalog.load(path)
+    movie_music_df, error_wikipedia_movie_IDs = movie_music_data_spotify_scraper(ids, names, dates, album_catalog)
+    print(album_catalog.report())
+    album_catalog.save(path)
+"""
+
+import os
+import pickle
+import re
+from spotify_scraper import MOVIE_ALBUM_SEARCH_TIERS, select_movie_album
+
+
+def name_trigrams(name):
+    """
+    Return the set of character trigrams of a (lowercased) name.
+    """
+    return {name[i:i + 3] for i in range(len(name) - 2)}
+
+
+def name_tokens(name):
+    """
+    Return the set of word tokens of a (lowercased) name.
+    """
+    return set(re.findall(r'\w+', name))
+
+
+class AlbumCatalog:
+    """
+    Catalog of albums with an inverted index from the trigrams and tokens of their names to their IDs.
+    """
+
+    def __init__(self):
+        self.albums = []
+        self.album_ids = {}
+        self.trigram_index = {}
+        self.token_index = {}
+
+        #Statistics of the lookups (movies resolved against the catalog) and of the Spotify searches
+        self.lookups = 0
+        self.hits = 0
+        self.search_calls = 0
+
+    def __len__(self):
+        return len(self.albums)
+
+    def add(self, movie_album_results):
+        """
+        Add the albums of a Spotify search response to the catalog (albums already in the catalog are skipped).
+
+        Parameters:
+        - movie_album_results (list of dicts): The albums, with their 'name', 'release_date' and 'uri'.
+        """
+        for movie_album in movie_album_results:
+            if movie_album['uri'] in self.album_ids:
+                continue
+
+            album_id = len(self.albums)
+            self.album_ids[movie_album['uri']] = album_id
+            self.albums.append({'name': movie_album['name'], 'release_date': movie_album['release_date'], 'uri': movie_album['uri']})
+
+            album_name = movie_album['name'].lower()
+            for trigram in name_trigrams(album_name):
+                self.trigram_index.setdefault(trigram, set()).add(album_id)
+            for token in name_tokens(album_name):
+                self.token_index.setdefault(token, set()).add(album_id)
+
+    def candidates(self, movie_name):
+        """
+        Return the albums of the catalog whose names may contain the movie name.
+
+        The trigrams of the movie name must all be trigrams of the album name (the names are then checked by
+        select_movie_album). Movie names shorter than 3 characters fall back to their tokens.
+
+        Parameters:
+        - movie_name (str): The name of the movie.
+
+        Returns:
+        - List of dicts: The candidate albums.
+        """
+        movie_name_lowercased = movie_name.lower()
+        keys, index = name_trigrams(movie_name_lowercased), self.trigram_index
+        if not keys:
+            keys, index = name_tokens(movie_name_lowercased), self.token_index
+        if not keys:
+            return []
+
+        #Intersect the posting lists, starting with the shortest one
+        postings = sorted((index.get(key, set()) for key in keys), key=len)
+        album_ids = set(postings[0])
+        for posting in postings[1:]:
+            album_ids &= posting
+            if not album_ids:
+                break
+
+        return [self.albums[album_id] for album_id in sorted(album_ids)]
+
+    def resolve(self, movie_name, movie_release_date, release_date_cutoff):
+        """
+        Try to resolve a movie to an album of the catalog, with the rules of the Spotify search tiers.
+
+        Parameters:
+        - movie_name (str): The name of the movie.
+        - movie_release_date (datetime or NaN): The release date (year) of the movie.
+        - release_date_cutoff (datetime): Albums released after this date are not selected.
+
+        Returns:
+        - str or NaN: The URI of the movie album, or NaN if the catalog doesn't contain it.
+        """
+        self.lookups += 1
+        movie_album_URI = float('nan')
+
+        candidate_albums = self.candidates(movie_name)
+
+        if candidate_albums:
+            for movie_name_suffix, check_keywords in MOVIE_ALBUM_SEARCH_TIERS:
+                tier_albums = [movie_album for movie_album in candidate_albums if movie_name_suffix.lower() in movie_album['name'].lower()]
+                try:
+                    #Keep only the albums which pass the name, keyword and cutoff checks on their own
+                    tier_albums = [movie_album for movie_album in tier_albums
+                                   if select_movie_album([movie_album], movie_name, movie_release_date, release_date_cutoff, check_keywords=True) == movie_album['uri']]
+                except re.error:
+                    #Movie names which aren't valid regular expressions are left to the Spotify search
+                    break
+
+                #Without a release date, the albums of the catalog can't be told apart (they aren't ranked for this movie),
+                #so an ambiguous match is a miss, left to the Spotify search
+                if movie_release_date != movie_release_date and len(tier_albums) > 1:
+                    break
+
+                movie_album_URI = select_movie_album(tier_albums, movie_name, movie_release_date, release_date_cutoff, check_keywords=True)
+                if movie_album_URI == movie_album_URI:
+                    self.hits += 1
+                    break
+
+        return movie_album_URI
+
+    def record_search(self):
+        """
+        Record a call of the Spotify search.
+        """
+        self.search_calls += 1
+
+    def report(self):
+        """
+        Return the statistics of the catalog.
+
+        Returns:
+        - Dict: The number of albums, of lookups and of hits, the hit rate, the number of Spotify searches and the searches per movie.
+        """
+        return {'albums': len(self.albums),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': self.hits / self.lookups if self.lookups else float('nan'),
+                'search_calls': self.search_calls,
+                'search_calls_per_movie': self.search_calls / self.lookups if self.lookups else float('nan')}
+
+    def save(self, path):
+        """
+        Save the catalog (with its statistics) to a pickle file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a catalog saved with save, or return an empty catalog if the file doesn't exist.
+        """
+        if not os.path.exists(path):
+            return cls()
+
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,107 @@
+import hashlib
+import os
+import pickle
+import numpy as np
+import pandas as pd
+
+
+def dataframe_fingerprint(df):
+    """
+    Compute a fingerprint of the content of a DataFrame (or Series).
+
+    Object columns (e.g. the Album_Genres lists) are hashed through their string representation.
+
+    Parameters:
+    - df (DataFrame or Series): The data to fingerprint.
+
+    Returns:
+    - str: A hex digest which changes whenever the columns, the index or any value of df changes.
+    """
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+
+    hasher = hashlib.sha256()
+    hasher.update(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode())
+    hasher.update(pd.util.hash_pandas_object(df.index).values.tobytes())
+
+    for column in df.columns:
+        values = df[column]
+        if values.dtype == object:
+            values = values.astype(str)
+        hasher.update(pd.util.hash_pandas_object(values, index=False).values.tobytes())
+
+    return hasher.hexdigest()
+
+
+def hash_values(*values):
+    """
+    Compute a hash of a set of values, e.g. the inputs and parameters of a cached computation.
+
+    Parameters:
+    - *values: DataFrames, Series, NumPy arrays or any values with a deterministic repr (strings, numbers, lists, dicts, ...).
+
+    Returns:
+    - str: A hex digest of the values.
+    """
+    hasher = hashlib.sha256()
+
+    for value in values:
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            hasher.update(dataframe_fingerprint(value).encode())
+        elif isinstance(value, np.ndarray):
+            hasher.update(repr((value.dtype.str, value.shape)).encode())
+            hasher.update(np.ascontiguousarray(value).tobytes())
+        else:
+            hasher.update(repr(value).encode())
+        # Separator so that ('ab', 'c') and ('a', 'bc') hash differently
+        hasher.update(b'\0')
+
+    return hasher.hexdigest()
+
+
+def load_cache(path, key):
+    """
+    Load a value cached with save_cache.
+
+    Parameters:
+    - path (str): The path of the cache file.
+    - key (str): The key (e.g. from hash_values) the value must have been cached with.
+
+    Returns:
+    - The cached value, or None if there is no (readable) cache file or if it was cached with another key.
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, 'rb') as f:
+            cached = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+    if not isinstance(cached, dict) or cached.get('key') != key:
+        return None
+
+    return cached['value']
+
+
+def save_cache(path, key, value):
+    """
+    Cache a value on disk together with its key.
+
+    The file is written to a temporary file first and then moved in place, so that concurrent
+    readers never see a partially written cache.
+
+    Parameters:
+    - path (str): The path of the cache file.
+    - key (str): The key (e.g. from hash_values) of the value.
+    - value: The (picklable) value to cache.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump({'key': key, 'value': value}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
@@ -0,0 +1,174 @@
+"""
+Grid of augmented Engle-Granger cointegration tests between the yearly series of the music features and of the
+plot emotions, for every (country, genre, feature, emotion) combination.
+
+The yearly series are built once for the whole grid, the tests run in a process pool, and the result of every
+test is memoized on disk under a hash of its two series and parameters: extending the grid (e.g. with another
+country or emotion) only runs the tests of the new cells.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from cache_helpers import hash_values, load_cache, save_cache
+from config import MAIN_DATA_PATH
+from emotion_inference import EMOTIONS
+from movie_music_aggregation import label_list
+
+DEFAULT_CACHE_DIR = os.path.join(MAIN_DATA_PATH, 'cache', 'cointegration')
+
+
+def top_genres_by_country(movie_df, countries, country_col='Movie_Countries', genre_col='Movie_Genres', n_top=5):
+    """
+    Find the most frequent genres of the movies of each country.
+
+    Parameters:
+    - movie_df (DataFrame): One row per movie.
+    - countries (list of str): The countries.
+    - country_col (str, optional): The (multi-valued) country column. Default is 'Movie_Countries'.
+    - genre_col (str, optional): The (multi-valued) genre column. Default is 'Movie_Genres'.
+    - n_top (int, optional): The number of genres per country. Default is 5.
+
+    Returns:
+    - Dict: Maps each country to the list of its n_top most frequent genres.
+    """
+    movie_countries = movie_df[country_col].map(label_list)
+    movie_genres = movie_df[genre_col].map(label_list)
+
+    top_genres = {}
+    for country in countries:
+        in_country = movie_countries.map(lambda labels: country in labels)
+        top_genres[country] = movie_genres[in_country].explode().value_counts().head(n_top).index.tolist()
+
+    return top_genres
+
+
+def build_yearly_series(movie_df, genres_by_country, columns, year='Movie_Release_Year', country_col='Movie_Countries', genre_col='Movie_Genres'):
+    """
+    Build the yearly mean series of several columns for each (country, genre).
+
+    Parameters:
+    - movie_df (DataFrame): One row per movie with the release year, the countries, the genres and the columns.
+    - genres_by_country (dict): Maps each country to the list of its genres (e.g. from top_genres_by_country).
+    - columns (list of str): The columns to average per year (music features and emotions).
+    - year (str, optional): The release year column. Default is 'Movie_Release_Year'.
+    - country_col (str, optional): The (multi-valued) country column. Default is 'Movie_Countries'.
+    - genre_col (str, optional): The (multi-valued) genre column. Default is 'Movie_Genres'.
+
+    Returns:
+    - Dict: Maps (country, genre, column) to the Series of the yearly means of the column (indexed by year).
+    """
+    movie_countries = movie_df[country_col].map(label_list)
+    movie_genres = movie_df[genre_col].map(label_list)
+
+    yearly_series = {}
+    for country, genres in genres_by_country.items():
+        in_country = movie_countries.map(lambda labels: country in labels).to_numpy(bool)
+        for genre in genres:
+            in_genre = movie_genres.map(lambda labels: genre in labels).to_numpy(bool)
+            yearly_means = movie_df.loc[in_country & in_genre].groupby(year)[columns].mean().sort_index()
+            for column in columns:
+                yearly_series[(country, genre, column)] = yearly_means[column].dropna()
+
+    return yearly_series
+
+
+def cointegration_test(args):
+    """
+    Run the augmented Engle-Granger cointegration test between two yearly series (on their common years).
+
+    Parameters:
+    - args (tuple): (music series, emotion series, trend, autolag, min_years).
+
+    Returns:
+    - Dict: The number of common years, the test statistic and the p-value (NaN if there are fewer than min_years common years).
+    """
+    from statsmodels.tsa.stattools import coint
+
+    music_series, emotion_series, trend, autolag, min_years = args
+
+    common = pd.concat([music_series, emotion_series], axis=1, join='inner').dropna()
+
+    if len(common) < min_years:
+        return {'N_Years': len(common), 'Test_Statistic': np.nan, 'P_Value': np.nan}
+
+    test_statistic, p_value, _ = coint(common.iloc[:, 0], common.iloc[:, 1], trend=trend, autolag=autolag)
+
+    return {'N_Years': len(common), 'Test_Statistic': test_statistic, 'P_Value': p_value}
+
+
+def run_cointegration_grid(yearly_series, genres_by_country, features, emotions=EMOTIONS, trend='c', autolag='aic',
+                           min_years=10, alpha=0.05, correction='fdr_bh', cache_dir=DEFAULT_CACHE_DIR, n_jobs=None):
+    """
+    Run the cointegration test for every (country, genre, feature, emotion), reusing the memoized results.
+
+    Parameters:
+    - yearly_series (dict): The output of build_yearly_series (with the features and the emotions as columns).
+    - genres_by_country (dict): Maps each country to the list of its genres.
+    - features (list of str): The music feature columns.
+    - emotions (list of str, optional): The emotion columns. Default is EMOTIONS.
+    - trend (str, optional): The trend of the cointegrating regression (see statsmodels coint). Default is 'c'.
+    - autolag (str, optional): The lag selection of the unit root test (see statsmodels coint). Default is 'aic'.
+    - min_years (int, optional): The minimum number of common years for a test to run. Default is 10.
+    - alpha (float, optional): The significance level after correction. Default is 0.05.
+    - correction (str, optional): The multiple-testing correction (a method of statsmodels multipletests). Default is 'fdr_bh'.
+    - cache_dir (str, optional): The directory of the memoized results. Default is DEFAULT_CACHE_DIR (None disables the cache).
+    - n_jobs (int, optional): The number of worker processes. Default is None (number of CPUs); 1 runs in the current process.
+
+    Returns:
+    - DataFrame: One row per test with Country, Genre, Feature, Emotion, N_Years, Test_Statistic, P_Value, P_Value_Adjusted and Significant.
+    """
+    from statsmodels.stats.multitest import multipletests
+
+    cells = [(country, genre, feature, emotion)
+             for country, genres in genres_by_country.items()
+             for genre in genres
+             for feature in features
+             for emotion in emotions]
+
+    results = {}
+    missing_cells, missing_jobs, missing_keys = [], [], []
+
+    for cell in cells:
+        country, genre, feature, emotion = cell
+        job = (yearly_series[(country, genre, feature)], yearly_series[(country, genre, emotion)], trend, autolag, min_years)
+
+        key = hash_values(*job)
+        if cache_dir is not None:
+            cached = load_cache(os.path.join(cache_dir, key + '.pkl'), key)
+            if cached is not None:
+                results[cell] = cached
+                continue
+
+        missing_cells.append(cell)
+        missing_jobs.append(job)
+        missing_keys.append(key)
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(missing_jobs), 1))
+
+    if n_jobs <= 1:
+        missing_results = [cointegration_test(job) for job in missing_jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            missing_results = list(executor.map(cointegration_test, missing_jobs, chunksize=max(1, len(missing_jobs) // (4 * n_jobs))))
+
+    for cell, key, result in zip(missing_cells, missing_keys, missing_results):
+        results[cell] = result
+        if cache_dir is not None:
+            save_cache(os.path.join(cache_dir, key + '.pkl'), key, result)
+
+    results_df = pd.DataFrame([{'Country': cell[0], 'Genre': cell[1], 'Feature': cell[2], 'Emotion': cell[3], **results[cell]}
+                               for cell in cells],
+                              columns=['Country', 'Genre', 'Feature', 'Emotion', 'N_Years', 'Test_Statistic', 'P_Value'])
+
+    #Correct for multiple testing over all the tests which could be run
+    tested = results_df['P_Value'].notna().to_numpy()
+    results_df['P_Value_Adjusted'] = np.nan
+    results_df['Significant'] = False
+    if tested.any():
+        significant, p_values_adjusted, _, _ = multipletests(results_df.loc[tested, 'P_Value'], alpha=alpha, method=correction)
+        results_df.loc[tested, 'P_Value_Adjusted'] = p_values_adjusted
+        results_df.loc[tested, 'Significant'] = significant
+
+    return results_df
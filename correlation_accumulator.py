@@ -0,0 +1,235 @@
+"""
+Streaming Pearson correlations of the audio features, updated as movie_music_data_spotify_scraper emits the
+track rows.
+
+CorrelationAccumulator keeps the number of rows, the running means and the co-moment matrix of the features
+(Welford's algorithm), so that each row costs O(n_features^2) and the correlations and their p-values (the same
+as scipy.stats.pearsonr) can be read at any time. Accumulators of different shards or workers are combined with
+merge (Chan et al.'s parallel formulas). GroupedCorrelationAccumulator keeps one accumulator per group, e.g. per
+country or genre of the movie of each track.
+
+Only the rows where all the features are present are counted, so that all the correlations share the same rows.
+
+Example:
+    accumulator = GroupedCorrelationAccumulator(TRACK_FEATURES + ['Movie_Box_Office_Revenue'],
+                                                lambda row: movie_countries.get(row['Wikipedia_Movie_ID'], []))
+    def add_revenue(row):
+        accumulator.update_row({**row, 'Movie_Box_Office_Revenue': movie_revenues.get(row['Wikipedia_Movie_ID'])})
+    movie_music_df, error_wikipedia_movie_IDs = movie_music_data_spotify_scraper(ids, names, dates, row_callback=add_revenue)
+    accumulator.correlation_table('India')
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from movie_music_aggregation import TRACK_FEATURES
+
+
+class CorrelationAccumulator:
+    """
+    Running means and co-moments of a set of features.
+    """
+
+    def __init__(self, features=TRACK_FEATURES):
+        """
+        Parameters:
+        - features (list of str, optional): The features. Default is TRACK_FEATURES.
+        """
+        self.features = list(features)
+        self.n = 0
+        self.mean = np.zeros(len(self.features))
+        self.comoments = np.zeros((len(self.features), len(self.features)))
+
+    def row_values(self, row):
+        """
+        Return the feature values of a row (dict or Series) as an array, or None if any of them is missing.
+        """
+        values = np.array([row.get(feature, np.nan) for feature in self.features], dtype=np.float64)
+
+        return None if np.isnan(values).any() else values
+
+    def update_row(self, row):
+        """
+        Add a row (e.g. a track dict emitted by the scraper).
+
+        Parameters:
+        - row (dict or Series): The row, with the features as keys.
+        """
+        values = self.row_values(row)
+        if values is None:
+            return
+
+        self.n += 1
+        delta = values - self.mean
+        self.mean += delta / self.n
+        self.comoments += np.outer(delta, values - self.mean)
+
+    def update(self, df):
+        """
+        Add the rows of a DataFrame (e.g. a chunk of scraped tracks), merging their statistics at once.
+
+        Parameters:
+        - df (DataFrame): The rows, with the feature columns.
+        """
+        values = df[self.features].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values).any(axis=1)]
+        if len(values) == 0:
+            return
+
+        chunk = CorrelationAccumulator(self.features)
+        chunk.n = len(values)
+        chunk.mean = values.mean(axis=0)
+        centered = values - chunk.mean
+        chunk.comoments = centered.T @ centered
+
+        self.merge(chunk)
+
+    def merge(self, other):
+        """
+        Add the statistics of another accumulator of the same features (e.g. of another shard or worker).
+
+        Parameters:
+        - other (CorrelationAccumulator): The other accumulator.
+        """
+        if other.features != self.features:
+            raise ValueError('The accumulators must have the same features')
+        if other.n == 0:
+            return
+
+        n = self.n + other.n
+        delta = other.mean - self.mean
+
+        self.comoments = self.comoments + other.comoments + np.outer(delta, delta) * self.n * other.n / n
+        self.mean = self.mean + delta * other.n / n
+        self.n = n
+
+    def covariance(self):
+        """
+        Return the (sample) covariance matrix of the features.
+        """
+        covariance = self.comoments / (self.n - 1) if self.n > 1 else np.full_like(self.comoments, np.nan)
+
+        return pd.DataFrame(covariance, index=self.features, columns=self.features)
+
+    def correlation(self):
+        """
+        Return the Pearson correlation matrix of the features (NaN for constant features).
+        """
+        std = np.sqrt(np.diag(self.comoments))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            correlation = np.clip(self.comoments / np.outer(std, std), -1, 1)
+
+        return pd.DataFrame(correlation, index=self.features, columns=self.features)
+
+    def pvalues(self):
+        """
+        Return the two-sided p-values of the correlations (t-test with n - 2 degrees of freedom, as scipy.stats.pearsonr).
+        """
+        correlation = self.correlation().to_numpy()
+
+        if self.n <= 2:
+            pvalues = np.full_like(correlation, np.nan)
+        else:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                t = correlation * np.sqrt((self.n - 2) / (1 - correlation ** 2))
+            pvalues = 2 * stats.t.sf(np.abs(t), self.n - 2)
+
+        return pd.DataFrame(pvalues, index=self.features, columns=self.features)
+
+    def correlation_table(self):
+        """
+        Return the correlation and p-value of each pair of features.
+
+        Returns:
+        - DataFrame: The Feature_1, Feature_2, Correlation, P_Value and N of each pair, by decreasing absolute correlation.
+        """
+        rows, columns = np.triu_indices(len(self.features), k=1)
+        correlation, pvalues = self.correlation().to_numpy(), self.pvalues().to_numpy()
+
+        table = pd.DataFrame({'Feature_1': [self.features[i] for i in rows],
+                              'Feature_2': [self.features[j] for j in columns],
+                              'Correlation': correlation[rows, columns],
+                              'P_Value': pvalues[rows, columns],
+                              'N': self.n})
+
+        return table.reindex(table['Correlation'].abs().sort_values(ascending=False).index).reset_index(drop=True)
+
+
+class GroupedCorrelationAccumulator:
+    """
+    One CorrelationAccumulator per group (e.g. country or genre), plus one of all the rows.
+    """
+
+    ALL = 'All'
+
+    def __init__(self, features=TRACK_FEATURES, group_function=None):
+        """
+        Parameters:
+        - features (list of str, optional): The features. Default is TRACK_FEATURES.
+        - group_function (callable, optional): Maps a row to the list of its groups (e.g. the countries of the movie of a track). Default is None (no groups).
+        """
+        self.features = list(features)
+        self.group_function = group_function
+        self.accumulators = {self.ALL: CorrelationAccumulator(self.features)}
+
+    def accumulator(self, group):
+        """
+        Return the accumulator of a group (created if needed).
+        """
+        if group not in self.accumulators:
+            self.accumulators[group] = CorrelationAccumulator(self.features)
+
+        return self.accumulators[group]
+
+    def update_row(self, row):
+        """
+        Add a row to the accumulator of all the rows and to the accumulators of its groups.
+        """
+        self.accumulators[self.ALL].update_row(row)
+
+        if self.group_function is not None:
+            for group in set(self.group_function(row)):
+                self.accumulator(group).update_row(row)
+
+    def update(self, df):
+        """
+        Add the rows of a DataFrame (e.g. a chunk of scraped tracks): the chunk is split by group and the
+        statistics of each group are merged at once.
+
+        Parameters:
+        - df (DataFrame): The rows, with the feature columns and the columns used by group_function.
+        """
+        self.accumulators[self.ALL].update(df)
+
+        if self.group_function is None:
+            return
+
+        group_rows = {}
+        for position, row in enumerate(df.to_dict('records')):
+            for group in set(self.group_function(row)):
+                group_rows.setdefault(group, []).append(position)
+
+        for group, positions in group_rows.items():
+            self.accumulator(group).update(df.iloc[positions])
+
+    def merge(self, other):
+        """
+        Add the statistics of another grouped accumulator of the same features (e.g. of another shard or worker).
+        """
+        for group, accumulator in other.accumulators.items():
+            self.accumulator(group).merge(accumulator)
+
+    def group_sizes(self):
+        """
+        Return the number of rows of each group, in decreasing order.
+        """
+        return pd.Series({group: accumulator.n for group, accumulator in self.accumulators.items()}).sort_values(ascending=False)
+
+    def correlation(self, group=ALL):
+        return self.accumulators[group].correlation()
+
+    def pvalues(self, group=ALL):
+        return self.accumulators[group].pvalues()
+
+    def correlation_table(self, group=ALL):
+        return self.accumulators[group].correlation_table()
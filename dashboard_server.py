@@ -0,0 +1,299 @@
+"""
+Local dashboard serving Plotly figures of the movie/music data, generated on request from the cached feature
+cube (feature_cube.py) of the movie-level table.
+
+The cube of the (Country, Genre, Year) sufficient statistics is built once from the movie_music_metadata table
+of the dataset pipeline and cached on disk. Each request of a figure only sums cells of the cube and returns
+the JSON of that figure, and repeated requests are answered from an LRU cache.
+
+Endpoints:
+    /                   Page with the filters (feature, country, genre, year range, rolling window) and the figure
+    /plotly.min.js      The plotly.js bundle of the installed plotly package (the dashboard needs no network access)
+    /options            JSON of the available features, countries, genres and years
+    /figure             JSON of a figure, e.g. /figure?kind=yearly&feature=Track_Energy_Mean&country=India&genre=Drama&year_min=1950&year_max=2010&window=5
+                        kind is 'yearly' (yearly mean and standard deviation), 'genres' or 'countries' (mean of the top labels)
+
+Every movie is counted once in each figure: a country or genre filter selects the movies having that label, and
+the bars of the genres (or countries) count each movie once per bar.
+
+Usage:
+    python dashboard_server.py --port 8050
+"""
+
+import argparse
+import functools
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import numpy as np
+import plotly.graph_objects as go
+from plotly.offline import get_plotlyjs
+from cache_helpers import hash_values, load_cache, save_cache
+from config import MAIN_DATA_PATH
+from feature_cube import ALL, FeatureCube
+from movie_music_aggregation import TRACK_FEATURES
+
+#Version of the dashboard cube, to be bumped whenever its content changes so that older caches are rebuilt
+DASHBOARD_CUBE_VERSION = 2
+
+DEFAULT_CACHE_PATH = os.path.join(MAIN_DATA_PATH, 'cache', 'dashboard_cube.pkl')
+
+#Movie-level features of the cube
+DASHBOARD_FEATURES = [feature + '_Mean' for feature in TRACK_FEATURES] + ['Movie_Box_Office_Revenue', 'Movie_Box_Office_Revenue_Adjusted']
+
+FIGURE_KINDS = ['yearly', 'genres', 'countries']
+
+INDEX_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Movie music dashboard</title>
+<script src="/plotly.min.js"></script>
+<style>body {font-family: sans-serif; margin: 20px;} label {margin-right: 12px;} </style>
+</head>
+<body>
+<div>
+<label>Figure <select id="kind"><option value="yearly">Yearly series</option><option value="genres">Top genres</option><option value="countries">Top countries</option></select></label>
+<label>Feature <select id="feature"></select></label>
+<label>Years <input id="year_min" type="number" size="5"> - <input id="year_max" type="number" size="5"></label>
+<label>Rolling window <input id="window" type="number" min="1" size="3"></label>
+</div>
+<div>
+<label>Country <select id="country"><option value="">All</option></select></label>
+<label>Genre <select id="genre"><option value="">All</option></select></label>
+</div>
+<div id="figure" style="height: 600px;"></div>
+<script>
+function fill(id, values) {
+  const select = document.getElementById(id);
+  for (const value of values) { select.add(new Option(value, value)); }
+}
+function query() {
+  const params = new URLSearchParams();
+  for (const id of ['kind', 'feature', 'country', 'genre', 'year_min', 'year_max', 'window']) {
+    const value = document.getElementById(id).value;
+    if (value) { params.append(id, value); }
+  }
+  return params.toString();
+}
+async function update() {
+  const response = await fetch('/figure?' + query());
+  const figure = await response.json();
+  Plotly.react('figure', figure.data, figure.layout);
+}
+fetch('/options').then(response => response.json()).then(options => {
+  fill('feature', options.features);
+  fill('country', options.countries);
+  fill('genre', options.genres);
+  document.getElementById('year_min').value = options.years[0];
+  document.getElementById('year_max').value = options.years[1];
+  for (const element of document.querySelectorAll('select, input')) { element.addEventListener('change', update); }
+  update();
+});
+</script>
+</body>
+</html>
+"""
+
+
+def load_dashboard_cube(movie_df, features=DASHBOARD_FEATURES, cache_path=DEFAULT_CACHE_PATH):
+    """
+    Return the feature cube of a movie-level table, from the disk cache if the table hasn't changed.
+
+    Parameters:
+    - movie_df (DataFrame): One row per movie, with Movie_Release_Year, Movie_Countries, Movie_Genres and the features (e.g. the movie_music_metadata table of dataset_pipeline.py).
+    - features (list of str, optional): The features of the cube (missing columns are skipped). Default is DASHBOARD_FEATURES.
+    - cache_path (str, optional): The path of the cache file. Default is DEFAULT_CACHE_PATH.
+
+    Returns:
+    - FeatureCube: The cube.
+    """
+    features = [feature for feature in features if feature in movie_df.columns]
+    columns = ['Movie_Release_Year', 'Movie_Countries', 'Movie_Genres'] + features
+    key = hash_values(DASHBOARD_CUBE_VERSION, movie_df[columns], features)
+
+    cube = load_cache(cache_path, key)
+
+    if cube is None:
+        cube = FeatureCube(features)
+        cube.update(movie_df)
+        save_cache(cache_path, key, cube)
+
+    return cube
+
+
+class Dashboard:
+    """
+    Figures of a feature cube, with an LRU cache of their JSON.
+    """
+
+    def __init__(self, cube, n_top=10, cache_size=256):
+        """
+        Parameters:
+        - cube (FeatureCube): The feature cube.
+        - n_top (int, optional): The number of labels of the 'genres' and 'countries' figures. Default is 10.
+        - cache_size (int, optional): The number of figures kept in the LRU cache. Default is 256.
+        """
+        self.cube = cube
+        self.n_top = n_top
+        self.figure_json = functools.lru_cache(maxsize=cache_size)(self.build_figure_json)
+
+        index = cube.stats.index
+        self.options = {'features': cube.features,
+                        'countries': sorted(set(index.get_level_values('Country')) - {ALL}),
+                        'genres': sorted(set(index.get_level_values('Genre')) - {ALL}),
+                        'years': [int(index.get_level_values('Year').min()), int(index.get_level_values('Year').max())] if len(index) else [None, None],
+                        'kinds': FIGURE_KINDS}
+
+    @functools.cached_property
+    def plotly_js(self):
+        """
+        The plotly.js bundle of the installed plotly package.
+        """
+        return get_plotlyjs()
+
+    def build_figure_json(self, kind, feature, country=None, genre=None, years=None, window=None):
+        """
+        Build the JSON of a figure.
+
+        Parameters:
+        - kind (str): 'yearly', 'genres' or 'countries'.
+        - feature (str): The feature.
+        - country (str, optional): Only keep the movies of this country. Default is None (all the movies).
+        - genre (str, optional): Only keep the movies of this genre. Default is None (all the movies).
+        - years (tuple, optional): The (first, last) years (inclusive). Default is None (all).
+        - window (int, optional): The rolling window (in years) of the 'yearly' figure. Default is None.
+
+        Returns:
+        - str: The JSON of the Plotly figure.
+        """
+        if feature not in self.cube.features:
+            raise ValueError(f"Unknown feature {feature}")
+
+        if kind == 'yearly':
+            moments = self.cube.yearly_series(country, genre, years, window=window)
+            mean, std = moments[('Mean', feature)], moments[('Std', feature)].fillna(0)
+            years_axis = moments.index.to_numpy()
+
+            fig = go.Figure([go.Scatter(x=np.concatenate([years_axis, years_axis[::-1]]),
+                                        y=np.concatenate([(mean + std).to_numpy(), (mean - std).to_numpy()[::-1]]),
+                                        fill='toself', line={'width': 0}, opacity=0.3, hoverinfo='skip', name='Mean ± std'),
+                             go.Scatter(x=years_axis, y=mean.to_numpy(), mode='lines+markers', name='Mean',
+                                        customdata=moments[('Count', feature)].to_numpy(),
+                                        hovertemplate='%{x}: %{y:.3g} (%{customdata:.0f} movies)<extra></extra>')])
+            title = f"{feature} by year" + (f" ({window}-year rolling window)" if window else "")
+            xlabel = 'Year'
+        elif kind in ('genres', 'countries'):
+            level = 'Genre' if kind == 'genres' else 'Country'
+            moments = FeatureCube.moments(self.cube.rollup([level], country, genre, years))
+            moments = moments.sort_values(('Count', feature), ascending=False).head(self.n_top)
+
+            fig = go.Figure(go.Bar(x=moments.index.get_level_values(level).tolist(), y=moments[('Mean', feature)].to_numpy(),
+                                   error_y={'type': 'data', 'array': moments[('Std', feature)].fillna(0).to_numpy()},
+                                   customdata=moments[('Count', feature)].to_numpy(),
+                                   hovertemplate='%{x}: %{y:.3g} (%{customdata:.0f} movies)<extra></extra>'))
+            title = f"{feature} of the top {self.n_top} {kind}"
+            xlabel = level
+        else:
+            raise ValueError(f"Unknown figure kind {kind}")
+
+        fig.update_layout(title_text=title, xaxis_title=xlabel, yaxis_title=feature, showlegend=False)
+
+        return fig.to_json()
+
+    def query_figure_json(self, query):
+        """
+        Return the JSON of the figure of a query string (see the /figure endpoint).
+        """
+        params = parse_qs(query)
+
+        def first(name, default=None):
+            return params[name][0] if name in params else default
+
+        country = first('country')
+        genre = first('genre')
+        years = None
+        if 'year_min' in params or 'year_max' in params:
+            years = (int(first('year_min', self.options['years'][0])), int(first('year_max', self.options['years'][1])))
+        window = int(first('window')) if 'window' in params else None
+        if window is not None and window < 1:
+            raise ValueError(f"The rolling window must be at least 1 year, not {window}")
+
+        return self.figure_json(first('kind', 'yearly'), first('feature', self.cube.features[0]), country, genre, years, window)
+
+
+class DashboardRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the dashboard requests (the Dashboard is the dashboard attribute of the server).
+    """
+
+    def send_body(self, body, content_type, status=200):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+
+        try:
+            if url.path == '/':
+                self.send_body(INDEX_HTML, 'text/html; charset=utf-8')
+            elif url.path == '/plotly.min.js':
+                self.send_body(self.server.dashboard.plotly_js, 'application/javascript; charset=utf-8')
+            elif url.path == '/options':
+                self.send_body(json.dumps(self.server.dashboard.options), 'application/json')
+            elif url.path == '/figure':
+                self.send_body(self.server.dashboard.query_figure_json(url.query), 'application/json')
+            else:
+                self.send_body(json.dumps({'error': 'Not found'}), 'application/json', status=404)
+        except ValueError as error:
+            self.send_body(json.dumps({'error': str(error)}), 'application/json', status=400)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def serve(dashboard, host='127.0.0.1', port=8050, verbose=False):
+    """
+    Serve a dashboard until interrupted.
+
+    Parameters:
+    - dashboard (Dashboard): The dashboard.
+    - host (str, optional): The host to bind. Default is '127.0.0.1' (local only).
+    - port (int, optional): The port. Default is 8050.
+    - verbose (bool, optional): Whether to log every request. Default is False.
+    """
+    server = ThreadingHTTPServer((host, port), DashboardRequestHandler)
+    server.dashboard = dashboard
+    server.verbose = verbose
+
+    print(f"Dashboard running on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    from dataset_pipeline import build_analysis_pipeline
+
+    parser = argparse.ArgumentParser(description='Serve the movie music dashboard')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    pipeline = build_analysis_pipeline(os.path.join(MAIN_DATA_PATH, 'movie.metadata.tsv'),
+                                       os.path.join(MAIN_DATA_PATH, 'cpi.csv'),
+                                       os.path.join(MAIN_DATA_PATH, 'movie_music_df.csv'),
+                                       os.path.join(MAIN_DATA_PATH, 'Plot_Summaries_with_Emotions.csv'))
+    movie_music_metadata_df = pipeline.run(targets=['movie_music_metadata'])['movie_music_metadata']
+
+    serve(Dashboard(load_dashboard_cube(movie_music_metadata_df)), args.host, args.port, args.verbose)
@@ -0,0 +1,385 @@
+"""
+Memoized build of the analysis-ready tables, from the raw CMU Movie Summary Corpus files, the CPI table,
+the scraped Spotify data (movie_music_df) and the plot emotions.
+
+Each stage of the build declares its upstream stages, the raw files it reads and its parameters. A stage is
+only re-run when the hash of these (and of the source code of the module defining it, so that edits of the helpers
+it calls are seen too) changes; otherwise its result is loaded from the cache (Parquet for DataFrames if pyarrow
+is installed, with the list columns stored as Arrow lists, pickle otherwise). Stages which
+don't depend on each other run in parallel threads, and the time spent in every stage is printed.
+
+Usage:
+    python dataset_pipeline.py
+"""
+
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import numpy as np
+import pandas as pd
+from cache_helpers import hash_values
+from config import MAIN_DATA_PATH
+from movie_music_aggregation import MOVIE_ID, aggregate_movie_music, join_movie_music
+
+DEFAULT_CACHE_DIR = os.path.join(MAIN_DATA_PATH, 'cache', 'pipeline')
+
+
+def parquet_compatible(df):
+    """
+    Return whether the object columns of a DataFrame only hold strings or lists (e.g. Movie_Genres), which
+    Parquet stores as strings and Arrow lists and which are read back with the same types.
+    """
+    for column in df.columns[df.dtypes.eq(object)]:
+        values = df[column].dropna()
+        if not (values.map(lambda value: isinstance(value, str)).all() or values.map(lambda value: isinstance(value, list)).all()):
+            return False
+
+    return True
+
+
+class Stage:
+    """
+    A stage of a Pipeline: function(*upstream results, **params) -> result.
+    """
+
+    def __init__(self, name, function, inputs=(), files=(), params=None):
+        """
+        Parameters:
+        - name (str): The name of the stage.
+        - function (callable): Computes the result of the stage from the results of its inputs (in order) and its params.
+        - inputs (list of str, optional): The names of the upstream stages. Default is ().
+        - files (list of str, optional): The raw files read by the stage (their size and modification time are hashed). Default is ().
+        - params (dict, optional): The keyword arguments of function. Default is None.
+        """
+        self.name = name
+        self.function = function
+        self.inputs = list(inputs)
+        self.files = list(files)
+        self.params = dict(params or {})
+
+
+class Pipeline:
+    """
+    A DAG of memoized stages.
+
+    Example:
+        pipeline = Pipeline(cache_dir)
+        pipeline.add_stage('movie_metadata', load_movie_metadata, files=[path], params={'path': path})
+        pipeline.add_stage('movie_metadata_adjusted', adjust_revenue_for_inflation, inputs=['movie_metadata', 'cpi'])
+        results = pipeline.run()
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, verbose=True):
+        """
+        Parameters:
+        - cache_dir (str, optional): The directory of the cached results. Default is DEFAULT_CACHE_DIR.
+        - verbose (bool, optional): Whether to print the timing of every stage. Default is True.
+        """
+        self.cache_dir = cache_dir
+        self.verbose = verbose
+        self.stages = {}
+        self.timings = {}
+
+    def add_stage(self, name, function, inputs=(), files=(), params=None):
+        """
+        Declare a stage (see Stage). Its inputs must be declared before it.
+        """
+        for input_name in inputs:
+            if input_name not in self.stages:
+                raise ValueError(f"Stage {name!r} depends on the undeclared stage {input_name!r}")
+
+        self.stages[name] = Stage(name, function, inputs, files, params)
+
+    def stage_keys(self):
+        """
+        Compute the key of every stage from the source code of its module, its parameters, raw files and the keys of its inputs.
+
+        Returns:
+        - Dict: Maps every stage name to its key.
+        """
+        keys = {}
+
+        for name, stage in self.stages.items():
+            #The whole module is hashed, since the stage function may call helpers defined next to it
+            try:
+                source = inspect.getsource(inspect.getmodule(stage.function))
+            except (OSError, TypeError):
+                try:
+                    source = inspect.getsource(stage.function)
+                except (OSError, TypeError):
+                    source = repr(stage.function)
+
+            file_fingerprints = []
+            for path in stage.files:
+                file_stat = os.stat(path)
+                file_fingerprints.append((os.path.abspath(path), file_stat.st_size, file_stat.st_mtime_ns))
+
+            keys[name] = hash_values(name, source, sorted(stage.params.items()), file_fingerprints,
+                                     [keys[input_name] for input_name in stage.inputs])
+
+        return keys
+
+    def cache_path(self, name, key, extension):
+        return os.path.join(self.cache_dir, f"{name}-{key[:16]}{extension}")
+
+    def load_result(self, name, key):
+        """
+        Load the cached result of a stage, or return None if it isn't cached under key.
+        """
+        parquet_path = self.cache_path(name, key, '.parquet')
+        if os.path.exists(parquet_path):
+            result = pd.read_parquet(parquet_path)
+            #Parquet reads the list columns back as NumPy arrays
+            for column in result.columns[result.dtypes.eq(object)]:
+                result[column] = result[column].map(lambda value: value.tolist() if isinstance(value, np.ndarray) else value)
+            return result
+
+        pickle_path = self.cache_path(name, key, '.pkl')
+        if os.path.exists(pickle_path):
+            with open(pickle_path, 'rb') as f:
+                return pickle.load(f)
+
+        return None
+
+    def save_result(self, name, key, result):
+        """
+        Cache the result of a stage under key, and remove the results cached under older keys.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        for filename in os.listdir(self.cache_dir):
+            if filename.startswith(name + '-'):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+        if isinstance(result, pd.DataFrame) and importlib.util.find_spec('pyarrow') is not None and parquet_compatible(result):
+            path = self.cache_path(name, key, '.parquet')
+            try:
+                result.to_parquet(path + '.tmp')
+                os.replace(path + '.tmp', path)
+                return
+            except (ValueError, TypeError):
+                #Columns which Parquet can't store fall back to pickle
+                if os.path.exists(path + '.tmp'):
+                    os.remove(path + '.tmp')
+
+        path = self.cache_path(name, key, '.pkl')
+        with open(path + '.tmp', 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+
+    def run_stage(self, name, key, input_results):
+        """
+        Return the result of a stage, from the cache or by running it, and record its timing.
+        """
+        stage = self.stages[name]
+        start = time.perf_counter()
+
+        result = self.load_result(name, key)
+        cached = result is not None
+
+        if not cached:
+            result = stage.function(*input_results, **stage.params)
+            self.save_result(name, key, result)
+
+        self.timings[name] = (time.perf_counter() - start, cached)
+        if self.verbose:
+            print(f"[{name}] {'loaded from cache' if cached else 'ran'} in {self.timings[name][0]:.2f} s")
+
+        return result
+
+    def required_stages(self, targets):
+        """
+        Return the names of the targets and of all the stages they depend on.
+        """
+        required = set()
+        pending = list(targets)
+
+        while pending:
+            name = pending.pop()
+            if name not in required:
+                required.add(name)
+                pending.extend(self.stages[name].inputs)
+
+        return required
+
+    def run(self, targets=None, n_jobs=None):
+        """
+        Run (or load from the cache) the stages needed for the targets, running independent stages in parallel.
+
+        Parameters:
+        - targets (list of str, optional): The stages whose results are needed. Default is None (all the stages).
+        - n_jobs (int, optional): The number of stages run in parallel. Default is None (number of CPUs).
+
+        Returns:
+        - Dict: Maps the name of every stage which was needed to its result.
+        """
+        targets = list(self.stages) if targets is None else list(targets)
+        required = self.required_stages(targets)
+        keys = self.stage_keys()
+
+        results = {}
+        running = {}
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=n_jobs or os.cpu_count() or 1) as executor:
+            while len(results) < len(required):
+                #Start all the stages whose inputs are ready
+                for name in self.stages:
+                    if name in required and name not in results and name not in running.values() \
+                            and all(input_name in results for input_name in self.stages[name].inputs):
+                        input_results = [results[input_name] for input_name in self.stages[name].inputs]
+                        running[executor.submit(self.run_stage, name, keys[name], input_results)] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+
+        if self.verbose:
+            print(f"Pipeline finished in {time.perf_counter() - start:.2f} s")
+
+        return results
+
+
+def freebase_labels(freebase_dict):
+    """
+    Return the labels of a Freebase dictionary string of the CMU movies metadata (e.g. '{"/m/02h40lc": "English Language"}').
+    """
+    if not isinstance(freebase_dict, str):
+        return []
+
+    return list(json.loads(freebase_dict).values())
+
+
+def load_movie_metadata(path):
+    """
+    Load the movies metadata of the CMU Movie Summary Corpus and remove the duplicated movies.
+
+    Parameters:
+    - path (str): The path of movie.metadata.tsv.
+
+    Returns:
+    - DataFrame: One row per unique movie, with the release year and the languages, countries and genres as lists.
+    """
+    movie_metadata_df = pd.read_csv(path, sep='\t', header=None,
+                                    names=[MOVIE_ID, 'Freebase_Movie_ID', 'Movie_Name', 'Movie_Release_Date',
+                                           'Movie_Box_Office_Revenue', 'Movie_Runtime', 'Movie_Languages',
+                                           'Movie_Countries', 'Movie_Genres'])
+
+    #Duplicates are identified using all the attributes of the movies
+    movie_metadata_df = movie_metadata_df.drop_duplicates().reset_index(drop=True)
+
+    movie_metadata_df['Movie_Release_Year'] = pd.to_numeric(movie_metadata_df['Movie_Release_Date'].str[:4], errors='coerce').astype('Int16')
+    for column in ['Movie_Languages', 'Movie_Countries', 'Movie_Genres']:
+        movie_metadata_df[column] = movie_metadata_df[column].map(freebase_labels)
+
+    return movie_metadata_df
+
+
+def load_cpi(path, year_col='Year', cpi_col='CPI'):
+    """
+    Load the USD CPI table.
+
+    Parameters:
+    - path (str): The path of the CPI CSV file.
+    - year_col (str, optional): The year column. Default is 'Year'.
+    - cpi_col (str, optional): The (annual average) CPI column. Default is 'CPI'.
+
+    Returns:
+    - Series: The CPI indexed by year.
+    """
+    cpi_df = pd.read_csv(path)
+
+    return cpi_df.set_index(year_col)[cpi_col].astype(np.float64).rename('CPI')
+
+
+def adjust_revenue_for_inflation(movie_metadata_df, cpi, base_year=None):
+    """
+    Add the box office revenue adjusted for inflation (in USD of the base year).
+
+    Parameters:
+    - movie_metadata_df (DataFrame): The output of load_movie_metadata.
+    - cpi (Series): The CPI indexed by year.
+    - base_year (int, optional): The year of the USD of the adjusted revenues. Default is None (last year of the CPI table).
+
+    Returns:
+    - DataFrame: movie_metadata_df with a Movie_Box_Office_Revenue_Adjusted column.
+    """
+    #Float years, so that the missing release years (NaN) can be looked up too
+    cpi = cpi.set_axis(cpi.index.astype(np.float64))
+    base_year = cpi.index.max() if base_year is None else float(base_year)
+
+    release_year_cpi = cpi.reindex(movie_metadata_df['Movie_Release_Year'].astype(np.float64)).to_numpy()
+
+    return movie_metadata_df.assign(
+        Movie_Box_Office_Revenue_Adjusted=movie_metadata_df['Movie_Box_Office_Revenue'].to_numpy() * cpi[base_year] / release_year_cpi)
+
+
+def load_movie_music(path):
+    """
+    Load the scraped Spotify data (movie_music_df saved as CSV).
+    """
+    return pd.read_csv(path)
+
+
+def load_plot_emotions(path):
+    """
+    Load the plot emotions (one row per plot summary, with the Wikipedia_Movie_ID and the emotion scores).
+    """
+    plot_emotions_df = pd.read_csv(path)
+
+    return plot_emotions_df.drop_duplicates(subset=MOVIE_ID).set_index(MOVIE_ID)
+
+
+def merge_movie_music(movie_metadata_df, movie_music_agg_df):
+    """
+    Merge the movies metadata with the movie-level music aggregates (inner join on Wikipedia_Movie_ID).
+    """
+    return join_movie_music(movie_metadata_df, movie_music_agg_df, how='inner')
+
+
+def join_plot_emotions(movie_df, plot_emotions_df):
+    """
+    Join a movie-level table with the plot emotions (inner join on Wikipedia_Movie_ID).
+    """
+    return movie_df.join(plot_emotions_df, on=MOVIE_ID, how='inner', rsuffix='_Plot')
+
+
+def build_analysis_pipeline(movie_metadata_path, cpi_path, movie_music_path, plot_emotions_path, cache_dir=DEFAULT_CACHE_DIR, base_year=None):
+    """
+    Declare the stages of the build of the analysis-ready tables.
+
+    Parameters:
+    - movie_metadata_path (str): The path of movie.metadata.tsv (CMU Movie Summary Corpus).
+    - cpi_path (str): The path of the USD CPI CSV file (Year and CPI columns).
+    - movie_music_path (str): The path of the scraped Spotify data (movie_music_df saved as CSV).
+    - plot_emotions_path (str): The path of Plot_Summaries_with_Emotions.csv.
+    - cache_dir (str, optional): The directory of the cached results. Default is DEFAULT_CACHE_DIR.
+    - base_year (int, optional): The year of the USD of the adjusted revenues. Default is None (last year of the CPI table).
+
+    Returns:
+    - Pipeline: The pipeline, whose main outputs are the movie_music_metadata and movie_music_emotions stages.
+    """
+    pipeline = Pipeline(cache_dir)
+
+    pipeline.add_stage('movie_metadata', load_movie_metadata, files=[movie_metadata_path], params={'path': movie_metadata_path})
+    pipeline.add_stage('cpi', load_cpi, files=[cpi_path], params={'path': cpi_path})
+    pipeline.add_stage('movie_metadata_adjusted', adjust_revenue_for_inflation, inputs=['movie_metadata', 'cpi'], params={'base_year': base_year})
+    pipeline.add_stage('movie_music', load_movie_music, files=[movie_music_path], params={'path': movie_music_path})
+    pipeline.add_stage('movie_music_aggregates', aggregate_movie_music, inputs=['movie_music'])
+    pipeline.add_stage('plot_emotions', load_plot_emotions, files=[plot_emotions_path], params={'path': plot_emotions_path})
+    pipeline.add_stage('movie_music_metadata', merge_movie_music, inputs=['movie_metadata_adjusted', 'movie_music_aggregates'])
+    pipeline.add_stage('movie_music_emotions', join_plot_emotions, inputs=['movie_music_metadata', 'plot_emotions'])
+
+    return pipeline
+
+
+if __name__ == '__main__':
+    pipeline = build_analysis_pipeline(os.path.join(MAIN_DATA_PATH, 'movie.metadata.tsv'),
+                                       os.path.join(MAIN_DATA_PATH, 'cpi.csv'),
+                                       os.path.join(MAIN_DATA_PATH, 'movie_music_df.csv'),
+                                       os.path.join(MAIN_DATA_PATH, 'Plot_Summaries_with_Emotions.csv'))
+    pipeline.run()
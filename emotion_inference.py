@@ -0,0 +1,269 @@
+"""
+Batched, cached emotion classification of the plot summaries of the CMU Movie Summary Corpus.
+
+The plot summaries are classified by a pluggable local model, i.e. any picklable object with a model_id
+attribute and a predict(texts) method returning one row of EMOTIONS scores per text:
+    - TransformersEmotionModel: a local Hugging Face text classifier (by default the DistilBERT emotion
+      classifier used for the original scores), run on CPU,
+    - KeywordEmotionModel: a tiny keyword-based stand-in, without any dependency, for tests and dry runs.
+
+The scores are cached in a SQLite file under a hash of the summary text and of the model ID, so that only new
+(or edited) summaries are classified, and changing the model never mixes scores of different models. The
+uncached summaries are sorted by length and split into batches of similar lengths (which minimizes the
+padding in the transformer batches), and the batches are classified across several worker processes.
+"""
+
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from config import MAIN_DATA_PATH
+from movie_music_aggregation import MOVIE_ID
+
+#Emotions (labels of the DistilBERT emotion classifier)
+EMOTIONS = ['sadness', 'joy', 'love', 'anger', 'fear', 'surprise']
+
+DEFAULT_CACHE_PATH = os.path.join(MAIN_DATA_PATH, 'cache', 'plot_emotions.sqlite')
+
+#Model of the worker processes (set by init_worker)
+worker_model = None
+
+
+class KeywordEmotionModel:
+    """
+    Tiny stand-in emotion model: the scores are the softmax of the number of occurrences of a few keywords per emotion.
+    """
+
+    model_id = 'keyword-emotion-v1'
+
+    KEYWORDS = {'sadness': ['death', 'dies', 'grief', 'lonely', 'loss', 'mourn', 'sad', 'tragic'],
+                'joy': ['celebrate', 'happy', 'joy', 'laugh', 'party', 'success', 'win'],
+                'love': ['affair', 'kiss', 'love', 'marry', 'romance', 'wedding'],
+                'anger': ['anger', 'attack', 'fight', 'hate', 'revenge', 'rage'],
+                'fear': ['danger', 'escape', 'fear', 'haunt', 'horror', 'kill', 'terror'],
+                'surprise': ['discover', 'reveal', 'secret', 'shock', 'sudden', 'surprise']}
+
+    def predict(self, texts):
+        """
+        Parameters:
+        - texts (list of str): The plot summaries.
+
+        Returns:
+        - Array: The EMOTIONS scores of each text (n_texts x 6), summing to 1.
+        """
+        counts = np.array([[sum(text.lower().count(keyword) for keyword in self.KEYWORDS[emotion]) for emotion in EMOTIONS]
+                           for text in texts], dtype=np.float64).reshape(len(texts), len(EMOTIONS))
+
+        scores = np.exp(counts - counts.max(axis=1, keepdims=True))
+
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+class TransformersEmotionModel:
+    """
+    Emotion model backed by a local Hugging Face text classification model, run on CPU.
+
+    The model is only loaded on the first call of predict, so that the object is cheap to send to worker processes.
+    """
+
+    def __init__(self, model_name='bhadresh-savani/distilbert-base-uncased-emotion', max_length=512, n_threads=1, local_files_only=True):
+        """
+        Parameters:
+        - model_name (str, optional): The name (or local path) of the model. Default is 'bhadresh-savani/distilbert-base-uncased-emotion'.
+        - max_length (int, optional): The number of tokens the summaries are truncated to. Default is 512.
+        - n_threads (int, optional): The number of torch threads per process. Default is 1 (parallelism comes from the worker processes).
+        - local_files_only (bool, optional): Whether to only use a model already downloaded. Default is True.
+        """
+        self.model_name = model_name
+        self.max_length = max_length
+        self.n_threads = n_threads
+        self.local_files_only = local_files_only
+        self.classifier = None
+
+    @property
+    def model_id(self):
+        return f"{self.model_name}@{self.max_length}"
+
+    def __getstate__(self):
+        #Never send a loaded model to the worker processes
+        state = self.__dict__.copy()
+        state['classifier'] = None
+        return state
+
+    def predict(self, texts):
+        """
+        Parameters:
+        - texts (list of str): The plot summaries.
+
+        Returns:
+        - Array: The EMOTIONS scores of each text (n_texts x 6).
+        """
+        if self.classifier is None:
+            import torch
+            from transformers import pipeline
+
+            torch.set_num_threads(self.n_threads)
+            self.classifier = pipeline('text-classification', model=self.model_name, device=-1, top_k=None,
+                                       model_kwargs={'local_files_only': self.local_files_only})
+
+        outputs = self.classifier(list(texts), truncation=True, max_length=self.max_length, batch_size=len(texts))
+
+        return np.array([[{label_score['label']: label_score['score'] for label_score in output}[emotion] for emotion in EMOTIONS]
+                         for output in outputs])
+
+
+def summary_key(text, model_id):
+    """
+    Return the cache key of the scores of a summary by a model.
+    """
+    return hashlib.sha256(f"{model_id}\0{text}".encode()).hexdigest()
+
+
+class EmotionCache:
+    """
+    SQLite cache of the emotion scores, keyed by summary_key.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS emotion_scores (key TEXT PRIMARY KEY, scores BLOB)')
+
+    def get(self, keys):
+        """
+        Return the cached scores of the given keys, as a dict (keys which aren't cached are missing).
+        """
+        cached = {}
+        keys = list(keys)
+
+        #SQLite limits the number of parameters of a query
+        for start in range(0, len(keys), 900):
+            chunk = keys[start:start + 900]
+            rows = self.connection.execute(f"SELECT key, scores FROM emotion_scores WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+            for key, scores in rows:
+                cached[key] = np.frombuffer(scores, dtype=np.float32)
+
+        return cached
+
+    def put(self, keys, scores):
+        """
+        Cache the scores (n_keys x 6) of the given keys.
+        """
+        scores = np.asarray(scores, dtype=np.float32)
+        self.connection.executemany('INSERT OR REPLACE INTO emotion_scores VALUES (?, ?)',
+                                    [(key, key_scores.tobytes()) for key, key_scores in zip(keys, scores)])
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def length_batches(texts, batch_size):
+    """
+    Split texts into batches of texts of similar lengths.
+
+    Parameters:
+    - texts (list of str): The texts.
+    - batch_size (int): The maximum number of texts per batch.
+
+    Returns:
+    - List of arrays: The positions (in texts) of the texts of each batch.
+    """
+    order = np.argsort([len(text) for text in texts], kind='stable')
+
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def init_worker(model):
+    global worker_model
+    worker_model = model
+
+
+def predict_batch(texts):
+    """
+    Classify a batch of texts with the model of the worker process.
+    """
+    return np.asarray(worker_model.predict(texts), dtype=np.float32)
+
+
+def load_plot_summaries(path):
+    """
+    Load the plot summaries of the CMU Movie Summary Corpus.
+
+    Parameters:
+    - path (str): The path of plot_summaries.txt (one 'Wikipedia movie ID<TAB>summary' per line).
+
+    Returns:
+    - DataFrame: The Wikipedia_Movie_ID and Plot_Summary of each movie.
+    """
+    return pd.read_csv(path, sep='\t', header=None, names=[MOVIE_ID, 'Plot_Summary'], quoting=3, dtype={MOVIE_ID: np.int64, 'Plot_Summary': str})
+
+
+def infer_plot_emotions(plot_summaries_df, model, cache_path=DEFAULT_CACHE_PATH, batch_size=32, n_jobs=1, verbose=True):
+    """
+    Score the emotions of the plot summaries, classifying only the summaries whose scores aren't cached.
+
+    Parameters:
+    - plot_summaries_df (DataFrame): The Wikipedia_Movie_ID and Plot_Summary of each movie (e.g. from load_plot_summaries).
+    - model: The emotion model (e.g. TransformersEmotionModel() or KeywordEmotionModel()).
+    - cache_path (str, optional): The path of the SQLite cache. Default is DEFAULT_CACHE_PATH.
+    - batch_size (int, optional): The number of summaries per batch. Default is 32.
+    - n_jobs (int, optional): The number of worker processes. Default is 1 (classify in the current process).
+    - verbose (bool, optional): Whether to print the throughput. Default is True.
+
+    Returns:
+    - DataFrame: The Wikipedia_Movie_ID and the EMOTIONS scores of each movie (ready to be joined with the music data on Wikipedia_Movie_ID).
+    """
+    texts = plot_summaries_df['Plot_Summary'].fillna('').astype(str).tolist()
+    keys = [summary_key(text, model.model_id) for text in texts]
+
+    cache = EmotionCache(cache_path)
+    try:
+        scores_by_key = cache.get(set(keys))
+
+        #Classify every distinct uncached summary once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in scores_by_key:
+                missing.setdefault(key, text)
+        missing_keys, missing_texts = list(missing), list(missing.values())
+
+        batches = length_batches(missing_texts, batch_size)
+        start = time.perf_counter()
+
+        if n_jobs <= 1:
+            init_worker(model)
+            batch_scores = map(predict_batch, ([missing_texts[i] for i in batch] for batch in batches))
+        else:
+            executor = ProcessPoolExecutor(max_workers=n_jobs, initializer=init_worker, initargs=(model,))
+            batch_scores = executor.map(predict_batch, [[missing_texts[i] for i in batch] for batch in batches])
+
+        try:
+            #Cache the scores batch by batch, so that an interrupted run keeps its progress
+            for batch, scores in zip(batches, batch_scores):
+                batch_keys = [missing_keys[i] for i in batch]
+                cache.put(batch_keys, scores)
+                scores_by_key.update(zip(batch_keys, scores))
+        finally:
+            if n_jobs > 1:
+                executor.shutdown()
+
+        elapsed = time.perf_counter() - start
+        if verbose:
+            rate = len(missing_texts) / elapsed if elapsed > 0 else float('inf')
+            print(f"{len(texts) - len(missing_texts)} summaries from the cache, {len(missing_texts)} classified "
+                  f"in {elapsed:.1f} s ({rate:.1f} summaries/s)")
+    finally:
+        cache.close()
+
+    plot_emotions_df = pd.DataFrame(np.vstack([scores_by_key[key] for key in keys]) if keys else np.empty((0, len(EMOTIONS))),
+                                    columns=EMOTIONS)
+    plot_emotions_df.insert(0, MOVIE_ID, plot_summaries_df[MOVIE_ID].to_numpy())
+
+    return plot_emotions_df
@@ -0,0 +1,203 @@
+"""
+Incremental cube of the sufficient statistics (count, sum and sum of squares of each music feature) keyed by
+country, genre and year, for the time series analysis of the music features.
+
+Countries and genres are multi-valued: a movie belongs to every (country, genre) combination of its labels,
+so summing cells over countries or genres would count a movie once per label. The cube therefore also stores
+the margins, where the country and/or the genre is ALL (every movie counted once). Roll-ups over a
+multi-valued level read these margin cells, and only the years (single-valued) are ever summed. Roll-ups,
+selections of a country, a genre and a year range, and rolling windows over the years never touch the track
+rows again, and new scraped rows are added to the cube with update, instead of recomputing it.
+
+Example:
+    cube = FeatureCube(['Track_Energy', 'Track_Valence'])
+    cube.update(movie_music_metadata_df)
+    cube.yearly_series(country='India', genre='Drama', window=5)
+"""
+
+import pickle
+import numpy as np
+import pandas as pd
+from movie_music_aggregation import label_list
+
+STATS = ['Count', 'Sum', 'Sum_Sq']
+LEVELS = ['Country', 'Genre', 'Year']
+
+#Label of the margin cells (all the countries or all the genres)
+ALL = '(All)'
+
+
+class FeatureCube:
+    """
+    Sufficient statistics of the features per (Country, Genre, Year) cell.
+
+    The statistics are stored in a DataFrame indexed by (Country, Genre, Year), with (Stat, Feature) columns.
+    Only the non-empty cells are stored, including the margin cells whose Country and/or Genre is ALL.
+    """
+
+    def __init__(self, features, year='Movie_Release_Year', country_col='Movie_Countries', genre_col='Movie_Genres', stats=None):
+        """
+        Parameters:
+        - features (list of str): The feature columns.
+        - year (str, optional): The release year column of the rows. Default is 'Movie_Release_Year'.
+        - country_col (str, optional): The (multi-valued) country column of the rows. Default is 'Movie_Countries'.
+        - genre_col (str, optional): The (multi-valued) genre column of the rows. Default is 'Movie_Genres'.
+        - stats (DataFrame, optional): Initial sufficient statistics. Default is None (empty cube).
+        """
+        self.features = list(features)
+        self.year = year
+        self.country_col = country_col
+        self.genre_col = genre_col
+
+        if stats is None:
+            columns = pd.MultiIndex.from_product([STATS, self.features], names=['Stat', 'Feature'])
+            index = pd.MultiIndex.from_arrays([[], [], []], names=LEVELS)
+            stats = pd.DataFrame(np.zeros((0, len(columns))), index=index, columns=columns)
+        self.stats = stats
+
+    def __len__(self):
+        return len(self.stats)
+
+    def cell_stats(self, df):
+        """
+        Compute the sufficient statistics of the cells of a set of rows.
+
+        A row (track or movie) contributes once to every (country, genre) combination of its movie, to the
+        (country, ALL) and (ALL, genre) margins of its countries and genres, and to the (ALL, ALL) margin.
+
+        Parameters:
+        - df (DataFrame): The rows, with the year, country, genre and feature columns.
+
+        Returns:
+        - DataFrame: The sufficient statistics of the cells of the rows (same layout as self.stats).
+        """
+        frame = df[[self.year] + self.features].copy()
+        #Distinct labels of each row, plus the margin
+        frame['Country'] = df[self.country_col].map(lambda labels: list(dict.fromkeys(label_list(labels))) + [ALL])
+        frame['Genre'] = df[self.genre_col].map(lambda labels: list(dict.fromkeys(label_list(labels))) + [ALL])
+        frame = frame.explode('Country').explode('Genre').dropna(subset=[self.year])
+
+        values = frame[self.features].astype(np.float64)
+        stats = pd.concat({'Count': values.notna().astype(np.float64),
+                           'Sum': values.fillna(0),
+                           'Sum_Sq': values.fillna(0) ** 2}, axis=1, names=['Stat', 'Feature'])
+
+        keys = [frame['Country'].rename('Country'), frame['Genre'].rename('Genre'), frame[self.year].astype(int).rename('Year')]
+
+        return stats.groupby(keys, sort=True).sum()
+
+    def update(self, df):
+        """
+        Add new rows (e.g. newly scraped tracks merged with their movie metadata) to the cube.
+
+        Parameters:
+        - df (DataFrame): The new rows, with the year, country, genre and feature columns.
+        """
+        new_stats = self.cell_stats(df)
+
+        if len(self.stats) == 0:
+            self.stats = new_stats
+        else:
+            self.stats = self.stats.add(new_stats, fill_value=0).sort_index()
+
+    def select(self, levels, country=None, genre=None, years=None):
+        """
+        Select the cells of a roll-up (see rollup).
+        """
+        index = self.stats.index
+        mask = np.ones(len(index), dtype=bool)
+
+        for level, label in (('Country', country), ('Genre', genre)):
+            cell_labels = index.get_level_values(level)
+            if label is not None:
+                mask &= cell_labels == label
+            elif level in levels:
+                mask &= cell_labels != ALL
+            else:
+                mask &= cell_labels == ALL
+
+        if years is not None:
+            cell_years = index.get_level_values('Year')
+            mask &= (cell_years >= years[0]) & (cell_years <= years[1])
+
+        return self.stats[mask]
+
+    def rollup(self, levels=('Country', 'Year'), country=None, genre=None, years=None):
+        """
+        Return the sufficient statistics of a slice of the cube, keeping only some levels.
+
+        A dropped country (or genre) level is read from the ALL margin (or from the given country or genre), so
+        that every movie is counted once; only the years are summed.
+
+        Parameters:
+        - levels (list of str, optional): The levels to keep (among 'Country', 'Genre' and 'Year'). Default is ('Country', 'Year').
+        - country (str, optional): Only keep the cells of this country. Default is None (every country if Country is kept, all the movies otherwise).
+        - genre (str, optional): Only keep the cells of this genre. Default is None (every genre if Genre is kept, all the movies otherwise).
+        - years (tuple, optional): The (first, last) years to keep (inclusive). Default is None (all).
+
+        Returns:
+        - DataFrame: The sufficient statistics indexed by the kept levels.
+        """
+        levels = list(levels)
+        stats = self.select(levels, country, genre, years)
+
+        if not levels:
+            return stats.sum().to_frame().T
+
+        return stats.groupby(level=levels, sort=True).sum()
+
+    @staticmethod
+    def moments(stats):
+        """
+        Compute the count, mean and (sample) standard deviation of the features from sufficient statistics.
+
+        Parameters:
+        - stats (DataFrame): Sufficient statistics (e.g. from rollup), with (Stat, Feature) columns.
+
+        Returns:
+        - DataFrame: The Count, Mean and Std of each feature, with (Moment, Feature) columns.
+        """
+        count = stats['Count']
+        mean = stats['Sum'] / count.where(count > 0)
+        variance = (stats['Sum_Sq'] - stats['Sum'] * mean) / (count - 1).where(count > 1)
+
+        return pd.concat({'Count': count, 'Mean': mean, 'Std': np.sqrt(variance.clip(lower=0))}, axis=1, names=['Moment', 'Feature'])
+
+    def yearly_series(self, country=None, genre=None, years=None, window=None, min_periods=1):
+        """
+        Compute the yearly count, mean and standard deviation of the features of a country and/or genre.
+
+        Parameters:
+        - country (str, optional): The country. Default is None (all the countries).
+        - genre (str, optional): The genre. Default is None (all the genres).
+        - years (tuple, optional): The (first, last) years (inclusive). Default is None (all).
+        - window (int, optional): If given, the moments of each year are computed over a rolling window of this many years ending at the year. Default is None.
+        - min_periods (int, optional): The minimum number of years with data in a rolling window. Default is 1.
+
+        Returns:
+        - DataFrame: The moments (see moments) indexed by year.
+        """
+        stats = self.rollup(['Year'], country, genre, years)
+
+        if window is not None and len(stats) > 0:
+            all_years = pd.RangeIndex(stats.index.min(), stats.index.max() + 1, name='Year')
+            has_data = (stats['Count'].sum(axis=1) > 0).reindex(all_years, fill_value=False)
+            stats = stats.reindex(all_years, fill_value=0).rolling(window, min_periods=1).sum()
+            stats = stats[has_data.rolling(window, min_periods=1).sum() >= min_periods]
+
+        return self.moments(stats)
+
+    def save(self, path):
+        """
+        Save the cube to a pickle file.
+        """
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a cube saved with save.
+        """
+        with open(path, 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,282 @@
+"""
+Memory-mapped, compact columnar store of the track-level music data (movie_music_df from spotify_scraper.py).
+
+Layout of a feature store directory:
+    meta.json                   Column names, dtypes and number of rows
+    <column>.npy                One NumPy array per numerical column (float32 audio features, small integers otherwise)
+    <column>.codes.npy          Dictionary codes (int32, -1 for missing values) of the string columns
+    <column>.dictionary.json    Dictionary (list of distinct strings) of the string columns
+    Album_Genres.codes.npy      Dictionary codes of all the genres, track after track
+    Album_Genres.offsets.npy    Offsets of the genres of each track in Album_Genres.codes.npy
+    movie_ids.npy               Sorted unique Wikipedia movie IDs
+    movie_offsets.npy           Offsets of the (contiguous) tracks of each movie
+
+The rows are sorted by Wikipedia_Movie_ID, so the tracks of a movie are contiguous. The arrays are opened
+with np.load(mmap_mode='r'): opening a store only reads the file headers, only the pages of the selected
+columns and rows are ever read, and several processes opening the same store share these pages.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from movie_music_aggregation import MOVIE_ID, label_list
+
+FEATURE_STORE_VERSION = 1
+
+#Compact dtypes of the numerical columns (integer columns use -1 for missing values)
+NUMERIC_COLUMNS = {'Track_Duration': np.int32,
+    'Track_Acousticness': np.float32,
+    'Track_Danceability': np.float32,
+    'Track_Energy': np.float32,
+    'Track_Instrumentalness': np.float32,
+    'Track_Key': np.int8,
+    'Track_Liveness': np.float32,
+    'Track_Loudness': np.float32,
+    'Track_Mode': np.int8,
+    'Track_Speechiness': np.float32,
+    'Track_Tempo': np.float32,
+    'Track_Time_Signature': np.int8,
+    'Track_Valence': np.float32,
+    'Album_Popularity': np.int8,
+    'Album_Total_Tracks': np.int16}
+
+#String columns which are dictionary-encoded
+DICTIONARY_COLUMNS = ['Movie_Name',
+    'Album_Name',
+    'Album_Release_Date',
+    'Track_Name']
+
+GENRES = 'Album_Genres'
+
+
+def write_feature_store(movie_music_df, path):
+    """
+    Write the track-level music data to a feature store directory.
+
+    Parameters:
+    - movie_music_df (DataFrame): The track-level music data (one row per track).
+    - path (str): The directory of the feature store (an existing store is replaced).
+    """
+    #The store is written to a sibling directory and swapped in with renames, so that an existing store (possibly
+    #memory-mapped by other processes) is never truncated, and a failed write leaves it untouched
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(prefix=os.path.basename(path) + '.tmp-', dir=parent)
+    os.chmod(tmp_path, 0o755)
+
+    try:
+        write_feature_store_files(movie_music_df, tmp_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    if os.path.exists(path):
+        old_path = tempfile.mkdtemp(prefix=os.path.basename(path) + '.old-', dir=parent)
+        os.rename(path, os.path.join(old_path, 'store'))
+        os.rename(tmp_path, path)
+        #Processes which memory-mapped the old arrays keep reading them until they close them
+        shutil.rmtree(old_path, ignore_errors=True)
+    else:
+        os.rename(tmp_path, path)
+
+
+def write_feature_store_files(movie_music_df, path):
+    """
+    Write the files of a feature store to an existing, empty directory (see write_feature_store).
+    """
+    movie_music_df = movie_music_df[movie_music_df[MOVIE_ID].notna()].sort_values(MOVIE_ID, kind='stable')
+
+    #ID index: the tracks of movie_ids[i] are the rows movie_offsets[i]:movie_offsets[i + 1]
+    track_movie_ids = movie_music_df[MOVIE_ID].to_numpy(np.int64)
+    movie_ids, movie_starts = np.unique(track_movie_ids, return_index=True)
+    np.save(os.path.join(path, 'movie_ids.npy'), movie_ids)
+    np.save(os.path.join(path, 'movie_offsets.npy'), np.append(movie_starts, len(track_movie_ids)).astype(np.int64))
+    np.save(os.path.join(path, MOVIE_ID + '.npy'), track_movie_ids)
+
+    numeric_columns = {}
+    for column, dtype in NUMERIC_COLUMNS.items():
+        if column not in movie_music_df.columns:
+            continue
+        values = pd.to_numeric(movie_music_df[column], errors='coerce')
+        if np.issubdtype(dtype, np.integer):
+            values = values.fillna(-1)
+        np.save(os.path.join(path, column + '.npy'), values.to_numpy(dtype))
+        numeric_columns[column] = np.dtype(dtype).str
+
+    dictionary_columns = []
+    for column in DICTIONARY_COLUMNS:
+        if column not in movie_music_df.columns:
+            continue
+        codes, dictionary = pd.factorize(movie_music_df[column].astype('string'))
+        np.save(os.path.join(path, column + '.codes.npy'), codes.astype(np.int32))
+        with open(os.path.join(path, column + '.dictionary.json'), 'w') as f:
+            json.dump([str(value) for value in dictionary], f)
+        dictionary_columns.append(column)
+
+    multi_label_columns = []
+    if GENRES in movie_music_df.columns:
+        genres = [label_list(track_genres) for track_genres in movie_music_df[GENRES]]
+        lengths = np.array([len(track_genres) for track_genres in genres], dtype=np.int64)
+        codes, dictionary = pd.factorize(pd.Series([genre for track_genres in genres for genre in track_genres], dtype=object))
+        np.save(os.path.join(path, GENRES + '.codes.npy'), codes.astype(np.int32))
+        np.save(os.path.join(path, GENRES + '.offsets.npy'), np.concatenate(([0], np.cumsum(lengths))))
+        with open(os.path.join(path, GENRES + '.dictionary.json'), 'w') as f:
+            json.dump([str(value) for value in dictionary], f)
+        multi_label_columns.append(GENRES)
+
+    meta = {'version': FEATURE_STORE_VERSION,
+            'n_rows': len(track_movie_ids),
+            'numeric_columns': numeric_columns,
+            'dictionary_columns': dictionary_columns,
+            'multi_label_columns': multi_label_columns}
+
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+class FeatureStore:
+    """
+    Read-only, memory-mapped view of a feature store directory written by write_feature_store.
+
+    Opening a store is zero-copy: the arrays are memory-mapped lazily, when a column is first accessed,
+    and the dictionaries of the string columns are only read when their values are decoded.
+
+    Example:
+        store = FeatureStore(path)
+        energy = store.column('Track_Energy')                     #np.memmap, nothing is read yet
+        df = store.select(['Track_Energy', 'Album_Name'], movie_ids=[975900, 3196793])
+    """
+
+    def __init__(self, path):
+        """
+        Parameters:
+        - path (str): The directory of the feature store.
+        """
+        self.path = path
+
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        if self.meta['version'] != FEATURE_STORE_VERSION:
+            raise ValueError(f"Unsupported feature store version {self.meta['version']} (expected {FEATURE_STORE_VERSION})")
+
+        self.numeric_columns = list(self.meta['numeric_columns'])
+        self.dictionary_columns = list(self.meta['dictionary_columns'])
+        self.multi_label_columns = list(self.meta['multi_label_columns'])
+        self.columns = self.numeric_columns + self.dictionary_columns + self.multi_label_columns
+
+        self._arrays = {}
+        self._dictionaries = {}
+
+    def __len__(self):
+        return self.meta['n_rows']
+
+    def _array(self, filename):
+        if filename not in self._arrays:
+            self._arrays[filename] = np.load(os.path.join(self.path, filename), mmap_mode='r')
+        return self._arrays[filename]
+
+    def dictionary(self, column):
+        """
+        Return the dictionary (array of distinct strings) of a dictionary-encoded column.
+        """
+        if column not in self._dictionaries:
+            with open(os.path.join(self.path, column + '.dictionary.json')) as f:
+                self._dictionaries[column] = np.array(json.load(f), dtype=object)
+        return self._dictionaries[column]
+
+    @property
+    def movie_ids(self):
+        """
+        Sorted unique Wikipedia movie IDs of the store.
+        """
+        return self._array('movie_ids.npy')
+
+    def column(self, column):
+        """
+        Return a column without reading it: the memory-mapped values of a numerical column or
+        the memory-mapped codes of a dictionary-encoded column.
+        """
+        if column == MOVIE_ID or column in self.numeric_columns:
+            return self._array(column + '.npy')
+        if column in self.dictionary_columns:
+            return self._array(column + '.codes.npy')
+        raise KeyError(column)
+
+    def movie_rows(self, movie_ids):
+        """
+        Return the rows of the tracks of the given movies (movies absent from the store are skipped).
+
+        Parameters:
+        - movie_ids (array-like): Wikipedia movie IDs.
+
+        Returns:
+        - Array of int: The row numbers, movie after movie.
+        """
+        store_movie_ids = self.movie_ids
+        movie_offsets = self._array('movie_offsets.npy')
+
+        movie_ids = np.asarray(movie_ids, dtype=np.int64)
+        idx = np.searchsorted(store_movie_ids, movie_ids)
+        found = idx < len(store_movie_ids)
+        found[found] = store_movie_ids[idx[found]] == movie_ids[found]
+        idx = idx[found]
+
+        starts = movie_offsets[idx]
+        lengths = movie_offsets[idx + 1] - starts
+
+        #Concatenation of the ranges starts[i]:starts[i] + lengths[i], without a Python loop
+        return np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(starts, lengths)
+
+    def genres(self, rows=None):
+        """
+        Return the genres of each track as lists (decoded from the Album_Genres codes and offsets).
+
+        Parameters:
+        - rows (array-like, optional): The rows to decode. Default is None (all the rows).
+
+        Returns:
+        - List of lists of str: The genres of each row.
+        """
+        offsets = self._array(GENRES + '.offsets.npy')
+        codes = self._array(GENRES + '.codes.npy')
+        dictionary = self.dictionary(GENRES)
+
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows)
+
+        return [list(dictionary[codes[offsets[row]:offsets[row + 1]]]) for row in rows]
+
+    def select(self, columns=None, movie_ids=None, rows=None, decode=True):
+        """
+        Load a subset of the columns and rows into a DataFrame, reading only the corresponding pages.
+
+        Parameters:
+        - columns (list of str, optional): The columns to load. Default is None (all the columns).
+        - movie_ids (array-like, optional): Only load the tracks of these movies. Default is None.
+        - rows (array-like or slice, optional): Only load these rows (ignored if movie_ids is given). Default is None (all the rows).
+        - decode (bool, optional): Whether to decode the dictionary-encoded columns into categoricals (otherwise their codes are returned). Default is True.
+
+        Returns:
+        - DataFrame: The selected data, with a Wikipedia_Movie_ID column.
+        """
+        columns = self.columns if columns is None else columns
+
+        if movie_ids is not None:
+            rows = self.movie_rows(movie_ids)
+        if rows is None:
+            rows = slice(None)
+
+        data = {MOVIE_ID: self.column(MOVIE_ID)[rows]}
+
+        for column in columns:
+            if column in self.multi_label_columns:
+                data[column] = self.genres(np.arange(len(self))[rows])
+            elif column in self.dictionary_columns and decode:
+                data[column] = pd.Categorical.from_codes(self.column(column)[rows], self.dictionary(column))
+            else:
+                data[column] = self.column(column)[rows]
+
+        return pd.DataFrame(data)
@@ -0,0 +1,232 @@
+"""
+Sparse indicator-matrix index of the multi-valued labels (genres, countries, languages) of the movies and of
+the albums.
+
+The labels of n rows (movies or albums) are stored as an n x n_labels CSR matrix M of 0/1 entries, built in a
+single pass over the label lists without exploding the DataFrame. Every breakdown is then a sparse product:
+    - label counts:                 1' M
+    - rows with a label:            the non-zero rows of a column of M (a CSC copy is kept for these lookups)
+    - label-conditioned sums:       M' X, for a feature table X aligned on the rows
+    - track-level breakdowns:       M[movie position of each track], a row selection of M
+
+Example:
+    genre_index = LabelIndex.from_frame(movie_df, 'Movie_Genres')
+    genre_index.label_counts().head(10)
+    genre_index.conditioned_means(movie_df.set_index('Wikipedia_Movie_ID')[['Movie_Box_Office_Revenue']])
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from movie_music_aggregation import MOVIE_ID, label_list
+
+MOVIE_LABEL_COLUMNS = ['Movie_Genres', 'Movie_Countries', 'Movie_Languages']
+ALBUM_LABEL_COLUMNS = ['Album_Genres']
+
+
+class LabelIndex:
+    """
+    Sparse indicator matrix of the labels of a set of rows (movies or albums).
+    """
+
+    def __init__(self, matrix, labels, keys):
+        """
+        Parameters:
+        - matrix (sparse matrix): The n_rows x n_labels indicator matrix.
+        - labels (list of str): The label of each column.
+        - keys (array): The key (e.g. Wikipedia movie ID) of each row.
+        """
+        self.matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+        self.columns = self.matrix.tocsc()
+        self.labels = list(labels)
+        self.label_ids = {label: label_id for label_id, label in enumerate(self.labels)}
+        self.keys = np.asarray(keys)
+        self.key_positions = pd.Index(self.keys)
+
+    def __len__(self):
+        return self.matrix.shape[0]
+
+    @classmethod
+    def from_series(cls, labels, keys=None):
+        """
+        Build the index from a Series of label lists.
+
+        Parameters:
+        - labels (Series): The labels of each row, as lists (or as their string representations, see label_list).
+        - keys (array, optional): The key of each row. Default is None (the index of the Series).
+
+        Returns:
+        - LabelIndex: The index.
+        """
+        label_ids = {}
+        indices = []
+        indptr = [0]
+
+        for row_labels in labels:
+            #A label listed twice for the same row is counted once
+            row_ids = {label_ids.setdefault(label, len(label_ids)) for label in label_list(row_labels)}
+            indices.extend(sorted(row_ids))
+            indptr.append(len(indices))
+
+        matrix = sparse.csr_matrix((np.ones(len(indices)), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+                                   shape=(len(indptr) - 1, len(label_ids)))
+
+        return cls(matrix, list(label_ids), labels.index if keys is None else keys)
+
+    @classmethod
+    def from_frame(cls, df, column, key=MOVIE_ID):
+        """
+        Build the index of a label column, with one row per key.
+
+        For track-level data (e.g. Album_Genres), the labels of the first track of each key (movie) are used,
+        since all the tracks of an album share its labels.
+
+        Parameters:
+        - df (DataFrame): The data.
+        - column (str): The (multi-valued) label column.
+        - key (str, optional): The key column. Default is 'Wikipedia_Movie_ID'.
+
+        Returns:
+        - LabelIndex: The index.
+        """
+        first_rows = df[[key, column]].drop_duplicates(subset=key)
+
+        return cls.from_series(first_rows[column], keys=first_rows[key].to_numpy())
+
+    def positions(self, keys):
+        """
+        Return the row positions of the given keys (-1 for keys which aren't indexed).
+        """
+        return self.key_positions.get_indexer(keys)
+
+    def label_counts(self):
+        """
+        Return the number of rows of each label.
+
+        Returns:
+        - Series: The number of rows of each label, in decreasing order.
+        """
+        counts = np.asarray(self.matrix.sum(axis=0)).ravel()
+
+        return pd.Series(counts.astype(np.int64), index=self.labels).sort_values(ascending=False, kind='stable')
+
+    def top_labels(self, n_top=10):
+        """
+        Return the n_top most frequent labels.
+        """
+        return self.label_counts().head(n_top).index.tolist()
+
+    def rows_with(self, label):
+        """
+        Return the positions of the rows with a label.
+        """
+        label_id = self.label_ids.get(label)
+        if label_id is None:
+            return np.array([], dtype=np.int32)
+
+        return self.columns.indices[self.columns.indptr[label_id]:self.columns.indptr[label_id + 1]]
+
+    def keys_with(self, label):
+        """
+        Return the keys (e.g. Wikipedia movie IDs) of the rows with a label.
+        """
+        return self.keys[self.rows_with(label)]
+
+    def mask(self, labels, how='any'):
+        """
+        Return the rows having any (or all) of a set of labels, e.g. for a top-5 genre filter.
+
+        Parameters:
+        - labels (list of str): The labels.
+        - how (str, optional): 'any' or 'all'. Default is 'any'.
+
+        Returns:
+        - Boolean array: Whether each row has any (or all) of the labels.
+        """
+        label_ids = [self.label_ids[label] for label in labels if label in self.label_ids]
+        if how == 'all' and len(label_ids) < len(labels):
+            return np.zeros(len(self), dtype=bool)
+
+        counts = np.asarray(self.columns[:, label_ids].sum(axis=1)).ravel()
+
+        return counts >= len(label_ids) if how == 'all' else counts > 0
+
+    def expand(self, keys):
+        """
+        Return the index of other rows (e.g. tracks) referring to the indexed rows (e.g. movies) by their keys.
+
+        The rows are selected from the sparse matrix, without copying the label lists: keys which aren't indexed get no label.
+
+        Parameters:
+        - keys (array): The key of each new row (e.g. the Wikipedia_Movie_ID column of the track-level data).
+
+        Returns:
+        - LabelIndex: The index of the new rows.
+        """
+        positions = self.positions(keys)
+        selection = sparse.csr_matrix((np.ones(len(positions)), (np.arange(len(positions)), np.maximum(positions, 0))),
+                                      shape=(len(positions), len(self)))
+        selection.data[positions < 0] = 0
+        selection.eliminate_zeros()
+
+        return LabelIndex(selection @ self.matrix, self.labels, np.asarray(keys))
+
+    def conditioned_means(self, features, labels=None, aligned=False):
+        """
+        Compute the mean of each feature over the rows of each label, with a sparse matrix product.
+
+        Parameters:
+        - features (DataFrame): The features, indexed by the keys of the rows (rows which aren't in features are ignored).
+        - labels (list of str, optional): The labels. Default is None (all the labels).
+        - aligned (bool, optional): Whether the rows of features are already the rows of the index, in the same order (e.g. for an expanded track-level index). Default is False.
+
+        Returns:
+        - DataFrame: The mean of each feature (columns) for each label (index), ignoring missing values, and a Count column.
+        """
+        if not aligned:
+            features = features.reindex(self.keys)
+        elif len(features) != len(self):
+            raise ValueError(f"features has {len(features)} rows, the index has {len(self)} rows")
+
+        values = features.to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+
+        label_ids = np.arange(len(self.labels)) if labels is None else np.array([self.label_ids[label] for label in labels], dtype=np.int64)
+        indicators = self.columns[:, label_ids].T.tocsr()
+
+        sums = indicators @ np.where(present, values, 0)
+        counts = indicators @ present.astype(np.float64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+
+        means_df = pd.DataFrame(means, index=[self.labels[label_id] for label_id in label_ids], columns=features.columns)
+        means_df['Count'] = np.asarray(indicators.sum(axis=1)).ravel().astype(np.int64)
+
+        return means_df
+
+
+def build_label_indexes(movie_df=None, movie_music_df=None):
+    """
+    Build the label indexes of the movies (genres, countries, languages) and of the albums (genres).
+
+    Parameters:
+    - movie_df (DataFrame, optional): One row per movie, with the MOVIE_LABEL_COLUMNS. Default is None.
+    - movie_music_df (DataFrame, optional): The track-level music data, with the ALBUM_LABEL_COLUMNS. Default is None.
+
+    Returns:
+    - Dict: The LabelIndex of each label column, keyed by the column name.
+    """
+    label_indexes = {}
+
+    if movie_df is not None:
+        for column in MOVIE_LABEL_COLUMNS:
+            if column in movie_df.columns:
+                label_indexes[column] = LabelIndex.from_frame(movie_df, column)
+
+    if movie_music_df is not None:
+        for column in ALBUM_LABEL_COLUMNS:
+            if column in movie_music_df.columns:
+                label_indexes[column] = LabelIndex.from_frame(movie_music_df, column)
+
+    return label_indexes
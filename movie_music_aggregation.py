@@ -0,0 +1,160 @@
+"""
+Aggregation of the track-level music data (movie_music_df from spotify_scraper.py) to one row per movie.
+"""
+
+import ast
+import os
+import numpy as np
+import pandas as pd
+from cache_helpers import dataframe_fingerprint, hash_values, load_cache, save_cache
+from config import MAIN_DATA_PATH
+
+MOVIE_ID = 'Wikipedia_Movie_ID'
+
+#Numerical track columns of movie_music_df (same order as in spotify_scraper.py)
+TRACK_FEATURES = ['Track_Duration',
+    'Track_Acousticness',
+    'Track_Danceability',
+    'Track_Energy',
+    'Track_Instrumentalness',
+    'Track_Key',
+    'Track_Liveness',
+    'Track_Loudness',
+    'Track_Mode',
+    'Track_Speechiness',
+    'Track_Tempo',
+    'Track_Time_Signature',
+    'Track_Valence']
+
+#Album columns which have the same value for all the tracks of a movie (only the first value is kept)
+ALBUM_COLUMNS = ['Movie_Name',
+    'Album_Name',
+    'Album_Release_Date',
+    'Album_Genres',
+    'Album_Popularity',
+    'Album_Total_Tracks']
+
+#Version of the aggregation, to be bumped whenever its output changes so that older caches are rebuilt
+AGGREGATION_VERSION = 1
+
+DEFAULT_CACHE_PATH = os.path.join(MAIN_DATA_PATH, 'cache', 'movie_music_aggregates.pkl')
+
+
+def label_list(labels):
+    """
+    Return the labels (genres, countries, languages, ...) of a movie or an album as a list.
+
+    The labels are lists in the DataFrames built in memory (e.g. Album_Genres returned by the scraper), but become
+    their string representations once the DataFrames are saved to and reloaded from a CSV file.
+
+    Parameters:
+    - labels (list, str or NaN): The labels, as a list, the string representation of a list or a single label.
+
+    Returns:
+    - List of str: The labels.
+    """
+    if isinstance(labels, str):
+        if not labels.startswith(('[', '(')):
+            return [labels]
+        try:
+            labels = ast.literal_eval(labels)
+        except (ValueError, SyntaxError):
+            return [labels]
+
+    if isinstance(labels, (list, tuple, np.ndarray)):
+        return [str(label) for label in labels]
+
+    #Missing values
+    return []
+
+
+def aggregate_movie_music(movie_music_df, features=TRACK_FEATURES, weight='Track_Duration'):
+    """
+    Aggregate the track-level music data to one row per movie.
+
+    For every feature, the mean, median, standard deviation and weighted mean (by default weighted by the
+    track duration) over the tracks of each movie are computed, using a single factorization of the movie IDs
+    for all the grouped operations.
+
+    Parameters:
+    - movie_music_df (DataFrame): The track-level music data (one row per track).
+    - features (list of str, optional): The numerical track columns to aggregate. Default is TRACK_FEATURES.
+    - weight (str, optional): The track column used as weight for the weighted means. Default is 'Track_Duration'.
+
+    Returns:
+    - DataFrame: One row per movie, indexed (and sorted) by Wikipedia_Movie_ID, with the Track_Count, the
+      <feature>_Mean, <feature>_Median, <feature>_Std and <feature>_Weighted_Mean columns (as float32) and the
+      first value of the ALBUM_COLUMNS.
+    """
+    features = [feature for feature in features if feature in movie_music_df.columns]
+    movie_music_df = movie_music_df[movie_music_df[MOVIE_ID].notna()]
+
+    #Factorize the movie IDs once: all the grouped operations below reuse these integer codes
+    movie_codes, movie_ids = pd.factorize(movie_music_df[MOVIE_ID], sort=True)
+
+    values = movie_music_df[features].astype(np.float64).set_axis(movie_codes)
+    weights = movie_music_df[weight].astype(np.float64).to_numpy()
+
+    #Weights are only counted for the non-missing values of each feature
+    weight_sums = values.notna().mul(weights, axis=0)
+    weighted_values = values.mul(weights, axis=0)
+
+    grouped = values.groupby(level=0, sort=True)
+    stats = grouped.agg(['mean', 'median', 'std'])
+    weighted_means = weighted_values.groupby(level=0, sort=True).sum() / weight_sums.groupby(level=0, sort=True).sum()
+
+    movie_music_agg = {'Track_Count': pd.to_numeric(grouped.size(), downcast='unsigned').to_numpy()}
+    for feature in features:
+        movie_music_agg[feature + '_Mean'] = stats[(feature, 'mean')].to_numpy(np.float32)
+        movie_music_agg[feature + '_Median'] = stats[(feature, 'median')].to_numpy(np.float32)
+        movie_music_agg[feature + '_Std'] = stats[(feature, 'std')].to_numpy(np.float32)
+        movie_music_agg[feature + '_Weighted_Mean'] = weighted_means[feature].to_numpy(np.float32)
+
+    movie_music_agg_df = pd.DataFrame(movie_music_agg, index=pd.Index(movie_ids, name=MOVIE_ID))
+
+    album_columns = [column for column in ALBUM_COLUMNS if column in movie_music_df.columns]
+    if album_columns:
+        albums = movie_music_df[album_columns].set_axis(movie_codes).groupby(level=0, sort=True).first()
+        movie_music_agg_df = movie_music_agg_df.join(albums.set_axis(movie_music_agg_df.index))
+
+    return movie_music_agg_df
+
+
+def load_movie_music_aggregates(movie_music_df, cache_path=DEFAULT_CACHE_PATH, features=TRACK_FEATURES, weight='Track_Duration'):
+    """
+    Return the movie-level aggregates of the track-level music data, from the disk cache if the track data hasn't changed.
+
+    Parameters:
+    - movie_music_df (DataFrame): The track-level music data (one row per track).
+    - cache_path (str, optional): The path of the cache file. Default is DEFAULT_CACHE_PATH (in MAIN_DATA_PATH).
+    - features (list of str, optional): The numerical track columns to aggregate. Default is TRACK_FEATURES.
+    - weight (str, optional): The track column used as weight for the weighted means. Default is 'Track_Duration'.
+
+    Returns:
+    - DataFrame: The output of aggregate_movie_music.
+    """
+    key = hash_values(AGGREGATION_VERSION, dataframe_fingerprint(movie_music_df), list(features), weight)
+
+    movie_music_agg_df = load_cache(cache_path, key)
+
+    if movie_music_agg_df is None:
+        movie_music_agg_df = aggregate_movie_music(movie_music_df, features, weight)
+        save_cache(cache_path, key, movie_music_agg_df)
+
+    return movie_music_agg_df
+
+
+def join_movie_music(movie_df, movie_music_agg_df, how='inner'):
+    """
+    Join a movie-level table (e.g. the movies metadata or the plot emotions) with the movie-level music aggregates.
+
+    Parameters:
+    - movie_df (DataFrame): The movie-level table, with a Wikipedia_Movie_ID column.
+    - movie_music_agg_df (DataFrame): The output of aggregate_movie_music (indexed by Wikipedia_Movie_ID).
+    - how (str, optional): The type of join. Default is 'inner'.
+
+    Returns:
+    - DataFrame: movie_df with the music aggregates of each movie.
+    """
+    #The aggregates are indexed by the sorted, unique movie IDs, so the join is a direct index lookup
+    return movie_df.join(movie_music_agg_df, on=MOVIE_ID, how=how, rsuffix='_Music')
@@ -0,0 +1,282 @@
+"""
+Scalable paired matching of treated and control movies, to neutralize the effect of confounders.
+
+Instead of building the full (treated x control) similarity structure, the units are first split into
+blocks with the same values of the categorical confounders (exact blocking, e.g. release decade, main genre
+and main country), and inside each block every treated unit is greedily matched (1:1, without replacement)
+to its nearest unused control unit:
+    - on a single score (e.g. the propensity score) by binary search in the sorted control scores,
+      with skip pointers over the already used controls,
+    - on several covariates with a KD-tree (scipy.spatial.cKDTree) over the standardized covariates.
+In both cases matches farther than the caliper are rejected, and the matching runs in O(n log n) per block.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+
+def estimate_propensity_scores(df, treatment, covariates):
+    """
+    Estimate propensity scores with a logistic regression of the treatment on the covariates.
+
+    Parameters:
+    - df (DataFrame): One row per unit (movie).
+    - treatment (str): The boolean treatment column.
+    - covariates (list of str): The covariate columns (categorical columns are one-hot encoded).
+
+    Returns:
+    - Series: The propensity score of each unit (indexed like df).
+    """
+    import statsmodels.api as sm
+
+    X = pd.get_dummies(df[covariates], drop_first=True, dtype=float)
+    X = sm.add_constant(X, has_constant='add')
+
+    model = sm.Logit(df[treatment].astype(float), X).fit(disp=0)
+
+    return pd.Series(model.predict(X), index=df.index, name='Propensity_Score')
+
+
+def find_root(parent, i):
+    """
+    Find the root of i in a skip-pointer (union-find) list, with path halving.
+    """
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def match_on_score(treated_scores, control_scores, caliper=np.inf, rng=None):
+    """
+    Greedily match each treated unit to the nearest unused control unit on a single score.
+
+    Parameters:
+    - treated_scores (array-like): The score of each treated unit.
+    - control_scores (array-like): The score of each control unit.
+    - caliper (float, optional): The maximum score distance of a pair. Default is np.inf.
+    - rng (Generator, optional): Random generator for the order in which the treated units are matched. Default is None (unshuffled).
+
+    Returns:
+    - Tuple of arrays: (treated positions, control positions, distances) of the pairs.
+    """
+    treated_scores = np.asarray(treated_scores, dtype=np.float64)
+    control_scores = np.asarray(control_scores, dtype=np.float64)
+
+    control_order = np.argsort(control_scores, kind='stable')
+    sorted_scores = control_scores[control_order]
+    n_control = len(sorted_scores)
+
+    #right[i] leads to the first unused control at or after i (n_control if none)
+    #left[i + 1] leads to the last unused control at or before i, plus one (0 if none)
+    right = list(range(n_control + 1))
+    left = list(range(n_control + 1))
+
+    treated_order = np.arange(len(treated_scores)) if rng is None else rng.permutation(len(treated_scores))
+    positions = np.searchsorted(sorted_scores, treated_scores[treated_order])
+
+    sorted_scores = sorted_scores.tolist()
+    pairs = []
+
+    for t, position, score in zip(treated_order.tolist(), positions.tolist(), treated_scores[treated_order].tolist()):
+        r = find_root(right, position)
+        l = find_root(left, position) - 1
+
+        r_distance = sorted_scores[r] - score if r < n_control else np.inf
+        l_distance = score - sorted_scores[l] if l >= 0 else np.inf
+
+        c, distance = (r, r_distance) if r_distance <= l_distance else (l, l_distance)
+        #No unused control left (both distances are infinite), or the nearest one is beyond the caliper
+        if not np.isfinite(distance) or distance > caliper:
+            continue
+
+        #Mark the control as used
+        right[c] = c + 1
+        left[c + 1] = c
+        pairs.append((t, c, distance))
+
+    if not pairs:
+        return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+
+    treated_positions, sorted_positions, distances = map(np.array, zip(*pairs))
+
+    return treated_positions, control_order[sorted_positions], distances
+
+
+def match_on_covariates(treated_X, control_X, caliper=np.inf, rng=None, k=8):
+    """
+    Greedily match each treated unit to the nearest unused control unit in covariate space, with a KD-tree.
+
+    Parameters:
+    - treated_X (array-like): The (standardized) covariates of the treated units (n_treated x n_covariates).
+    - control_X (array-like): The (standardized) covariates of the control units (n_control x n_covariates).
+    - caliper (float, optional): The maximum Euclidean distance of a pair. Default is np.inf.
+    - rng (Generator, optional): Random generator for the order in which the treated units are matched. Default is None (unshuffled).
+    - k (int, optional): The number of nearest neighbours first queried for every treated unit. Default is 8.
+
+    Returns:
+    - Tuple of arrays: (treated positions, control positions, distances) of the pairs.
+    """
+    treated_X = np.asarray(treated_X, dtype=np.float64)
+    control_X = np.asarray(control_X, dtype=np.float64)
+    n_control = len(control_X)
+
+    if n_control == 0 or len(treated_X) == 0:
+        return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+
+    tree = cKDTree(control_X)
+    k = min(k, n_control)
+
+    #Query the k nearest neighbours of all the treated units at once, and only query again for the units whose k neighbours were all used
+    distances, neighbours = tree.query(treated_X, k=k, distance_upper_bound=caliper)
+    distances, neighbours = distances.reshape(len(treated_X), k), neighbours.reshape(len(treated_X), k)
+
+    used = np.zeros(n_control, dtype=bool)
+    treated_order = np.arange(len(treated_X)) if rng is None else rng.permutation(len(treated_X))
+    pairs = []
+
+    for t in treated_order:
+        t_distances, t_neighbours, t_k = distances[t], neighbours[t], k
+
+        while True:
+            #Missing neighbours (beyond the caliper) have an infinite distance and the index n_control
+            available = np.isfinite(t_distances) & ~used[np.minimum(t_neighbours, n_control - 1)]
+            if available.any():
+                j = np.argmax(available)
+                used[t_neighbours[j]] = True
+                pairs.append((t, t_neighbours[j], t_distances[j]))
+                break
+            if t_k >= n_control or not np.isfinite(t_distances[-1]):
+                break
+            t_k = min(2 * t_k, n_control)
+            t_distances, t_neighbours = tree.query(treated_X[t], k=t_k, distance_upper_bound=caliper)
+            t_distances, t_neighbours = np.atleast_1d(t_distances), np.atleast_1d(t_neighbours)
+
+    if not pairs:
+        return np.array([], dtype=int), np.array([], dtype=int), np.array([])
+
+    return tuple(map(np.array, zip(*pairs)))
+
+
+def match_pairs(df, treatment, match_on, block_on=None, caliper=None, standardize=True, seed=0):
+    """
+    Match treated and control units 1:1 within blocks of identical categorical confounders.
+
+    Parameters:
+    - df (DataFrame): One row per unit (movie).
+    - treatment (str): The boolean treatment column.
+    - match_on (str or list of str): The column(s) to match on, e.g. 'Propensity_Score' or a list of numerical confounders.
+    - block_on (list of str, optional): The categorical confounders on which the pairs must match exactly (e.g. release decade, main genre, main country). Default is None (no blocking).
+    - caliper (float, optional): The maximum distance of a pair (in standard deviations of the covariates if standardize is True). Default is None (no caliper).
+    - standardize (bool, optional): Whether to standardize the covariates (over all the units) before matching. Default is True.
+    - seed (int, optional): Seed of the order in which the treated units are matched. Default is 0.
+
+    Returns:
+    - DataFrame: One row per pair with the index labels of the treated and control units (Treated_Index, Control_Index), the Pair_Distance and the block.
+    """
+    match_on = [match_on] if isinstance(match_on, str) else list(match_on)
+    block_on = list(block_on) if block_on else []
+    caliper = np.inf if caliper is None else caliper
+    rng = np.random.default_rng(seed)
+
+    df = df.dropna(subset=match_on + block_on)
+    X = df[match_on].to_numpy(np.float64)
+    if standardize:
+        std = X.std(axis=0)
+        X = (X - X.mean(axis=0)) / np.where(std > 0, std, 1)
+    is_treated = df[treatment].to_numpy(bool)
+
+    blocks = df.groupby(block_on, sort=False, observed=True).indices if block_on else {(): np.arange(len(df))}
+
+    pair_dfs = []
+
+    for block, block_positions in blocks.items():
+        treated_positions = block_positions[is_treated[block_positions]]
+        control_positions = block_positions[~is_treated[block_positions]]
+
+        if len(treated_positions) == 0 or len(control_positions) == 0:
+            continue
+
+        if len(match_on) == 1:
+            t, c, distances = match_on_score(X[treated_positions, 0], X[control_positions, 0], caliper, rng)
+        else:
+            t, c, distances = match_on_covariates(X[treated_positions], X[control_positions], caliper, rng)
+
+        if len(t) == 0:
+            continue
+
+        block_pairs = {'Treated_Index': df.index[treated_positions[t]],
+                       'Control_Index': df.index[control_positions[c]],
+                       'Pair_Distance': distances}
+        block = block if isinstance(block, tuple) else (block,)
+        for column, value in zip(block_on, block):
+            block_pairs[column] = value
+        pair_dfs.append(pd.DataFrame(block_pairs))
+
+    if not pair_dfs:
+        return pd.DataFrame(columns=['Treated_Index', 'Control_Index', 'Pair_Distance'] + block_on)
+
+    return pd.concat(pair_dfs, ignore_index=True)
+
+
+def matched_units(df, pairs):
+    """
+    Select the matched units, with the ID of their pair.
+
+    Parameters:
+    - df (DataFrame): One row per unit (movie).
+    - pairs (DataFrame): The output of match_pairs.
+
+    Returns:
+    - DataFrame: The rows of df of the treated and control units of the pairs, with a Pair_ID column.
+    """
+    pair_ids = np.arange(len(pairs))
+
+    treated_df = df.loc[pairs['Treated_Index']].assign(Pair_ID=pair_ids)
+    control_df = df.loc[pairs['Control_Index']].assign(Pair_ID=pair_ids)
+
+    return pd.concat([treated_df, control_df]).sort_values('Pair_ID', kind='stable')
+
+
+def standardized_mean_differences(df, treatment, covariates):
+    """
+    Compute the standardized mean difference of each covariate between treated and control units.
+
+    Parameters:
+    - df (DataFrame): One row per unit (movie).
+    - treatment (str): The boolean treatment column.
+    - covariates (list of str): The covariate columns (categorical columns are one-hot encoded).
+
+    Returns:
+    - DataFrame: One row per (encoded) covariate with the treated and control means and their standardized difference.
+    """
+    X = pd.get_dummies(df[covariates], dtype=float)
+    is_treated = df[treatment].to_numpy(bool)
+
+    treated_X, control_X = X[is_treated], X[~is_treated]
+    mean_treated, mean_control = treated_X.mean(), control_X.mean()
+    pooled_std = np.sqrt((treated_X.var() + control_X.var()) / 2)
+
+    return pd.DataFrame({'Mean_Treated': mean_treated,
+                         'Mean_Control': mean_control,
+                         'SMD': (mean_treated - mean_control) / pooled_std.where(pooled_std > 0)})
+
+
+def balance_diagnostics(df, pairs, treatment, covariates):
+    """
+    Compare the covariate balance of all the units with the balance of the matched units.
+
+    Parameters:
+    - df (DataFrame): One row per unit (movie).
+    - pairs (DataFrame): The output of match_pairs.
+    - treatment (str): The boolean treatment column.
+    - covariates (list of str): The covariate columns (categorical columns are one-hot encoded).
+
+    Returns:
+    - DataFrame: One row per (encoded) covariate with the standardized mean differences before (SMD_Before) and after (SMD_After) matching.
+    """
+    before = standardized_mean_differences(df, treatment, covariates)
+    after = standardized_mean_differences(matched_units(df, pairs), treatment, covariates)
+
+    return before.join(after, lsuffix='_Before', rsuffix='_After')
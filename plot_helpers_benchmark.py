@@ -0,0 +1,335 @@
+"""
+Benchmarks for the plot helpers, run headless on synthetic Spotify-shaped data.
+
+Usage:
+    python plot_helpers_benchmark.py lifecycle --n-plots 2000
+    python plot_helpers_benchmark.py scaling --sizes 1000 100000 1000000 --output results.json
+    python plot_helpers_benchmark.py compare old_results.json new_results.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+import plot_helpers_new as phn
+import plot_helpers_html as phh
+
+# Subset of the features used for the pair grids (a pair grid over all the features is quadratic in their number)
+PAIR_GRID_FEATURES = ['Track_Danceability', 'Track_Energy', 'Track_Loudness', 'Track_Valence']
+
+COUNTRIES = ['United States of America', 'India', 'United Kingdom', 'France', 'Japan', 'Italy', 'Germany', 'Canada']
+
+
+def synthetic_music_df(n_rows, seed=0):
+    """
+    Create a synthetic DataFrame shaped like the merged movie and Spotify track data.
+
+    Parameters:
+    - n_rows (int): The number of track rows.
+    - seed (int, optional): The seed of the random generator. Default is 0.
+
+    Returns:
+    - DataFrame: One row per track with the Track_* audio features and some movie metadata.
+    """
+    rng = np.random.default_rng(seed)
+
+    return pd.DataFrame({
+        'Wikipedia_Movie_ID': rng.integers(0, max(n_rows // 12, 1), n_rows),
+        'Movie_Country': rng.choice(COUNTRIES, n_rows),
+        'Movie_Release_Year': rng.integers(1950, 2015, n_rows),
+        'Movie_Box_Office_Revenue': rng.lognormal(17, 1.5, n_rows),
+        'Track_Duration': rng.gamma(4, 50000, n_rows).astype(int),
+        'Track_Acousticness': rng.beta(1, 2, n_rows),
+        'Track_Danceability': rng.beta(5, 5, n_rows),
+        'Track_Energy': rng.beta(2, 2, n_rows),
+        'Track_Instrumentalness': rng.beta(0.5, 2, n_rows),
+        'Track_Key': rng.integers(0, 12, n_rows),
+        'Track_Liveness': rng.beta(2, 8, n_rows),
+        'Track_Loudness': -rng.gamma(2, 5, n_rows),
+        'Track_Mode': rng.integers(0, 2, n_rows),
+        'Track_Speechiness': rng.beta(1, 15, n_rows),
+        'Track_Tempo': rng.normal(118, 30, n_rows).clip(40, 220),
+        'Track_Time_Signature': rng.choice([3, 4, 5], n_rows, p=[0.1, 0.85, 0.05]),
+        'Track_Valence': rng.beta(2, 3, n_rows),
+    })
+
+
+def current_rss_mb():
+    """
+    Return the resident set size of the current process in MB.
+
+    Falls back to the peak resident set size where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        # ru_maxrss is in bytes on macOS and in kB on Linux
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss / 2**20 if sys.platform == 'darwin' else max_rss / 2**10
+
+
+def figure_lifecycle_benchmark(n_plots=2000, n_rows=1000, sample_every=100, output_dir=None):
+    """
+    Call the plot helpers of plot_helpers_new in a long loop in batch mode and track the memory usage.
+
+    With the figures closed by the helpers, the RSS and the number of open figures should stay flat.
+
+    Parameters:
+    - n_plots (int, optional): The number of plots to create. Default is 2000.
+    - n_rows (int, optional): The number of rows of the synthetic data. Default is 1000.
+    - sample_every (int, optional): Record the memory usage every sample_every plots. Default is 100.
+    - output_dir (str, optional): Directory in which the plots are saved. Default is None (plots are not saved).
+
+    Returns:
+    - DataFrame: The RSS (in MB) and the number of open figures after every sample_every plots.
+    """
+    phn.set_batch_mode(True)
+
+    df = synthetic_music_df(n_rows)
+    country_counts = df['Movie_Country'].value_counts()
+
+    plots = [
+        lambda filename: phn.scatter(df, 'Track_Energy', 'Track_Loudness', filename=filename),
+        lambda filename: phn.box(df, 'Movie_Country', 'Track_Energy', filename=filename),
+        lambda filename: phn.violin(df, 'Movie_Country', 'Track_Valence', filename=filename),
+        lambda filename: phn.line(df, 'Movie_Release_Year', 'Track_Danceability', filename=filename),
+        lambda filename: phn.histogram('Track_Tempo', data=df, filename=filename),
+        lambda filename: phn.pie_chart(country_counts.values, country_counts.index, filename=filename),
+    ]
+
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    memory_usage = []
+
+    for i in range(n_plots):
+        filename = os.path.join(output_dir, f'plot_{i % len(plots)}.png') if output_dir is not None else None
+        plots[i % len(plots)](filename)
+
+        if (i + 1) % sample_every == 0:
+            memory_usage.append((i + 1, current_rss_mb(), len(plt.get_fignums())))
+
+    return pd.DataFrame(memory_usage, columns=['Plots', 'RSS_MB', 'Open_Figures'])
+
+
+def scaling_benchmark_helpers():
+    """
+    Return the plot helpers of both modules, each wrapped as a call on a DataFrame which saves the plot to a file.
+
+    Returns:
+    - Dict: Maps '<module>.<helper>' to a (function(df, filename), output file extension) tuple.
+    """
+    def pie_counts(df):
+        return df['Movie_Country'].value_counts()
+
+    return {
+        'plot_helpers_new.scatter': (lambda df, filename: phn.scatter(df, 'Track_Energy', 'Track_Loudness', filename=filename), '.png'),
+        'plot_helpers_new.box': (lambda df, filename: phn.box(df, 'Movie_Country', 'Track_Energy', filename=filename), '.png'),
+        'plot_helpers_new.violin': (lambda df, filename: phn.violin(df, 'Movie_Country', 'Track_Valence', filename=filename), '.png'),
+        'plot_helpers_new.line': (lambda df, filename: phn.line(df, 'Movie_Release_Year', 'Track_Danceability', filename=filename), '.png'),
+        'plot_helpers_new.histogram': (lambda df, filename: phn.histogram('Track_Tempo', data=df, filename=filename), '.png'),
+        'plot_helpers_new.pie_chart': (lambda df, filename: phn.pie_chart(pie_counts(df).values, pie_counts(df).index, filename=filename), '.png'),
+        'plot_helpers_new.pair_grid_w_p_values': (lambda df, filename: phn.pair_grid_w_p_values(df[PAIR_GRID_FEATURES], filename), '.png'),
+        'plot_helpers_html.scatter_html': (lambda df, filename: phh.scatter_html(df, 'Track_Energy', 'Track_Loudness', filename=filename), '.html'),
+        'plot_helpers_html.box_html': (lambda df, filename: phh.box_html(df, 'Movie_Country', 'Track_Energy', filename=filename), '.html'),
+        'plot_helpers_html.violin_html': (lambda df, filename: phh.violin_html(df, 'Movie_Country', 'Track_Valence', filename=filename), '.html'),
+        'plot_helpers_html.line_html': (lambda df, filename: phh.line_html(df, 'Movie_Release_Year', 'Track_Danceability', filename=filename), '.html'),
+        'plot_helpers_html.histogram_html': (lambda df, filename: phh.histogram_html('Track_Tempo', data=df, filename=filename), '.html'),
+        'plot_helpers_html.pie_chart_html': (lambda df, filename: phh.pie_chart_html(pie_counts(df).values, pie_counts(df).index, filename=filename), '.html'),
+        'plot_helpers_html.pair_grid_w_p_values_html': (lambda df, filename: phh.pair_grid_w_p_values_html(df[PAIR_GRID_FEATURES], filename=filename), '.html'),
+    }
+
+
+def run_benchmark_helper(helper, df, filename, full_filename):
+    """
+    Run a plot helper twice: once untraced to measure its render time, then under tracemalloc to measure its peak memory.
+
+    Parameters:
+    - helper (function): The helper, called as helper(df, filename).
+    - df (DataFrame): The data.
+    - filename (str): The output filename passed to the helper.
+    - full_filename (str): The path of the file written by the helper.
+
+    Returns:
+    - Dict: The render time (s), the peak traced memory (MB) and the output file size (bytes), or the error raised by the helper.
+    """
+    try:
+        # Time the render without tracemalloc, whose overhead grows with the number of allocations
+        start = time.perf_counter()
+        helper(df, filename)
+        elapsed = time.perf_counter() - start
+        output_bytes = os.path.getsize(full_filename)
+        plt.close('all')
+
+        tracemalloc.start()
+        helper(df, filename)
+        _, peak_memory = tracemalloc.get_traced_memory()
+
+        return {'time_s': elapsed, 'peak_memory_mb': peak_memory / 2**20, 'output_bytes': output_bytes}
+
+    except Exception as error:
+        return {'time_s': None, 'peak_memory_mb': None, 'output_bytes': None, 'error': f"{type(error).__name__}: {error}"}
+
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        plt.close('all')
+        if os.path.exists(full_filename):
+            os.remove(full_filename)
+
+
+def scaling_benchmark(sizes=(1000, 100000, 1000000), helpers=None, seed=0, output=None):
+    """
+    Run the plot helpers on synthetic data of increasing size and measure their cost.
+
+    The plots are rendered headless (batch mode) in a temporary directory, so nothing is shown,
+    nothing is downloaded and the 'images' folder of the caller is left untouched. A helper which fails
+    (e.g. runs out of memory) gets its error recorded and the benchmark goes on with the next one.
+
+    Parameters:
+    - sizes (iterable of int, optional): The numbers of rows of the synthetic data. Default is (1000, 100000, 1000000).
+    - helpers (list of str, optional): The names ('<module>.<helper>') of the helpers to run. Default is None (all helpers).
+    - seed (int, optional): The seed of the random generator. Default is 0.
+    - output (str, optional): The path of the JSON file where the results are saved after each size. Default is None (not saved).
+
+    Returns:
+    - List of dicts: One record per (helper, size) with the render time (s), the peak traced memory (MB) and the output file size (bytes), or the error of the helper.
+    """
+    phn.set_batch_mode(True)
+
+    benchmark_helpers = scaling_benchmark_helpers()
+    if helpers is not None:
+        benchmark_helpers = {name: benchmark_helpers[name] for name in helpers}
+
+    results = []
+    cwd = os.getcwd()
+    if output is not None:
+        output = os.path.abspath(output)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # The html helpers write to the 'images' folder of the working directory
+        os.chdir(tmp_dir)
+        try:
+            for n_rows in sizes:
+                df = synthetic_music_df(n_rows, seed)
+
+                for name, (helper, extension) in benchmark_helpers.items():
+                    filename = name.split('.')[-1] + f'_{n_rows}' + extension
+                    full_filename = os.path.join('images', filename) if extension == '.html' else filename
+
+                    result = {'helper': name, 'n_rows': n_rows}
+                    result.update(run_benchmark_helper(helper, df, filename, full_filename))
+                    results.append(result)
+
+                    if 'error' in result:
+                        print(f"{name:<45} {n_rows:>9} rows  failed: {result['error']}")
+                    else:
+                        print(f"{name:<45} {n_rows:>9} rows  {result['time_s']:8.2f} s  {result['peak_memory_mb']:9.1f} MB  {result['output_bytes']:>12} B")
+
+                # Keep the results of the sizes already done if a later size crashes the process
+                if output is not None:
+                    save_benchmark_results(results, output)
+        finally:
+            os.chdir(cwd)
+
+    return results
+
+
+def save_benchmark_results(results, path):
+    """
+    Save benchmark results as JSON together with the versions of the libraries used.
+
+    Parameters:
+    - results (list of dicts): The results of scaling_benchmark.
+    - path (str): The path of the JSON file.
+    """
+    import matplotlib
+    import plotly
+    import seaborn
+
+    metadata = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'matplotlib': matplotlib.__version__,
+        'seaborn': seaborn.__version__,
+        'plotly': plotly.__version__,
+    }
+
+    with open(path, 'w') as f:
+        json.dump({'metadata': metadata, 'results': results}, f, indent=2)
+
+
+def compare_benchmark_results(old_path, new_path):
+    """
+    Compare two JSON files of benchmark results.
+
+    Parameters:
+    - old_path (str): The path of the reference results.
+    - new_path (str): The path of the new results.
+
+    Returns:
+    - DataFrame: For each (helper, n_rows) present in both runs, the ratio (new / old) of each metric.
+    """
+    metrics = ['time_s', 'peak_memory_mb', 'output_bytes']
+
+    with open(old_path) as f:
+        old_results = pd.DataFrame(json.load(f)['results']).set_index(['helper', 'n_rows'])
+    with open(new_path) as f:
+        new_results = pd.DataFrame(json.load(f)['results']).set_index(['helper', 'n_rows'])
+
+    ratios = (new_results[metrics] / old_results[metrics]).dropna(how='all')
+
+    return ratios.add_suffix('_ratio').reset_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    lifecycle_parser = subparsers.add_parser('lifecycle', help='Track the RSS over a long plotting loop')
+    lifecycle_parser.add_argument('--n-plots', type=int, default=2000)
+    lifecycle_parser.add_argument('--n-rows', type=int, default=1000)
+    lifecycle_parser.add_argument('--sample-every', type=int, default=100)
+    lifecycle_parser.add_argument('--output-dir', default=None)
+
+    scaling_parser = subparsers.add_parser('scaling', help='Measure render time, peak memory and output size versus row count')
+    scaling_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 1000000])
+    scaling_parser.add_argument('--helpers', nargs='+', default=None, help="Names such as plot_helpers_html.scatter_html (default: all)")
+    scaling_parser.add_argument('--output', default='plot_helpers_benchmark.json')
+
+    compare_parser = subparsers.add_parser('compare', help='Compare two JSON files of scaling results')
+    compare_parser.add_argument('old_path')
+    compare_parser.add_argument('new_path')
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'lifecycle':
+        memory_usage = figure_lifecycle_benchmark(args.n_plots, args.n_rows, args.sample_every, args.output_dir)
+        print(memory_usage.to_string(index=False))
+        # Compare the end of the loop with the first sample, after the caches of matplotlib are warmed up
+        rss_growth = memory_usage['RSS_MB'].iloc[-1] - memory_usage['RSS_MB'].iloc[0]
+        print(f"RSS growth: {rss_growth:.1f} MB over {args.n_plots} plots")
+
+    elif args.benchmark == 'scaling':
+        results = scaling_benchmark(args.sizes, args.helpers, output=args.output)
+        print(f"Results saved to {args.output}")
+
+    elif args.benchmark == 'compare':
+        print(compare_benchmark_results(args.old_path, args.new_path).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,13 @@ import matplotlib.pyplot as plt
 import numpy as np
 from scipy.stats import pearsonr
 import plotly.express as px
+import plotly.graph_objects as go
 from slugify import slugify
 import pandas as pd
 import os
 import mplcursors
 import mpld3
+from plot_helpers_new import histogram_data, histogram_bin_edges, histogram_counts
 
 def scatter_html(data, x, y, hue=None, title="Scatter Plot", xlabel="X-axis", ylabel="Y-axis", xlim=None, ylim=None, remove_outliers=False, threshold=3, filename=None):
     """
@@ -202,24 +204,30 @@ def line_html(data, x, y, hue=None, title="Line Plot with Error Bars", xlabel="X
     full_filename = os.path.join("images", filename) if filename else "images/line_plot.html"
 
     # Add interactivity using mplcursors
-    mplcursors.cursor(hover=True)
+    mplcursors.cursor(ax, hover=True)
 
     # Save the plot as an HTML file using mpld3
     mpld3.save_html(fig, full_filename)
 
+    # Close the figure once it is saved so that memory stays bounded over many plots
+    plt.close(fig)
+
     return ax
 
 
-def histogram_html(x, data=None, bins='auto', xscale='linear', yscale='linear', title="Histogram",
-              xlabel="Values", ylabel="Frequency", xlim=None, ylim=None, remove_outliers=False, threshold=3, filename=None):
+def histogram_html(x=None, data=None, bins='auto', xscale='linear', yscale='linear', title="Histogram",
+              xlabel="Values", ylabel="Frequency", xlim=None, ylim=None, remove_outliers=False, threshold=3, filename=None,
+              counts=None, bin_edges=None):
     """
-    Create a histogram using Plotly Express.
+    Create a histogram using Plotly from bin counts computed with NumPy.
+
+    Only the bin edges and counts are written to the HTML file, so its size does not grow with the number of samples.
 
     Parameters:
-    - x (array-like): The data for the x-axis.
+    - x (str or array-like, optional): The data for the x-axis (a column name if data is given). Not needed if counts is given.
     - data (DataFrame, optional): The DataFrame containing the data. Default is None.
-    - bins (int, sequence, or str, optional): Specification for the number of bins. Default is 'auto'.
-    - xscale (str, optional): The scale of the x-axis. Default is 'linear'.
+    - bins (int, sequence, or str, optional): Specification for the bins, as accepted by np.histogram_bin_edges. Default is 'auto'.
+    - xscale (str, optional): The scale of the x-axis. If 'log', the bins are spaced evenly in log space. Default is 'linear'.
     - yscale (str, optional): The scale of the y-axis. Default is 'linear'.
     - title (str, optional): The title of the plot. Default is "Histogram".
     - xlabel (str, optional): The label for the x-axis. Default is "Values".
@@ -229,18 +237,25 @@ def histogram_html(x, data=None, bins='auto', xscale='linear', yscale='linear',
     - remove_outliers (bool, optional): Whether to remove outliers. Default is False.
     - threshold (float, optional): The threshold for outlier removal. Default is 3.
     - filename (str, optional): The name of the HTML file to save the plot. Default is "histogram_plot.html".
+    - counts (array-like, optional): Precomputed bin counts (e.g. accumulated over chunks with histogram_counts). Default is None.
+    - bin_edges (array-like, optional): The bin edges corresponding to counts. Required if counts is given. Default is None.
     """
-    if data is not None:
-        if remove_outliers:
-            x = remove_outliers_from_histogram(data[x], threshold)
-        else:
-            x = data[x]
+    if counts is None:
+        x = histogram_data(x, data, remove_outliers, threshold)
+        bin_edges = histogram_bin_edges(x, bins=bins, xscale=xscale)
+        counts = histogram_counts(x, bin_edges)
+    elif bin_edges is None:
+        raise ValueError("bin_edges must be given together with counts")
+
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    counts = np.asarray(counts)
+
+    if xscale == 'log':
+        # Bar widths are not well defined on a log axis, so draw the bars as a filled step outline
+        fig = go.Figure(go.Scatter(x=np.repeat(bin_edges, 2)[1:-1], y=np.repeat(counts, 2),
+                                   mode="lines", fill="tozeroy", line_shape="linear"))
     else:
-        if remove_outliers:
-            x = remove_outliers_from_histogram(x, threshold)
-
-    if bins == 'auto': fig = px.histogram(x)
-    else: fig = px.histogram(x, nbins=bins)
+        fig = go.Figure(go.Bar(x=(bin_edges[:-1] + bin_edges[1:]) / 2, y=counts, width=np.diff(bin_edges)))
 
     fig.update_layout(
         xaxis_title=xlabel,
@@ -330,6 +345,9 @@ def pair_grid_w_p_values_html(data, filename="pair_grid_with_pvalues.html"):
     # Save the plot as an HTML file using mpld3
     mpld3.save_html(g.fig, full_filename)
 
+    # Close the figure once it is saved so that memory stays bounded over many plots
+    plt.close(g.fig)
+
     return g
 
 def display_pvalue(x, y, **kwargs):
@@ -373,19 +391,3 @@ def remove_outliers_from_scatter(x, y, threshold):
     combined_mask = np.logical_and(mask_x, mask_y)
 
     return x[combined_mask], y[combined_mask]
-
-def remove_outliers_from_histogram(data, threshold):
-    """
-    Remove outliers from histogram data.
-
-    Parameters:
-    - data (array-like): The data for the histogram.
-    - threshold (float): The threshold for outlier removal.
-
-    Returns:
-    - Array: Data with outliers removed, according to z-score threshold.
-    """
-    z_scores = np.abs((data - np.mean(data)) / np.std(data))
-    mask = z_scores < threshold
-    
-    return data[mask]
\ No newline at end of file
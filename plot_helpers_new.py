@@ -1,9 +1,18 @@
 import seaborn as sns
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy.stats import pearsonr
 
-def scatter(data, x, y, hue=None, title="Scatter Plot", xlabel="X-axis", ylabel="Y-axis", xlim=None, ylim=None, remove_outliers=False, threshold = 3):
+# In batch mode, figures are never shown: they are saved to a file and/or returned, and closed otherwise
+BATCH_MODE = False
+# The backend used before the batch mode was enabled, restored when it is disabled
+_INTERACTIVE_BACKEND = None
+
+# String bin rules (e.g. 'auto') grow with the number of samples, so they are capped to keep plots and files small
+MAX_HISTOGRAM_BINS = 100
+
+def scatter(data, x, y, hue=None, title="Scatter Plot", xlabel="X-axis", ylabel="Y-axis", xlim=None, ylim=None, remove_outliers=False, threshold = 3, filename=None, return_fig=False):
     """
     Create a scatter plot.
 
@@ -19,8 +28,11 @@ def scatter(data, x, y, hue=None, title="Scatter Plot", xlabel="X-axis", ylabel=
     - ylim (tuple, optional): The limits for the y-axis. Default is None.
     - remove_outliers (bool, optional): Whether to remove outliers. Default is False.
     - threshold (float, optional): The threshold for outlier removal. Default is 3.
+    - filename (str, optional): The file to save the plot to. Default is None (not saved).
+    - return_fig (bool, optional): Whether to return the figure instead of closing it. Default is False.
     """
-    
+    fig = plt.figure()
+
     if remove_outliers:
         
         clean_data=data.copy()
@@ -36,10 +48,10 @@ def scatter(data, x, y, hue=None, title="Scatter Plot", xlabel="X-axis", ylabel=
         plt.xlim(xlim)
     if ylim:
         plt.ylim(ylim)
-    plt.show()
+    return finish_figure(fig, filename, return_fig)
 
 
-def box(data, x, y, labels=None, title="Box Plot", xlabel="Categories", ylabel="Values", ylim=None, log=False):
+def box(data, x, y, labels=None, title="Box Plot", xlabel="Categories", ylabel="Values", ylim=None, log=False, filename=None, return_fig=False):
     """
     Create a box plot.
 
@@ -52,7 +64,10 @@ def box(data, x, y, labels=None, title="Box Plot", xlabel="Categories", ylabel="
     - ylabel (str, optional): The label for the y-axis. Default is "Values".
     - ylim (tuple, optional): The limits for the y-axis. Default is None.
     - log (bool): if True, set y to log(y).
+    - filename (str, optional): The file to save the plot to. Default is None (not saved).
+    - return_fig (bool, optional): Whether to return the figure instead of closing it. Default is False.
     """
+    fig = plt.figure()
 
     if log:
                  
@@ -68,9 +83,9 @@ def box(data, x, y, labels=None, title="Box Plot", xlabel="Categories", ylabel="
     plt.ylabel(ylabel)
     if ylim:
         plt.ylim(ylim)
-    plt.show()
+    return finish_figure(fig, filename, return_fig)
     
-def violin(data, x, y, labels=None, title="Violin Plot", xlabel="Categories", ylabel="Values", ylim=None, log=False):
+def violin(data, x, y, labels=None, title="Violin Plot", xlabel="Categories", ylabel="Values", ylim=None, log=False, filename=None, return_fig=False):
     
     """
     Create a violin plot.
@@ -84,7 +99,10 @@ def violin(data, x, y, labels=None, title="Violin Plot", xlabel="Categories", yl
     - ylabel (str, optional): The label for the y-axis. Default is "Values".
     - ylim (tuple, optional): The limits for the y-axis. Default is None.
     - log (bool): if True, set y to log(y).
+    - filename (str, optional): The file to save the plot to. Default is None (not saved).
+    - return_fig (bool, optional): Whether to return the figure instead of closing it. Default is False.
     """
+    fig = plt.figure()
 
     if log:
                  
@@ -100,9 +118,9 @@ def violin(data, x, y, labels=None, title="Violin Plot", xlabel="Categories", yl
     plt.ylabel(ylabel)
     if ylim:
         plt.ylim(ylim)
-    plt.show()
+    return finish_figure(fig, filename, return_fig)
 
-def line(data, x, y, hue=None, title="Line Plot with Error Bars", xlabel="X-axis", ylabel="Y-axis", remove_outliers=False,threshold = 3, xlim=None, ylim=None):
+def line(data, x, y, hue=None, title="Line Plot with Error Bars", xlabel="X-axis", ylabel="Y-axis", remove_outliers=False,threshold = 3, xlim=None, ylim=None, filename=None, return_fig=False):
     """
     Create a line plot with error bars.
 
@@ -118,7 +136,11 @@ def line(data, x, y, hue=None, title="Line Plot with Error Bars", xlabel="X-axis
     - threshold (float, optional): The threshold for outlier removal. Default is 3.
     - xlim (tuple, optional): The limits for the x-axis. Default is None.
     - ylim (tuple, optional): The limits for the y-axis. Default is None.
+    - filename (str, optional): The file to save the plot to. Default is None (not saved).
+    - return_fig (bool, optional): Whether to return the figure instead of closing it. Default is False.
     """
+    fig = plt.figure()
+
     if remove_outliers:
         clean_data=data.copy()
         clean_data[x],clean_data[y]=remove_outliers_from_scatter(clean_data[x],clean_data[y], threshold)
@@ -136,34 +158,47 @@ def line(data, x, y, hue=None, title="Line Plot with Error Bars", xlabel="X-axis
     if xlim:
         plt.xlim(xlim)
     plt.legend()
-    plt.show()
+    fig = finish_figure(fig, filename, return_fig)
 
-    return ax
+    return fig if return_fig else ax
 
-def histogram(x, data=None, bins='auto', xscale='linear', yscale='linear', title="Histogram",
-              xlabel="Values", ylabel="Frequency", xlim=None, ylim=None, remove_outliers=False, threshold=3):
+def histogram(x=None, data=None, bins='auto', xscale='linear', yscale='linear', title="Histogram",
+              xlabel="Values", ylabel="Frequency", xlim=None, ylim=None, remove_outliers=False, threshold=3,
+              counts=None, bin_edges=None, filename=None, return_fig=False):
     """
-    Create a line plot with error bars.
+    Create a histogram from bin counts computed with NumPy.
 
     Parameters:
-    - x (array-like): The data for the x-axis.
-    - y (array-like): The data for the y-axis.
-    - title (str, optional): The title of the plot. Default is "Line Plot with Error Bars".
-    - xlabel (str, optional): The label for the x-axis. Default is "X-axis".
-    - ylabel (str, optional): The label for the y-axis. Default is "Y-axis".
-    - error_bars (bool, optional): Whether to include error bars. Default is True.
+    - x (str or array-like, optional): The data for the x-axis (a column name if data is given). Not needed if counts is given.
+    - data (DataFrame, optional): The DataFrame containing the data. Default is None.
+    - bins (int, sequence, or str, optional): Specification for the bins, as accepted by np.histogram_bin_edges. Default is 'auto'.
+    - xscale (str, optional): The scale of the x-axis. If 'log', the bins are spaced evenly in log space. Default is 'linear'.
+    - yscale (str, optional): The scale of the y-axis. Default is 'linear'.
+    - title (str, optional): The title of the plot. Default is "Histogram".
+    - xlabel (str, optional): The label for the x-axis. Default is "Values".
+    - ylabel (str, optional): The label for the y-axis. Default is "Frequency".
+    - xlim (tuple, optional): The limits for the x-axis. Default is None.
+    - ylim (tuple, optional): The limits for the y-axis. Default is None.
+    - remove_outliers (bool, optional): Whether to remove outliers. Default is False.
+    - threshold (float, optional): The threshold for outlier removal. Default is 3.
+    - counts (array-like, optional): Precomputed bin counts (e.g. accumulated over chunks with histogram_counts). Default is None.
+    - bin_edges (array-like, optional): The bin edges corresponding to counts. Required if counts is given. Default is None.
+    - filename (str, optional): The file to save the plot to. Default is None (not saved).
+    - return_fig (bool, optional): Whether to return the figure instead of closing it. Default is False.
     """
+    fig = plt.figure()
 
-    if data is not None:
-        if remove_outliers:
-            x = remove_outliers_from_histogram(data[x], threshold)
-        else:
-            x = data[x]
-    else:
-        if remove_outliers:
-            x = remove_outliers_from_histogram(x, threshold)
+    if counts is None:
+        x = histogram_data(x, data, remove_outliers, threshold)
+        bin_edges = histogram_bin_edges(x, bins=bins, xscale=xscale)
+        counts = histogram_counts(x, bin_edges)
+    elif bin_edges is None:
+        raise ValueError("bin_edges must be given together with counts")
+
+    bin_edges = np.asarray(bin_edges, dtype=float)
 
-    sns.histplot(x, bins=bins, kde=False)
+    # Only the counts are drawn: each bin becomes one weighted sample at its left edge
+    sns.histplot(x=bin_edges[:-1], weights=np.asarray(counts), bins=bin_edges, kde=False)
     plt.title(title)
     plt.xscale(xscale)
     plt.yscale(yscale)
@@ -173,9 +208,89 @@ def histogram(x, data=None, bins='auto', xscale='linear', yscale='linear', title
         plt.xlim(xlim)
     if ylim:
         plt.ylim(ylim)
-    plt.show()
+    return finish_figure(fig, filename, return_fig)
 
-def pie_chart(data, labels, title="Pie Chart",startangle = 0,pctdistance=0.85):
+def histogram_data(x, data=None, remove_outliers=False, threshold=3):
+    """
+    Select the samples of a histogram and optionally remove their outliers.
+
+    Parameters:
+    - x (str or array-like): The data for the x-axis (a column name if data is given).
+    - data (DataFrame, optional): The DataFrame containing the data. Default is None.
+    - remove_outliers (bool, optional): Whether to remove outliers. Default is False.
+    - threshold (float, optional): The threshold for outlier removal. Default is 3.
+
+    Returns:
+    - Array-like: The samples to be binned.
+    """
+    if data is not None:
+        x = data[x]
+    if remove_outliers:
+        x = remove_outliers_from_histogram(x, threshold)
+
+    return x
+
+def histogram_bin_edges(x, bins='auto', xscale='linear', value_range=None):
+    """
+    Compute histogram bin edges with NumPy.
+
+    For xscale='log' the edges are computed on log10 of the positive samples, so that
+    the bins have equal widths on a logarithmic axis.
+
+    To bin a dataset which does not fit in memory, pass an integer number of bins and the
+    value_range of the full dataset, and then accumulate the counts chunk by chunk with
+    histogram_counts.
+
+    Parameters:
+    - x (array-like): The samples to be binned (can be empty if value_range is given).
+    - bins (int, sequence, or str, optional): Specification for the bins, as accepted by np.histogram_bin_edges. A string rule gives at most MAX_HISTOGRAM_BINS bins. Default is 'auto'.
+    - xscale (str, optional): The scale of the x-axis ('linear' or 'log'). Default is 'linear'.
+    - value_range (tuple, optional): The (min, max) range of the bins. Default is None (range of the samples).
+
+    Returns:
+    - Array: The bin edges.
+    """
+    x = np.asarray(x, dtype=float)
+    x = x[np.isfinite(x)]
+
+    if not isinstance(bins, (int, np.integer, str)):
+        # Explicit edges are used as they are
+        return np.asarray(bins, dtype=float)
+
+    value_range = np.log10(value_range) if xscale == 'log' and value_range is not None else value_range
+    if xscale == 'log':
+        x = np.log10(x[x > 0])
+
+    bin_edges = np.histogram_bin_edges(x, bins=bins, range=value_range)
+    if isinstance(bins, str) and len(bin_edges) - 1 > MAX_HISTOGRAM_BINS:
+        bin_edges = np.histogram_bin_edges(x, bins=MAX_HISTOGRAM_BINS, range=value_range)
+
+    return 10 ** bin_edges if xscale == 'log' else bin_edges
+
+def histogram_counts(x, bin_edges, counts=None):
+    """
+    Count the samples falling in each bin.
+
+    Samples outside of the bin edges are ignored. If counts is given, the new counts are
+    added to it, which allows building a histogram incrementally over chunks of a dataset.
+
+    Parameters:
+    - x (array-like): The samples to be binned.
+    - bin_edges (array-like): The bin edges (e.g. from histogram_bin_edges).
+    - counts (array-like, optional): The counts accumulated so far. Default is None.
+
+    Returns:
+    - Array: The (accumulated) counts of each bin.
+    """
+    x = np.asarray(x, dtype=float)
+    chunk_counts, _ = np.histogram(x[np.isfinite(x)], bins=bin_edges)
+
+    if counts is None:
+        return chunk_counts
+
+    return np.asarray(counts) + chunk_counts
+
+def pie_chart(data, labels, title="Pie Chart",startangle = 0,pctdistance=0.85, filename=None, return_fig=False):
     """
     Create a pie chart.
 
@@ -185,12 +300,16 @@ def pie_chart(data, labels, title="Pie Chart",startangle = 0,pctdistance=0.85):
     - title (str, optional): The title of the plot. Default is "Pie Chart".
     - startangle (float, optional): The starting angle of the pie chart. Default is 0.
     - pctdistance (float, optional): The distance from the center to label the percentages. Default is 0.85.
+    - filename (str, optional): The file to save the plot to. Default is None (not saved).
+    - return_fig (bool, optional): Whether to return the figure instead of closing it. Default is False.
     """
+    fig = plt.figure()
+
     plt.pie(data, labels=labels, autopct='%1.1f%%', startangle=startangle,pctdistance=pctdistance)
     plt.title(title)
-    plt.show()
+    return finish_figure(fig, filename, return_fig)
 
-def pair_grid_w_p_values(data, filename):
+def pair_grid_w_p_values(data, filename, return_fig=False):
     """
     Create a PairGrid with scatter plots in the upper triangle, histograms in the diagonal,
     and display p-values for Pearson correlation in the lower triangle.
@@ -198,6 +317,7 @@ def pair_grid_w_p_values(data, filename):
     Parameters:
     - data (DataFrame): The DataFrame containing the data for the PairGrid.
     - filename (str): Name of the file for the plot
+    - return_fig (bool, optional): Whether to return the PairGrid instead of closing its figure. Default is False.
     """
     # Create a PairGrid and map p-values
     g = sns.PairGrid(data)
@@ -213,10 +333,58 @@ def pair_grid_w_p_values(data, filename):
     # Add a title
     g.fig.suptitle("Scatter Plot Matrix for Music Features", y=1.02)
 
-    # Show the plot
-    plt.show()
-    
-    plt.savefig(filename)
+    # Save the plot before showing it, since showing it can clear the figure
+    finish_figure(g.fig, filename, return_fig)
+
+    if return_fig:
+        return g
+
+def set_batch_mode(enabled=True):
+    """
+    Enable or disable the headless batch mode.
+
+    In batch mode the non-interactive Agg backend is used and the plots are never shown,
+    so that scripted runs don't block. The plots are saved (if a filename is given) and/or
+    returned (if return_fig is True), and their figures are closed otherwise. Disabling it
+    restores the backend which was in use when it was enabled.
+
+    Parameters:
+    - enabled (bool, optional): Whether to enable the batch mode. Default is True.
+    """
+    global BATCH_MODE, _INTERACTIVE_BACKEND
+
+    if enabled and not BATCH_MODE:
+        _INTERACTIVE_BACKEND = matplotlib.get_backend()
+        plt.switch_backend("Agg")
+    elif not enabled and BATCH_MODE and _INTERACTIVE_BACKEND is not None:
+        plt.switch_backend(_INTERACTIVE_BACKEND)
+        _INTERACTIVE_BACKEND = None
+
+    BATCH_MODE = enabled
+
+def finish_figure(fig, filename=None, return_fig=False):
+    """
+    Save, show and close a figure created by one of the plot helpers.
+
+    Parameters:
+    - fig (Figure): The figure to finish.
+    - filename (str, optional): The file to save the figure to. Default is None (not saved).
+    - return_fig (bool, optional): Whether to return the figure instead of closing it. Default is False.
+
+    Returns:
+    - Figure or None: The figure if return_fig is True, None otherwise (the figure is then closed).
+    """
+    if filename is not None:
+        fig.savefig(filename, bbox_inches="tight")
+
+    if not BATCH_MODE:
+        plt.show()
+
+    if return_fig:
+        return fig
+
+    # Release the figure so that memory stays bounded over many plots
+    plt.close(fig)
 
 def display_pvalue(x, y, **kwargs):
     """
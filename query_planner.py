@@ -0,0 +1,316 @@
+"""
+Adaptive planner of the Spotify album searches of the scraper (the tiers of MOVIE_ALBUM_SEARCH_TIERS).
+
+Most movies have no soundtrack on Spotify, and each of them costs one search per tier. The planner decides,
+before searching a movie, which tiers to issue and in which order, from cheap signals of the movie (number of
+words of the title, release year relative to the 2015 cutoff, country and language) and from the success rate of
+each tier observed so far for movies with the same signals:
+    - tiers whose estimated success rate is below min_success_rate are skipped, once enough movies with the
+      same signals have been searched with them (min_attempts),
+    - the remaining tiers are issued in the default order (or by decreasing estimated success rate if reorder is
+      True, which can select a different album than the default order), within a per-movie budget of search calls,
+    - a fraction explore_rate of the movies is searched with all the tiers in the default order, so that the
+      success rates of the skipped tiers keep being measured.
+
+The success rates are smoothed towards the rate of the tier over all the movies, itself smoothed towards a prior.
+Every decision is kept in the decisions list (and printed if verbose).
+
+A fixture corpus (JSON lines, one movie per line with the URI selected by each tier, see record_fixture) can be
+replayed to compare the calls saved by the planner with the albums it loses, without calling Spotify.
+
+Usage:
+    python query_planner.py fixture.jsonl --call-budget 3 --min-success-rate 0.01
+"""
+
+import argparse
+import datetime
+import json
+import random
+import numpy as np
+from movie_music_aggregation import label_list
+from spotify_scraper import MOVIE_ALBUM_SEARCH_TIERS, select_movie_album
+
+RELEASE_DATE_CUTOFF = datetime.datetime.strptime('2015', '%Y')
+
+ENGLISH_SPEAKING_COUNTRIES = {'United States of America', 'United Kingdom', 'Canada', 'Australia', 'Ireland', 'New Zealand'}
+ENGLISH_LANGUAGE = 'English Language'
+
+#Prior success rate of a tier, and its weight (in number of movies) in the smoothed success rates
+PRIOR_SUCCESS_RATE = 0.05
+PRIOR_STRENGTH = 20
+
+
+def title_length_signal(movie_name):
+    """
+    Return the title length bucket of a movie name (in words).
+    """
+    n_words = len(movie_name.split())
+
+    return '1' if n_words <= 1 else '2-3' if n_words <= 3 else '4+'
+
+
+def release_year_signal(movie_release_date, release_date_cutoff=RELEASE_DATE_CUTOFF):
+    """
+    Return the release year bucket of a movie (release date as a datetime of the release year, or NaN).
+    """
+    if movie_release_date != movie_release_date:
+        return 'unknown'
+    if movie_release_date > release_date_cutoff:
+        return 'after_cutoff'
+    if movie_release_date.year >= 1990:
+        return '1990-cutoff'
+    if movie_release_date.year >= 1970:
+        return '1970-1989'
+    return 'before_1970'
+
+
+def movie_labels_from_metadata(movie_metadata_df):
+    """
+    Return the countries and languages of each movie (e.g. from load_movie_metadata in dataset_pipeline.py).
+
+    Returns:
+    - Dict: Maps each Wikipedia movie ID to the tuple (countries, languages).
+    """
+    return {movie_id: (label_list(countries), label_list(languages))
+            for movie_id, countries, languages in zip(movie_metadata_df['Wikipedia_Movie_ID'],
+                                                      movie_metadata_df['Movie_Countries'],
+                                                      movie_metadata_df['Movie_Languages'])}
+
+
+class QueryPlanner:
+    """
+    Planner of the search tiers of each movie, learning the success rate of each tier per movie signals.
+    """
+
+    def __init__(self, movie_labels=None, call_budget=len(MOVIE_ALBUM_SEARCH_TIERS), min_success_rate=0.01, min_attempts=50,
+                 explore_rate=0.05, reorder=False, seed=0, verbose=False):
+        """
+        Parameters:
+        - movie_labels (dict, optional): Maps Wikipedia movie IDs to their (countries, languages) (see movie_labels_from_metadata). Default is None (unknown).
+        - call_budget (int, optional): The maximum number of search calls per movie. Default is the number of tiers.
+        - min_success_rate (float, optional): Tiers with a lower estimated success rate are skipped. Default is 0.01.
+        - min_attempts (int, optional): The number of searches of a tier for movies with the same signals before it can be skipped. Default is 50.
+        - explore_rate (float, optional): The fraction of the movies searched with all the tiers in the default order. Default is 0.05.
+        - reorder (bool, optional): Whether to issue the tiers by decreasing estimated success rate instead of the default order. Default is False (the tiers which are issued select the same album as without the planner).
+        - seed (int, optional): The seed of the exploration. Default is 0.
+        - verbose (bool, optional): Whether to print every decision. Default is False.
+        """
+        self.movie_labels = movie_labels if movie_labels is not None else {}
+        self.call_budget = call_budget
+        self.min_success_rate = min_success_rate
+        self.min_attempts = min_attempts
+        self.explore_rate = explore_rate
+        self.reorder = reorder
+        self.random = random.Random(seed)
+        self.verbose = verbose
+
+        n_tiers = len(MOVIE_ALBUM_SEARCH_TIERS)
+        self.tier_attempts = np.zeros(n_tiers, dtype=np.int64)
+        self.tier_successes = np.zeros(n_tiers, dtype=np.int64)
+        #Attempts and successes of each tier per signals
+        self.attempts = {}
+        self.successes = {}
+
+        self.decisions = []
+
+    def movie_signals(self, movie_wikipedia_id, movie_name, movie_release_date, countries=None, languages=None):
+        """
+        Return the signals of a movie.
+
+        Parameters:
+        - movie_wikipedia_id: The Wikipedia ID of the movie.
+        - movie_name (str): The name of the movie.
+        - movie_release_date (datetime or NaN): The release date (year) of the movie.
+        - countries (list of str, optional): The countries of the movie. Default is None (from movie_labels).
+        - languages (list of str, optional): The languages of the movie. Default is None (from movie_labels).
+
+        Returns:
+        - Tuple: The title length, release year, country and language signals.
+        """
+        known_countries, known_languages = self.movie_labels.get(movie_wikipedia_id, ([], []))
+        countries = known_countries if countries is None else countries
+        languages = known_languages if languages is None else languages
+
+        country = 'unknown' if not countries else 'english' if ENGLISH_SPEAKING_COUNTRIES.intersection(countries) else 'other'
+        language = 'unknown' if not languages else 'english' if ENGLISH_LANGUAGE in languages else 'other'
+
+        return (title_length_signal(movie_name), release_year_signal(movie_release_date), country, language)
+
+    def success_rate(self, signals, tier):
+        """
+        Return the estimated success rate of a tier for movies with the given signals.
+        """
+        tier_rate = (self.tier_successes[tier] + PRIOR_STRENGTH * PRIOR_SUCCESS_RATE) / (self.tier_attempts[tier] + PRIOR_STRENGTH)
+
+        attempts = self.attempts.get(signals, np.zeros(len(MOVIE_ALBUM_SEARCH_TIERS), dtype=np.int64))[tier]
+        successes = self.successes.get(signals, np.zeros(len(MOVIE_ALBUM_SEARCH_TIERS), dtype=np.int64))[tier]
+
+        return (successes + PRIOR_STRENGTH * tier_rate) / (attempts + PRIOR_STRENGTH)
+
+    def plan(self, signals, movie_wikipedia_id=None):
+        """
+        Decide which tiers to issue for a movie, and in which order.
+
+        Parameters:
+        - signals (tuple): The signals of the movie (see movie_signals).
+        - movie_wikipedia_id (optional): The Wikipedia ID of the movie, for the decision log. Default is None.
+
+        Returns:
+        - List of int: The positions (in MOVIE_ALBUM_SEARCH_TIERS) of the tiers to issue, in order.
+        """
+        n_tiers = len(MOVIE_ALBUM_SEARCH_TIERS)
+        rates = [self.success_rate(signals, tier) for tier in range(n_tiers)]
+        attempts = self.attempts.get(signals, np.zeros(n_tiers, dtype=np.int64))
+
+        explore = self.random.random() < self.explore_rate
+
+        if explore:
+            tiers = list(range(n_tiers))
+        else:
+            tiers = [tier for tier in range(n_tiers) if attempts[tier] < self.min_attempts or rates[tier] >= self.min_success_rate]
+            if self.reorder:
+                tiers = sorted(tiers, key=lambda tier: -rates[tier])
+            tiers = tiers[:self.call_budget]
+
+        decision = {'movie_wikipedia_id': movie_wikipedia_id,
+                    'signals': signals,
+                    'success_rates': [round(float(rate), 4) for rate in rates],
+                    'tiers': tiers,
+                    'skipped': [tier for tier in range(n_tiers) if tier not in tiers],
+                    'explore': explore}
+        self.decisions.append(decision)
+        if self.verbose:
+            print(decision)
+
+        return tiers
+
+    def record(self, signals, tier, success):
+        """
+        Record the outcome of a search of a tier for a movie with the given signals.
+        """
+        n_tiers = len(MOVIE_ALBUM_SEARCH_TIERS)
+
+        self.tier_attempts[tier] += 1
+        self.attempts.setdefault(signals, np.zeros(n_tiers, dtype=np.int64))[tier] += 1
+
+        if success:
+            self.tier_successes[tier] += 1
+            self.successes.setdefault(signals, np.zeros(n_tiers, dtype=np.int64))[tier] += 1
+
+
+def record_fixture(movie_wikipedia_id_net, movie_name_net, movie_release_date_net, path, movie_labels=None):
+    """
+    Search Spotify with every tier for each movie and append the selected album URIs to a fixture corpus.
+
+    Parameters:
+    - movie_wikipedia_id_net (list): The Wikipedia IDs of the movies.
+    - movie_name_net (list of str): The names of the movies.
+    - movie_release_date_net (list of str): The release dates of the movies (NaN if unknown).
+    - path (str): The path of the fixture corpus (JSON lines).
+    - movie_labels (dict, optional): Maps Wikipedia movie IDs to their (countries, languages). Default is None.
+    """
+    import spotipy
+    from spotipy.oauth2 import SpotifyClientCredentials
+    from config import SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_SECRET
+
+    spotify = spotipy.Spotify(client_credentials_manager=SpotifyClientCredentials(SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_SECRET))
+    movie_labels = movie_labels if movie_labels is not None else {}
+
+    with open(path, 'a') as f:
+        for movie_wikipedia_id, movie_name, movie_release_date in zip(movie_wikipedia_id_net, movie_name_net, movie_release_date_net):
+            release_year = movie_release_date[:4] if movie_release_date == movie_release_date else None
+            release_date = datetime.datetime.strptime(release_year, '%Y') if release_year else np.nan
+
+            try:
+                tier_uris = []
+                for movie_name_suffix, check_keywords in MOVIE_ALBUM_SEARCH_TIERS:
+                    movie_album_results = spotify.search(q='album:' + movie_name + movie_name_suffix, type='album')['albums']['items']
+                    movie_album_URI = select_movie_album(movie_album_results, movie_name, release_date, RELEASE_DATE_CUTOFF, check_keywords)
+                    tier_uris.append(movie_album_URI if movie_album_URI == movie_album_URI else None)
+            except Exception:
+                #Movies with scraping errors (rate limits, connection errors) are left out of the fixture
+                continue
+
+            countries, languages = movie_labels.get(movie_wikipedia_id, ([], []))
+            f.write(json.dumps({'movie_wikipedia_id': int(movie_wikipedia_id), 'movie_name': movie_name, 'release_year': release_year,
+                                'countries': countries, 'languages': languages, 'tier_uris': tier_uris}) + '\n')
+
+
+def load_fixture(path):
+    """
+    Load a fixture corpus written by record_fixture.
+    """
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay_fixture(fixture, planner):
+    """
+    Replay a fixture corpus with a planner (learning from the outcomes as during a scrape), and compare it with searching all the tiers in order.
+
+    Parameters:
+    - fixture (list of dicts): The fixture corpus (see load_fixture).
+    - planner (QueryPlanner): The planner.
+
+    Returns:
+    - Dict: The number of movies, the search calls of the default order and of the planner, the calls saved, the albums found by the default order and by the planner, and the albums lost (or changed) by the planner.
+    """
+    baseline_calls = planner_calls = 0
+    baseline_albums = planner_albums = albums_lost = albums_changed = 0
+
+    for entry in fixture:
+        tier_uris = entry['tier_uris']
+
+        #Default order: all the tiers, until one selects an album
+        baseline_uri = None
+        for uri in tier_uris:
+            baseline_calls += 1
+            if uri is not None:
+                baseline_uri = uri
+                break
+
+        release_date = datetime.datetime.strptime(entry['release_year'], '%Y') if entry['release_year'] else np.nan
+        signals = planner.movie_signals(entry['movie_wikipedia_id'], entry['movie_name'], release_date, entry['countries'], entry['languages'])
+
+        planner_uri = None
+        for tier in planner.plan(signals, entry['movie_wikipedia_id']):
+            planner_calls += 1
+            planner.record(signals, tier, tier_uris[tier] is not None)
+            if tier_uris[tier] is not None:
+                planner_uri = tier_uris[tier]
+                break
+
+        baseline_albums += baseline_uri is not None
+        planner_albums += planner_uri is not None
+        albums_lost += baseline_uri is not None and planner_uri is None
+        albums_changed += baseline_uri is not None and planner_uri is not None and planner_uri != baseline_uri
+
+    return {'movies': len(fixture),
+            'baseline_calls': baseline_calls,
+            'planner_calls': planner_calls,
+            'calls_saved': baseline_calls - planner_calls,
+            'calls_saved_rate': (baseline_calls - planner_calls) / baseline_calls if baseline_calls else float('nan'),
+            'baseline_albums': baseline_albums,
+            'planner_albums': planner_albums,
+            'albums_lost': albums_lost,
+            'albums_lost_rate': albums_lost / baseline_albums if baseline_albums else float('nan'),
+            'albums_changed': albums_changed}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay a fixture corpus of Spotify searches with the query planner')
+    parser.add_argument('fixture', help='Path of the fixture corpus (JSON lines, see record_fixture)')
+    parser.add_argument('--call-budget', type=int, default=len(MOVIE_ALBUM_SEARCH_TIERS))
+    parser.add_argument('--min-success-rate', type=float, default=0.01)
+    parser.add_argument('--min-attempts', type=int, default=50)
+    parser.add_argument('--explore-rate', type=float, default=0.05)
+    parser.add_argument('--reorder', action='store_true', help='Issue the tiers by decreasing estimated success rate')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='Print every decision')
+    args = parser.parse_args()
+
+    planner = QueryPlanner(call_budget=args.call_budget, min_success_rate=args.min_success_rate, min_attempts=args.min_attempts,
+                           explore_rate=args.explore_rate, reorder=args.reorder, seed=args.seed, verbose=args.verbose)
+
+    for name, value in replay_fixture(load_fixture(args.fixture), planner).items():
+        print(f"{name}: {value}")
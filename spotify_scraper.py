@@ -16,7 +16,93 @@ from spotipy.oauth2 import SpotifyClientCredentials
 from config import SPOTIPY_CLIENT_ID, SPOTIPY_CLIENT_SECRET
 
 
-def movie_music_data_spotify_scraper(movie_wikipedia_id_net, movie_name_net, movie_release_date_net):
+#Suffixes commonly used for original movie albums on Spotify, searched in this order
+#The last tier searches for the movie name alone and checks for the keywords 'Original', 'Motion Picture', 'Soundtrack' and 'Score' in the album name instead
+MOVIE_ALBUM_SEARCH_TIERS = [('(Original Motion Picture Soundtrack)', False),
+    ('(Music from the Motion Picture)', False),
+    ('(Original Motion Picture Score)', False),
+    ('', True)]
+
+MOVIE_ALBUM_KEYWORDS = r'Original|Motion\sPicture|Soundtrack|Score'
+
+
+def select_movie_album(movie_album_results, movie_name, movie_release_date, release_date_cutoff, check_keywords=False):
+    
+    """
+    Function that selects the correct movie album among the albums of a Spotify search response
+    
+    Arguments:
+        movie_album_results: List of albums (dicts with the 'name', 'release_date' and 'uri' of each album) returned by the Spotify search
+        movie_name: Name of the movie
+        movie_release_date: Release date (datetime of the release year) of the movie, or NaN if unknown
+        release_date_cutoff: Albums released after this date (datetime) are not selected
+        check_keywords: Whether the album name (without the movie name) must also contain one of the MOVIE_ALBUM_KEYWORDS
+        
+    Returns:
+        movie_album_URI: URI of the selected movie album, or NaN if no album is selected
+    """
+    
+    movie_name_lowercased = movie_name.lower()
+    movie_album_URI = np.nan
+    
+    #If we find any movie albums, only then do we try to find the URI for the correct movie album
+    if len(movie_album_results) == 0:
+        return movie_album_URI
+    
+    movie_album_release_date_net = []
+    movie_album_URI_net = []
+    
+    #First, select only the movie albums which satisfy the required criteria of name and release date cutoff
+    for movie_album in movie_album_results:
+        movie_album_name = movie_album['name'].lower()
+        #Ensure that the movie name is in the album name (case insensitive)
+        if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
+            if check_keywords:
+                #Remove movie name from the album name to avoid any overlap in words in the movie name and the keyword set used for extracting the albums
+                movie_album_name = re.sub(rf'{movie_name_lowercased}','',movie_album_name)
+                #Check whether any of the keywords are present in the album name
+                if not re.search(MOVIE_ALBUM_KEYWORDS,rf'{movie_album_name}',flags = re.I):
+                    continue
+            movie_album_release_date = datetime.datetime.strptime(movie_album['release_date'][:4],'%Y')
+            #Ensure that the movie album's release date is less than the release date cutoff
+            if movie_album_release_date <= release_date_cutoff:
+                #Store the URIs of the albums and their corresponding release dates
+                movie_album_release_date_net.append(movie_album_release_date)
+                movie_album_URI_net.append(movie_album['uri'])
+    
+    #Only 1 movie album is found: Simple Case
+    if len(movie_album_results) == 1:
+        if len(movie_album_URI_net) != 0:
+            movie_album_URI = movie_album_URI_net[0]
+    
+    #More than 1 movie album is found: Complex Case
+    #Check if we have movie albums to select from
+    elif len(movie_album_release_date_net) != 0:
+        
+        #Selecting the correct album via comparison with the movie's release date is only possible if the movie does have a release date in the first place.
+        #Check for this first
+        if movie_release_date == movie_release_date:
+            #Compute the difference in the release dates of the movie and the movie albums retrieved from Spotify (after having performed an initial selection)
+            movie_music_release_date_diff_net = np.array([abs(movie_release_date - movie_album_release_date) for movie_album_release_date in movie_album_release_date_net])
+            #Identify the album(s) having the release date closest to the release date of the movie.
+            best_movie_album_match_idx_net = np.where(movie_music_release_date_diff_net == min(movie_music_release_date_diff_net))[0]
+            #More than 1 Album with Minimum Release Date Difference ==> Proceed with storing the Index of any movie album (randomly selected) from best_movie_album_match_idx_net
+            if len(best_movie_album_match_idx_net) > 1:
+                best_movie_album_match_idx = random.choice(best_movie_album_match_idx_net)
+            #Only 1 Album with Minimum Release Date Difference ==> Proceed with storing its Index
+            else:
+                best_movie_album_match_idx = best_movie_album_match_idx_net[0]
+            movie_album_URI = movie_album_URI_net[best_movie_album_match_idx]
+            
+        else:
+            #If we don't have the movie's release date, we can't make comparisons with the album release dates and hence, we select an album at random
+            movie_album_URI_net = [movie_album['uri'] for movie_album in movie_album_results]
+            movie_album_URI = random.choice(movie_album_URI_net)
+    
+    return movie_album_URI
+
+
+def movie_music_data_spotify_scraper(movie_wikipedia_id_net, movie_name_net, movie_release_date_net, album_catalog=None, row_callback=None, query_planner=None):
     
     """
     Function that scrapes music data from Spotify corresponding to the movies data in the movies_metadata dataset from the CMU Movie Summary Corpus
@@ -25,6 +111,9 @@ def movie_music_data_spotify_scraper(movie_wikipedia_id_net, movie_name_net, mov
         movie_wikipedia_id_net: List of Wikipedia IDs of the movies in the movies_metadata dataset (To be used when merging the Spotify dataset with the movies_metadata dataset)
         movie_name_net: List of names of movies in the movies_metadata dataset (For retrieving corresponding album data from Spotify)
         movie_release_date_net: List of release dates of movies in the movies_metadata dataset (For selecting the correct album while retrieving album data from Spotify)
+        album_catalog: Optional AlbumCatalog (album_catalog.py) accumulating all the albums seen in the search responses, which is checked before searching Spotify for each movie
+        row_callback: Optional function called with each track dict as soon as the tracks of its movie are scraped (e.g. CorrelationAccumulator.update_row from correlation_accumulator.py)
+        query_planner: Optional QueryPlanner (query_planner.py) deciding which search tiers to issue for each movie, and in which order (the tiers keep the default order unless the planner is created with reorder=True, in which case a later tier may be issued first and select a different album)
         
     Returns: 
         movie_music_df: Dataframe containing the Album and corresponding Track Related Data of the Music (in the Movies) from Spotify
@@ -72,12 +161,8 @@ def movie_music_data_spotify_scraper(movie_wikipedia_id_net, movie_name_net, mov
     #Loop over the movies
     for ctr, (movie_name, movie_release_date) in enumerate(zip(movie_name_net, movie_release_date_net)):
         
-        #Lowercase the movie name
-        movie_name_lowercased = movie_name.lower()
-
         #Initialization
         movie_album_URI = np.nan
-        flag = 0
 
         if movie_release_date == movie_release_date: #testing for non-NaNs
             #Convert the release date only to the release year for comparison since a lot of albums on Spotify only have the release year mentioned
@@ -93,236 +178,44 @@ def movie_music_data_spotify_scraper(movie_wikipedia_id_net, movie_name_net, mov
         #If we don't retrieve any movie album info even after performing all these checks, we conclude that the required official movie album doesn't exist on Spotify or that the movie didn't have any music in the first place
         
         
-        #Check for movie album with the 1st suffix
-        movie_name_suffix = '(Original Motion Picture Soundtrack)'
-        movie_album_results = spotify.search(q='album:' + movie_name + movie_name_suffix, type='album')['albums']['items']
-        
-        #If we find any movie albums, only then do we try to find the URI for the correct movie album
-        if len(movie_album_results) != 0:
+        #Try to resolve the movie against the albums already seen in previous search responses first
+        if album_catalog is not None:
+            movie_album_URI = album_catalog.resolve(movie_name, movie_release_date, release_date_cutoff)
+
+        #Search Spotify only if the album catalog didn't resolve the movie, trying the suffixes in order and finally the keywords
+        if movie_album_URI != movie_album_URI:
             
-            #Only 1 movie album is found: Simple Case
-            if len(movie_album_results) == 1:
-                movie_album_name = movie_album_results[0]['name'].lower()
-                #Ensure that the movie name is in the album name (case insensitive)
-                if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                    movie_album_release_date = datetime.datetime.strptime(movie_album_results[0]['release_date'][:4],'%Y')
-                    #Ensure that the movie album's release date is less than the release date cutoff
-                    if movie_album_release_date <= release_date_cutoff:
-                        flag = 1
-                        #Store the URI of the movie's album
-                        movie_album_URI = movie_album_results[0]['uri']
-                        
-            #More than 1 movie album is found: Complex Case
+            #Let the query planner skip (or reorder) the tiers which are unlikely to resolve this movie
+            if query_planner is not None:
+                movie_signals = query_planner.movie_signals(movie_wikipedia_id_net[ctr], movie_name, movie_release_date)
+                search_tiers = query_planner.plan(movie_signals, movie_wikipedia_id_net[ctr])
             else:
-                
-                movie_album_name_net = [movie_album['name'] for movie_album in movie_album_results]
-                movie_album_release_date_net = []
-                movie_album_URI_net = []
-                
-                #First, select only the movie albums which satisfy the required criteria of name and release date cutoff
-                for movie_album in movie_album_results:
-                    movie_album_name = movie_album['name'].lower()
-                    #Ensure that the movie name is in the album name (case insensitive)
-                    if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                        movie_album_release_date = datetime.datetime.strptime(movie_album['release_date'][:4],'%Y')
-                        #Ensure that the movie album's release date is less than the release date cutoff
-                        if movie_album_release_date <= release_date_cutoff:
-                            #Store the URIs of the albums and their corresponding release dates
-                            movie_album_release_date_net.append(movie_album_release_date)
-                            movie_album_URI_net.append(movie_album['uri'])
-                
-                #Check if we have movie albums to select from
-                if len(movie_album_release_date_net) != 0:
-                    
-                    flag = 1
-                    
-                    #Selecting the correct album via comparison with the movie's release date is only possible if the movie does have a release date in the first place.
-                    #Check for this first
-                    if movie_release_date == movie_release_date:
-                        #Compute the difference in the release dates of the movie and the movie albums retrieved from Spotify (after having performed an initial selection)
-                        movie_music_release_date_diff_net = np.array([abs(movie_release_date - movie_album_release_date) for movie_album_release_date in movie_album_release_date_net])
-                        #Identify the album(s) having the release date closest to the release date of the movie.
-                        best_movie_album_match_idx_net = np.where(movie_music_release_date_diff_net == min(movie_music_release_date_diff_net))[0]
-                        #Only 1 Album with Minimum Release Date Difference ==> Proceed with storing its Index
-                        if len(best_movie_album_match_idx_net) > 1:
-                            best_movie_album_match_idx = random.choice(best_movie_album_match_idx_net)
-                        #More than 1 Album with Minimum Release Date Difference ==> Proceed with storing the Index of any movie album (randomly selected) from best_movie_album_match_idx_net
-                        else:
-                            best_movie_album_match_idx = best_movie_album_match_idx_net[0]
-                        movie_album_URI = movie_album_URI_net[best_movie_album_match_idx]
-                        
-                    else:
-                        #If we don't have the movie's release date, we can't make comparisons with the album release dates and hence, we select an album at random
-                        movie_album_URI_net = [movie_album['uri'] for movie_album in movie_album_results]
-                        movie_album_URI = random.choice(movie_album_URI_net)
-        
-        #Check for movie album with the 2nd suffix only if no album was retrieved using the 1st suffix           
-        if not flag:
+                search_tiers = range(len(MOVIE_ALBUM_SEARCH_TIERS))
             
-            #Check for movie album with the 2nd suffix
-            movie_name_suffix = '(Music from the Motion Picture)'
-            movie_album_results = spotify.search(q='album:' + movie_name + movie_name_suffix, type='album')['albums']['items']
-            
-            #Subsequent code structure follows from the corresponding code for the 1st suffix
-            if len(movie_album_results) != 0:
+            for tier in search_tiers:
                 
+                movie_name_suffix, check_keywords = MOVIE_ALBUM_SEARCH_TIERS[tier]
+                movie_album_results = spotify.search(q='album:' + movie_name + movie_name_suffix, type='album')['albums']['items']
                 
-                if len(movie_album_results) == 1:
-                    
-                    movie_album_name = movie_album_results[0]['name'].lower()
-                    if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                        movie_album_release_date = datetime.datetime.strptime(movie_album_results[0]['release_date'][:4],'%Y')
-                        if movie_album_release_date <= release_date_cutoff:
-                            flag = 1
-                            movie_album_URI = movie_album_results[0]['uri']
+                #Keep every album of the search response for the next movies
+                if album_catalog is not None:
+                    album_catalog.add(movie_album_results)
+                    album_catalog.record_search()
                 
-                else:
-                    
-                    movie_album_name_net = [movie_album['name'] for movie_album in movie_album_results]
-                    movie_album_release_date_net = []
-                    movie_album_URI_net = []
-                    
-                    for movie_album in movie_album_results:
-                        movie_album_name = movie_album['name'].lower()
-                        if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                            movie_album_release_date = datetime.datetime.strptime(movie_album['release_date'][:4],'%Y')
-                            if movie_album_release_date <= release_date_cutoff:
-                                movie_album_release_date_net.append(movie_album_release_date)
-                                movie_album_URI_net.append(movie_album['uri'])
-                            
-                    if len(movie_album_release_date_net) != 0:
-                        
-                        flag = 1
-                    
-                        if movie_release_date == movie_release_date:
-                            movie_music_release_date_diff_net = np.array([abs(movie_release_date - movie_album_release_date) for movie_album_release_date in movie_album_release_date_net])
-                            best_movie_album_match_idx_net = np.where(movie_music_release_date_diff_net == min(movie_music_release_date_diff_net))[0]
-                            if len(best_movie_album_match_idx_net) > 1:
-                                best_movie_album_match_idx = random.choice(best_movie_album_match_idx_net)
-                            else:
-                                best_movie_album_match_idx = best_movie_album_match_idx_net[0]
-                            movie_album_URI = movie_album_URI_net[best_movie_album_match_idx]
-                            
-                        else:
-                            movie_album_URI_net = [movie_album['uri'] for movie_album in movie_album_results]
-                            movie_album_URI = random.choice(movie_album_URI_net)
-                    
-            #Check for movie album with the 3rd suffix only if no album was retrieved using the 2nd suffix              
-            if not flag:
+                movie_album_URI = select_movie_album(movie_album_results, movie_name, movie_release_date, release_date_cutoff, check_keywords)
                 
-                #Check for movie album with the 3rd suffix
-                movie_name_suffix = '(Original Motion Picture Score)'
-                movie_album_results = spotify.search(q='album:' + movie_name + movie_name_suffix, type='album')['albums']['items']
+                if query_planner is not None:
+                    query_planner.record(movie_signals, tier, movie_album_URI == movie_album_URI)
                 
-                #Subsequent code structure follows from the corresponding code for the 1st suffix
-                if len(movie_album_results) != 0:
-                    
-                    
-                    if len(movie_album_results) == 1:
-                        movie_album_name = movie_album_results[0]['name'].lower()
-                        if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                            movie_album_release_date = datetime.datetime.strptime(movie_album_results[0]['release_date'][:4],'%Y')
-                            if movie_album_release_date <= release_date_cutoff:
-                                flag = 1
-                                movie_album_URI = movie_album_results[0]['uri']
-                    
-                    else:
-                        
-                        movie_album_name_net = [movie_album['name'] for movie_album in movie_album_results]
-                        movie_album_release_date_net = []
-                        movie_album_URI_net = []
-                        
-                        for movie_album in movie_album_results:
-                            movie_album_name = movie_album['name'].lower()
-                            if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                                movie_album_release_date = datetime.datetime.strptime(movie_album['release_date'][:4],'%Y')
-                                if movie_album_release_date <= release_date_cutoff:
-                                    movie_album_release_date_net.append(movie_album_release_date)
-                                    movie_album_URI_net.append(movie_album['uri'])
-                                
-                        if len(movie_album_release_date_net) != 0:
-                            
-                            flag = 1
-                        
-                            if movie_release_date == movie_release_date:
-                                movie_music_release_date_diff_net = np.array([abs(movie_release_date - movie_album_release_date) for movie_album_release_date in movie_album_release_date_net])
-                                best_movie_album_match_idx_net = np.where(movie_music_release_date_diff_net == min(movie_music_release_date_diff_net))[0]
-                                if len(best_movie_album_match_idx_net) > 1:
-                                    best_movie_album_match_idx = random.choice(best_movie_album_match_idx_net)
-                                else:
-                                    best_movie_album_match_idx = best_movie_album_match_idx_net[0]
-                                movie_album_URI = movie_album_URI_net[best_movie_album_match_idx]
-                                
-                            else:
-                                movie_album_URI_net = [movie_album['uri'] for movie_album in movie_album_results]
-                                movie_album_URI = random.choice(movie_album_URI_net)
-                        
-                #Check for movie album with the set of keywords (mentioned earlier) if no album was retrieved using the 3rd suffix                          
-                if not flag:
-                    
-                    movie_album_results = spotify.search(q='album:' + movie_name, type='album')['albums']['items']
-                    
-                    #Subsequent code structure mostly follows from the corresponding code for the 1st suffix (Comments have added for major differences)
-                    if len(movie_album_results) != 0:
-                        
-                        movie_name_lowercased = movie_name.lower()
-                        
-                        if len(movie_album_results) == 1:
-                            
-                            movie_album_name = movie_album_results[0]['name'].lower()
-                            if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                                #Remove movie name from the album name to avoid any overlap in words in the movie name and the keyword set used for extracting the albums
-                                movie_album_name = re.sub(rf'{movie_name_lowercased}','',movie_album_name)
-                                #Check whether any of the keywords are present in the album name
-                                if re.search('Original|Motion\sPicture|Soundtrack|Score',rf'{movie_album_name}',flags = re.I):
-                                    movie_album_release_date = datetime.datetime.strptime(movie_album_results[0]['release_date'][:4],'%Y')
-                                    if movie_album_release_date <= release_date_cutoff:
-                                        flag = 1
-                                        movie_album_URI = movie_album_results[0]['uri']
-                        
-                        else:
-                            movie_album_name_net = [movie_album['name'] for movie_album in movie_album_results]
-                            movie_album_release_date_net = [movie_album['release_date'] for movie_album in movie_album_results]
-                            selected_movie_album_name_idx_net = []
-                            
-                            for i, movie_album_name in enumerate(movie_album_name_net):
-                                
-                                movie_album_name = movie_album_name.lower()
-                                if re.search(rf'{movie_name_lowercased}',rf'{movie_album_name}',flags = re.I):
-                                    #Remove movie name from the album name to avoid any overlap in words in the movie name and the keyword set used for extracting the albums
-                                    movie_album_name = re.sub(rf'{movie_name_lowercased}','',movie_album_name)
-                                    #Check whether any of the keywords are present in the album name
-                                    if re.search('Original|Motion\sPicture|Soundtrack|Score',rf'{movie_album_name}',flags = re.I):
-                                        movie_album_release_date = datetime.datetime.strptime(movie_album_release_date_net[i][:4],'%Y')
-                                        if movie_album_release_date <= release_date_cutoff:
-                                            selected_movie_album_name_idx_net.append(i)
-                                        
-                            movie_album_release_date_net = []
-                            movie_album_URI_net = []
-                            
-                            if len(selected_movie_album_name_idx_net) != 0:
-                                
-                                if movie_release_date == movie_release_date:
-                                    for i, movie_album in enumerate(movie_album_results):
-                                        if i in selected_movie_album_name_idx_net:
-                                            movie_album_release_date_net.append(datetime.datetime.strptime(movie_album['release_date'][:4],'%Y'))
-                                            movie_album_URI_net.append(movie_album['uri'])
-                                    
-                                    movie_music_release_date_diff_net = np.array([abs(movie_release_date - movie_album_release_date) for movie_album_release_date in movie_album_release_date_net])
-                                    best_movie_album_match_idx_net = np.where(movie_music_release_date_diff_net == min(movie_music_release_date_diff_net))[0]
-                                    if len(best_movie_album_match_idx_net) > 1:
-                                        best_movie_album_match_idx = random.choice(best_movie_album_match_idx_net)
-                                    else:
-                                        best_movie_album_match_idx = best_movie_album_match_idx_net[0]
-                                    movie_album_URI = movie_album_URI_net[best_movie_album_match_idx]
-                                    
-                                else:
-                                    movie_album_URI_net = [movie_album['uri'] for movie_album in movie_album_results]
-                                    movie_album_URI = random.choice(movie_album_URI_net)
+                #Check for movie album with the next suffix only if no album was retrieved using this one
+                if movie_album_URI == movie_album_URI:
+                    break
                             
         #Check whether we've got a non-NaN movie album URI                    
         if movie_album_URI == movie_album_URI:
             
+            movie_first_row = len(movie_music_data)
+            
             try:
                 #Extract all album data from Spotify using the movie album URI          
                 movie_album = spotify.album(movie_album_URI)
@@ -352,16 +245,16 @@ def movie_music_data_spotify_scraper(movie_wikipedia_id_net, movie_name_net, mov
                         music_dict = dict(zip(music_dict_keys,music_dict_values))
                         
                         movie_music_data.append(music_dict)
-                        
-                    
-                    
-                    
-                    i += 1
                     
             #Capture all the wikipedia IDs of movies for which scraping resulted in an error (e.g., Rate Limit Errors, HTTP Connection Errors, etc.)
             #This is done so that we can retrieve data for them in the subsequent round(s) of scraping after the rate limit is reset and/or the HTTP Connection issue with the API gets resolved
             except Exception:
                 error_wikipedia_movie_IDs.append(movie_wikipedia_id_net[ctr])
+            
+            #Stream the tracks of the movie to the consumer of the rows (e.g. live correlations), outside of the try so that its errors aren't taken for scraping errors
+            if row_callback is not None:
+                for music_dict in movie_music_data[movie_first_row:]:
+                    row_callback(music_dict)
                 
             
             
@@ -0,0 +1,33 @@
+import datetime
+import numpy as np
+from album_catalog import AlbumCatalog
+
+CUTOFF = datetime.datetime.strptime('2015', '%Y')
+
+
+def catalog():
+    album_catalog = AlbumCatalog()
+    album_catalog.add([{'name': 'Heat (Original Motion Picture Soundtrack)', 'release_date': '1995-12-12', 'uri': 'spotify:album:heat-1995'},
+                       {'name': 'Heat (Original Motion Picture Soundtrack)', 'release_date': '1986-01-01', 'uri': 'spotify:album:heat-1986'},
+                       {'name': 'Heat Wave (Original Motion Picture Soundtrack)', 'release_date': '2020-01-01', 'uri': 'spotify:album:heat-wave'},
+                       {'name': 'Casino (Music from the Motion Picture)', 'release_date': '1995-11-14', 'uri': 'spotify:album:casino'}])
+    return album_catalog
+
+
+def test_resolve_picks_the_closest_release_date():
+    album_catalog = catalog()
+
+    assert album_catalog.resolve('Heat', datetime.datetime.strptime('1995', '%Y'), CUTOFF) == 'spotify:album:heat-1995'
+    assert album_catalog.resolve('Casino', datetime.datetime.strptime('1995', '%Y'), CUTOFF) == 'spotify:album:casino'
+    assert album_catalog.hits == 2
+
+
+def test_resolve_without_release_date_only_accepts_an_unambiguous_match():
+    album_catalog = catalog()
+
+    #Two qualifying Heat albums (the Heat Wave album is after the cutoff): a miss, not a random pick
+    movie_album_URI = album_catalog.resolve('Heat', np.nan, CUTOFF)
+    assert movie_album_URI != movie_album_URI
+
+    assert album_catalog.resolve('Casino', np.nan, CUTOFF) == 'spotify:album:casino'
+    assert album_catalog.report()['hits'] == 1
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('statsmodels')
+from statsmodels.stats.multitest import multipletests
+import cointegration_grid
+from cointegration_grid import run_cointegration_grid
+
+GENRES_BY_COUNTRY = {'India': ['Drama', 'Comedy']}
+FEATURES = ['Track_Energy']
+EMOTIONS = ['Joy', 'Sadness', 'Fear']
+
+
+def yearly_series():
+    rng = np.random.default_rng(0)
+    years = np.arange(1970, 2010)
+    series = {}
+    for genre in GENRES_BY_COUNTRY['India']:
+        trend = np.cumsum(rng.normal(size=len(years)))
+        for column in FEATURES + EMOTIONS:
+            series[('India', genre, column)] = pd.Series(trend + rng.normal(size=len(years)), index=years)
+    return series
+
+
+def test_grid_reuses_cached_cells(tmp_path, monkeypatch):
+    tested_cells = []
+    cointegration_test = cointegration_grid.cointegration_test
+
+    def counting_test(args):
+        tested_cells.append(args)
+        return cointegration_test(args)
+
+    monkeypatch.setattr(cointegration_grid, 'cointegration_test', counting_test)
+    series = yearly_series()
+
+    first = run_cointegration_grid(series, GENRES_BY_COUNTRY, FEATURES, EMOTIONS[:2], cache_dir=str(tmp_path), n_jobs=1)
+    assert len(tested_cells) == 4
+
+    second = run_cointegration_grid(series, GENRES_BY_COUNTRY, FEATURES, EMOTIONS[:2], cache_dir=str(tmp_path), n_jobs=1)
+    assert len(tested_cells) == 4
+    pd.testing.assert_frame_equal(first, second)
+
+    extended = run_cointegration_grid(series, GENRES_BY_COUNTRY, FEATURES, EMOTIONS, cache_dir=str(tmp_path), n_jobs=1)
+    assert len(tested_cells) == 6
+    assert len(extended) == 6
+
+    _, p_values_adjusted, _, _ = multipletests(extended['P_Value'], alpha=0.05, method='fdr_bh')
+    np.testing.assert_allclose(extended['P_Value_Adjusted'], p_values_adjusted)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+from correlation_accumulator import CorrelationAccumulator, GroupedCorrelationAccumulator
+
+FEATURES = ['Track_Energy', 'Track_Valence', 'Track_Tempo']
+
+
+def tracks():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(rng.normal(size=(300, 3)), columns=FEATURES)
+    df['Track_Valence'] += 0.5 * df['Track_Energy']
+    df.loc[[5, 17], 'Track_Tempo'] = np.nan
+    df['Country'] = rng.choice(['India', 'France', 'Japan'], size=len(df))
+    return df
+
+
+def assert_matches_pearsonr(accumulator, df):
+    complete = df[FEATURES].dropna()
+    assert accumulator.n == len(complete)
+
+    correlation, pvalues = accumulator.correlation(), accumulator.pvalues()
+    for i, feature_1 in enumerate(FEATURES):
+        for feature_2 in FEATURES[i + 1:]:
+            r, p = stats.pearsonr(complete[feature_1], complete[feature_2])
+            assert np.isclose(correlation.loc[feature_1, feature_2], r)
+            assert np.isclose(pvalues.loc[feature_1, feature_2], p)
+
+
+def test_update_row_update_and_merge_match_pearsonr():
+    df = tracks()
+
+    by_row = CorrelationAccumulator(FEATURES)
+    for row in df.to_dict('records'):
+        by_row.update_row(row)
+    assert_matches_pearsonr(by_row, df)
+
+    by_chunk = CorrelationAccumulator(FEATURES)
+    for start in range(0, len(df), 80):
+        by_chunk.update(df.iloc[start:start + 80])
+    assert_matches_pearsonr(by_chunk, df)
+
+    merged = CorrelationAccumulator(FEATURES)
+    shard = CorrelationAccumulator(FEATURES)
+    merged.update(df.iloc[:120])
+    for row in df.iloc[120:].to_dict('records'):
+        shard.update_row(row)
+    merged.merge(shard)
+    assert_matches_pearsonr(merged, df)
+
+
+def test_grouped_update_matches_update_row():
+    df = tracks()
+
+    by_row = GroupedCorrelationAccumulator(FEATURES, lambda row: [row['Country']])
+    for row in df.to_dict('records'):
+        by_row.update_row(row)
+
+    by_chunk = GroupedCorrelationAccumulator(FEATURES, lambda row: [row['Country']])
+    for start in range(0, len(df), 100):
+        by_chunk.update(df.iloc[start:start + 100])
+
+    pd.testing.assert_series_equal(by_chunk.group_sizes().sort_index(), by_row.group_sizes().sort_index())
+    for country in ['India', 'France', 'Japan']:
+        assert_matches_pearsonr(by_chunk.accumulators[country], df[df['Country'] == country])
+        pd.testing.assert_frame_equal(by_chunk.correlation(country), by_row.correlation(country))
@@ -0,0 +1,79 @@
+import base64
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+import pytest
+from dashboard_server import Dashboard, DashboardRequestHandler, FIGURE_KINDS
+from feature_cube import FeatureCube
+
+
+def dashboard():
+    movie_df = pd.DataFrame({'Movie_Release_Year': [2000, 2000, 2001, 2002],
+                             'Movie_Countries': [['India'], ['India', 'France'], ['France'], ['India']],
+                             'Movie_Genres': [['Drama'], ['Drama', 'Comedy'], ['Comedy'], ['Drama']],
+                             'Track_Energy_Mean': [0.2, 0.4, 0.6, 0.8]})
+    cube = FeatureCube(['Track_Energy_Mean'])
+    cube.update(movie_df)
+    return Dashboard(cube)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), DashboardRequestHandler)
+    server.dashboard = dashboard()
+    server.verbose = False
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def values(array):
+    #Plotly encodes the NumPy arrays of the figure JSON as base64 typed arrays
+    if isinstance(array, dict):
+        return np.frombuffer(base64.b64decode(array['bdata']), dtype=array['dtype']).tolist()
+    return array
+
+
+def get(server, path):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}{path}") as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+def test_query_figure_json_of_each_kind():
+    figures = {kind: json.loads(dashboard().query_figure_json(f"kind={kind}&feature=Track_Energy_Mean&year_min=2000&year_max=2002&window=2"))
+               for kind in FIGURE_KINDS}
+
+    assert values(figures['yearly']['data'][1]['x']) == [2000, 2001, 2002]
+    assert np.allclose(values(figures['yearly']['data'][1]['y']), [0.3, 0.4, 0.7])
+    assert values(figures['genres']['data'][0]['x']) == ['Drama', 'Comedy']
+    #Every movie is counted once per bar
+    assert values(figures['countries']['data'][0]['customdata']) == [3, 2]
+
+
+def test_bad_queries_return_400(server):
+    assert get(server, '/figure?kind=yearly&feature=Track_Energy_Mean')[0] == 200
+    assert get(server, '/figure?kind=yearly&window=abc')[0] == 400
+    assert get(server, '/figure?kind=yearly&window=0')[0] == 400
+    assert get(server, '/figure?kind=map')[0] == 400
+    assert get(server, '/figure?feature=Track_Tempo')[0] == 400
+
+
+def test_repeated_queries_are_served_from_the_cache():
+    figures = dashboard()
+    query = 'kind=genres&feature=Track_Energy_Mean&country=India'
+
+    first = figures.query_figure_json(query)
+    repeated = figures.query_figure_json(query)
+
+    assert repeated == first
+    assert figures.figure_json.cache_info().hits == 1
+    assert figures.figure_json.cache_info().misses == 1
@@ -0,0 +1,39 @@
+import os
+import pandas as pd
+import pytest
+from dataset_pipeline import Pipeline
+
+
+def movie_genres():
+    return pd.DataFrame({'Wikipedia_Movie_ID': [1, 2], 'Movie_Genres': [['Drama', 'Comedy'], []], 'Movie_Runtime': [90.0, 120.0]})
+
+
+def movie_runtimes():
+    return pd.DataFrame({'Wikipedia_Movie_ID': [1, 2], 'Movie_Runtime': [90.0, 120.0]})
+
+
+def test_cached_results_keep_their_types(tmp_path):
+    pipeline = Pipeline(str(tmp_path), verbose=False)
+    pipeline.add_stage('movie_genres', movie_genres)
+    pipeline.add_stage('movie_runtimes', movie_runtimes)
+
+    fresh = pipeline.run(n_jobs=1)
+    cached = pipeline.run(n_jobs=1)
+
+    assert all(pipeline.timings[name][1] for name in ['movie_genres', 'movie_runtimes'])
+    for name in ['movie_genres', 'movie_runtimes']:
+        pd.testing.assert_frame_equal(fresh[name], cached[name])
+    assert all(isinstance(genres, list) for genres in cached['movie_genres']['Movie_Genres'])
+
+
+def test_list_columns_are_stored_as_parquet_lists(tmp_path):
+    pytest.importorskip('pyarrow')
+    pipeline = Pipeline(str(tmp_path), verbose=False)
+    pipeline.add_stage('movie_genres', movie_genres)
+
+    fresh = pipeline.run(n_jobs=1)
+    cached = pipeline.run(n_jobs=1)
+
+    assert [filename.endswith('.parquet') for filename in os.listdir(tmp_path)] == [True]
+    pd.testing.assert_frame_equal(fresh['movie_genres'], cached['movie_genres'])
+    assert cached['movie_genres']['Movie_Genres'].tolist() == [['Drama', 'Comedy'], []]
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from emotion_inference import EMOTIONS, KeywordEmotionModel, infer_plot_emotions
+
+
+class CountingModel(KeywordEmotionModel):
+    """
+    Keyword model recording the texts it classifies.
+    """
+
+    def __init__(self, model_id='keyword-emotion-v1'):
+        self.model_id = model_id
+        self.classified = []
+
+    def predict(self, texts):
+        self.classified.extend(texts)
+        return super().predict(texts)
+
+
+def plot_summaries_df():
+    return pd.DataFrame({'Wikipedia_Movie_ID': [1, 2, 3],
+                         'Plot_Summary': ['A tragic death and grief.', 'They fall in love and marry.', 'A tragic death and grief.']})
+
+
+def test_cache_hits_and_misses(tmp_path):
+    cache_path = str(tmp_path / 'emotions.sqlite')
+
+    model = CountingModel()
+    first = infer_plot_emotions(plot_summaries_df(), model, cache_path, batch_size=2, verbose=False)
+    #Identical summaries are classified once
+    assert len(model.classified) == 2
+    assert first.columns.tolist() == ['Wikipedia_Movie_ID'] + EMOTIONS
+    assert np.allclose(first[EMOTIONS].sum(axis=1), 1, atol=1e-5)
+    assert first.loc[0, 'sadness'] == first[EMOTIONS].iloc[0].max()
+
+    model = CountingModel()
+    second = infer_plot_emotions(plot_summaries_df(), model, cache_path, verbose=False)
+    assert model.classified == []
+    pd.testing.assert_frame_equal(first, second)
+
+    #Only the new summary is classified
+    new_df = pd.concat([plot_summaries_df(), pd.DataFrame({'Wikipedia_Movie_ID': [4], 'Plot_Summary': ['A secret is revealed.']})])
+    model = CountingModel()
+    infer_plot_emotions(new_df, model, cache_path, verbose=False)
+    assert model.classified == ['A secret is revealed.']
+
+
+def test_cache_is_keyed_by_model_id(tmp_path):
+    cache_path = str(tmp_path / 'emotions.sqlite')
+
+    infer_plot_emotions(plot_summaries_df(), CountingModel(), cache_path, verbose=False)
+
+    other_model = CountingModel(model_id='keyword-emotion-v2')
+    infer_plot_emotions(plot_summaries_df(), other_model, cache_path, verbose=False)
+    assert len(other_model.classified) == 2
@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from feature_cube import ALL, FeatureCube
+
+
+def movie_df():
+    return pd.DataFrame({'Movie_Release_Year': [2000, 2000, 2001, 2001],
+                         'Movie_Countries': [['India', 'United Kingdom'], ['India'], ['United Kingdom'], []],
+                         'Movie_Genres': [['Drama', 'Musical', 'Drama'], ['Drama'], ['Comedy'], ['Drama']],
+                         'Track_Energy': [0.2, 0.4, 0.6, np.nan]})
+
+
+def test_rollups_count_every_movie_once():
+    cube = FeatureCube(['Track_Energy'])
+    cube.update(movie_df())
+
+    yearly = cube.yearly_series()
+    assert yearly[('Count', 'Track_Energy')].tolist() == [2, 1]
+    assert np.allclose(yearly[('Mean', 'Track_Energy')], [0.3, 0.6])
+
+    india = cube.yearly_series(country='India')
+    assert india[('Count', 'Track_Energy')].tolist() == [2]
+
+    by_country = FeatureCube.moments(cube.rollup(['Country']))
+    assert by_country[('Count', 'Track_Energy')].to_dict() == {'India': 2, 'United Kingdom': 2}
+    assert ALL not in by_country.index
+
+    by_genre = FeatureCube.moments(cube.rollup(['Genre'], country='India'))
+    assert by_genre[('Count', 'Track_Energy')].to_dict() == {'Drama': 2, 'Musical': 1}
+
+
+def test_incremental_update_matches_full_build():
+    df = movie_df()
+
+    full_cube = FeatureCube(['Track_Energy'])
+    full_cube.update(df)
+
+    incremental_cube = FeatureCube(['Track_Energy'])
+    incremental_cube.update(df.iloc[:2])
+    incremental_cube.update(df.iloc[2:])
+
+    pd.testing.assert_frame_equal(full_cube.stats, incremental_cube.stats, check_dtype=False)
+
+
+def test_rolling_window():
+    cube = FeatureCube(['Track_Energy'])
+    cube.update(movie_df())
+
+    rolling = cube.yearly_series(window=2)
+    assert rolling[('Count', 'Track_Energy')].tolist() == [2, 3]
+    assert np.isclose(rolling[('Mean', 'Track_Energy')].iloc[-1], 0.4)
+    assert np.isclose(rolling[('Std', 'Track_Energy')].iloc[-1], 0.2)
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pandas as pd
+from feature_store import FeatureStore, write_feature_store
+
+
+def movie_music():
+    return pd.DataFrame({'Wikipedia_Movie_ID': [30, 10, 20, 10, 30],
+                         'Track_Energy': [0.5, 0.1, 0.2, 0.3, np.nan],
+                         'Track_Key': [5, 1, None, 3, 7],
+                         'Album_Name': ['C', 'A', 'B', 'A', None],
+                         'Album_Genres': [['rock'], ['pop', 'rock'], [], "['jazz']", np.nan]})
+
+
+def test_select_round_trip(tmp_path):
+    path = str(tmp_path / 'store')
+    write_feature_store(movie_music(), path)
+    store = FeatureStore(path)
+
+    df = store.select()
+    assert df['Wikipedia_Movie_ID'].tolist() == [10, 10, 20, 30, 30]
+    np.testing.assert_allclose(df['Track_Energy'], [0.1, 0.3, 0.2, 0.5, np.nan])
+    assert df['Album_Name'].tolist() == ['A', 'A', 'B', 'C', np.nan]
+    assert df['Album_Genres'].tolist() == [['pop', 'rock'], ['jazz'], [], ['rock'], []]
+
+    by_movie = store.select(['Track_Energy', 'Album_Genres'], movie_ids=[30, 99, 20])
+    assert by_movie['Wikipedia_Movie_ID'].tolist() == [30, 30, 20]
+    assert by_movie['Album_Genres'].tolist() == [['rock'], [], []]
+
+    by_rows = store.select(['Album_Name', 'Album_Genres'], rows=[4, 0])
+    assert by_rows['Album_Name'].tolist() == [np.nan, 'A']
+    assert by_rows['Album_Genres'].tolist() == [[], ['pop', 'rock']]
+
+    by_slice = store.select(['Track_Energy', 'Album_Genres'], rows=slice(1, 3))
+    pd.testing.assert_frame_equal(by_slice, df[['Wikipedia_Movie_ID', 'Track_Energy', 'Album_Genres']].iloc[1:3].reset_index(drop=True))
+
+
+def test_missing_integers_are_minus_one(tmp_path):
+    path = str(tmp_path / 'store')
+    write_feature_store(movie_music(), path)
+
+    track_key = FeatureStore(path).column('Track_Key')
+    assert track_key.dtype == np.int8
+    assert track_key.tolist() == [1, 3, -1, 5, 7]
+
+
+def test_rewrite_replaces_the_store(tmp_path):
+    path = str(tmp_path / 'store')
+    write_feature_store(movie_music(), path)
+    old_store = FeatureStore(path)
+    old_energy = old_store.column('Track_Energy')
+
+    write_feature_store(movie_music().iloc[:2], path)
+
+    assert len(FeatureStore(path)) == 2
+    assert len(old_energy) == 5
+    assert os.listdir(tmp_path) == ['store']
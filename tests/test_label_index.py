@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+from label_index import LabelIndex
+
+
+def movies():
+    return pd.DataFrame({'Wikipedia_Movie_ID': [10, 20, 30, 40],
+                         'Movie_Genres': [['Drama', 'Comedy'], "['Drama']", ['Comedy', 'Comedy'], np.nan],
+                         'Movie_Box_Office_Revenue': [100.0, 200.0, np.nan, 50.0]})
+
+
+def test_label_counts_and_keys():
+    genre_index = LabelIndex.from_frame(movies(), 'Movie_Genres')
+
+    assert genre_index.label_counts().to_dict() == {'Drama': 2, 'Comedy': 2}
+    assert genre_index.keys_with('Drama').tolist() == [10, 20]
+    assert genre_index.keys_with('Comedy').tolist() == [10, 30]
+    assert genre_index.keys_with('Horror').tolist() == []
+
+
+def test_mask():
+    genre_index = LabelIndex.from_frame(movies(), 'Movie_Genres')
+
+    assert genre_index.mask(['Drama', 'Comedy']).tolist() == [True, True, True, False]
+    assert genre_index.mask(['Drama', 'Comedy'], how='all').tolist() == [True, False, False, False]
+    assert genre_index.mask(['Drama', 'Horror'], how='all').tolist() == [False, False, False, False]
+
+
+def test_conditioned_means():
+    df = movies()
+    genre_index = LabelIndex.from_frame(df, 'Movie_Genres')
+
+    means_df = genre_index.conditioned_means(df.set_index('Wikipedia_Movie_ID')[['Movie_Box_Office_Revenue']])
+
+    assert means_df.loc['Drama', 'Movie_Box_Office_Revenue'] == 150.0
+    #The movie without a revenue is left out of the mean, but counted
+    assert means_df.loc['Comedy', 'Movie_Box_Office_Revenue'] == 100.0
+    assert means_df['Count'].to_dict() == {'Drama': 2, 'Comedy': 2}
+
+
+def test_expand_to_tracks():
+    genre_index = LabelIndex.from_frame(movies(), 'Movie_Genres')
+    tracks = pd.DataFrame({'Wikipedia_Movie_ID': [10, 10, 30, 99], 'Track_Energy': [0.2, 0.4, 0.6, 0.8]})
+
+    track_index = genre_index.expand(tracks['Wikipedia_Movie_ID'])
+
+    assert len(track_index) == 4
+    assert track_index.label_counts().to_dict() == {'Comedy': 3, 'Drama': 2}
+    #The track of the unknown movie has no label
+    assert track_index.mask(['Drama', 'Comedy']).tolist() == [True, True, True, False]
+
+    means_df = track_index.conditioned_means(tracks[['Track_Energy']], aligned=True)
+    assert np.isclose(means_df.loc['Drama', 'Track_Energy'], 0.3)
+    assert np.isclose(means_df.loc['Comedy', 'Track_Energy'], 0.4)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import movie_music_aggregation
+from movie_music_aggregation import aggregate_movie_music, label_list, load_movie_music_aggregates
+
+
+def movie_music():
+    return pd.DataFrame({'Wikipedia_Movie_ID': [20, 10, 20, 20, np.nan],
+                         'Track_Energy': [0.2, 0.5, 0.4, 0.9, 0.1],
+                         'Track_Duration': [100, 200, 300, np.nan, 100],
+                         'Album_Name': ['B', 'A', 'B', 'B', 'C']})
+
+
+def test_label_list():
+    assert label_list(['Drama', 'Comedy']) == ['Drama', 'Comedy']
+    assert label_list(np.array(['Drama'])) == ['Drama']
+    #String representation of a list (e.g. Album_Genres reloaded from a CSV file)
+    assert label_list("['indian pop', 'filmi']") == ['indian pop', 'filmi']
+    assert label_list('India') == ['India']
+    assert label_list('1999') == ['1999']
+    assert label_list(np.nan) == []
+    assert label_list(None) == []
+
+
+def test_aggregate_movie_music():
+    movie_music_agg_df = aggregate_movie_music(movie_music(), features=['Track_Energy'])
+
+    assert movie_music_agg_df.index.tolist() == [10, 20]
+    assert movie_music_agg_df['Track_Count'].tolist() == [1, 3]
+    assert movie_music_agg_df['Album_Name'].tolist() == ['A', 'B']
+
+    movie = movie_music_agg_df.loc[20]
+    assert np.isclose(movie['Track_Energy_Mean'], 0.5)
+    assert np.isclose(movie['Track_Energy_Median'], 0.4)
+    assert np.isclose(movie['Track_Energy_Std'], np.std([0.2, 0.4, 0.9], ddof=1))
+    #The track without a duration is left out of the weighted mean
+    assert np.isclose(movie['Track_Energy_Weighted_Mean'], (0.2 * 100 + 0.4 * 300) / 400)
+    assert np.isnan(movie_music_agg_df.loc[10, 'Track_Energy_Std'])
+
+    for statistic in ['Mean', 'Median', 'Std', 'Weighted_Mean']:
+        assert movie_music_agg_df['Track_Energy_' + statistic].dtype == np.float32
+
+
+def test_aggregates_are_cached_until_the_data_changes(tmp_path, monkeypatch):
+    n_aggregations = []
+
+    def counting_aggregation(*args):
+        n_aggregations.append(1)
+        return aggregate_movie_music(*args)
+
+    monkeypatch.setattr(movie_music_aggregation, 'aggregate_movie_music', counting_aggregation)
+    cache_path = str(tmp_path / 'aggregates.pkl')
+
+    first = load_movie_music_aggregates(movie_music(), cache_path, features=['Track_Energy'])
+    cached = load_movie_music_aggregates(movie_music(), cache_path, features=['Track_Energy'])
+    assert len(n_aggregations) == 1
+    pd.testing.assert_frame_equal(first, cached)
+
+    changed_df = movie_music()
+    changed_df.loc[1, 'Track_Energy'] = 0.7
+    rebuilt = load_movie_music_aggregates(changed_df, cache_path, features=['Track_Energy'])
+    assert len(n_aggregations) == 2
+    assert np.isclose(rebuilt.loc[10, 'Track_Energy_Mean'], 0.7)
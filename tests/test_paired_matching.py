@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+from paired_matching import match_on_score, match_pairs
+
+
+def test_match_on_score_with_more_treated_than_controls():
+    t, c, distances = match_on_score([0.1, 0.2, 0.3], [0.5, 0.6])
+
+    assert len(t) == 2
+    assert sorted(c.tolist()) == [0, 1]
+    assert np.isfinite(distances).all()
+
+
+def test_match_on_score_nearest_controls_without_replacement():
+    t, c, distances = match_on_score([0.5, 0.52], [0.1, 0.49, 0.9])
+
+    #The second treated unit can't reuse the control at 0.49, and 0.9 is nearer than 0.1
+    assert dict(zip(t.tolist(), c.tolist())) == {0: 1, 1: 2}
+
+
+def test_match_on_score_caliper():
+    t, c, distances = match_on_score([0.1, 0.8], [0.12], caliper=0.05)
+
+    assert t.tolist() == [0]
+    assert c.tolist() == [0]
+
+
+def test_match_pairs_with_more_treated_than_controls():
+    df = pd.DataFrame({'Treated': [True, True, True, False, False],
+                       'Score': [0.1, 0.2, 0.3, 0.5, 0.6],
+                       'Decade': [1990] * 5})
+
+    pairs_df = match_pairs(df, 'Treated', 'Score', block_on=['Decade'])
+
+    assert len(pairs_df) == 2
+    assert set(pairs_df['Control_Index']) == {3, 4}
+    assert pairs_df['Treated_Index'].is_unique
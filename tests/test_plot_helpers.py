@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('matplotlib')
+pytest.importorskip('seaborn')
+import plot_helpers_new as phn
+
+
+def test_chunked_counts_match_one_shot_histogram():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=10000)
+    bin_edges = phn.histogram_bin_edges([], bins=50, value_range=(x.min(), x.max()))
+
+    counts = None
+    for chunk in np.array_split(x, 7):
+        counts = phn.histogram_counts(chunk, bin_edges, counts)
+
+    np.testing.assert_array_equal(counts, np.histogram(x, bins=bin_edges)[0])
+
+
+def test_log_scale_edges_are_equally_spaced_in_log10():
+    x = np.random.default_rng(0).lognormal(size=1000)
+    bin_edges = phn.histogram_bin_edges(x, bins=20, xscale='log')
+
+    assert len(bin_edges) == 21
+    np.testing.assert_allclose(np.diff(np.log10(bin_edges)), np.diff(np.log10(bin_edges))[0])
+
+
+def test_auto_bins_are_capped():
+    x = np.random.default_rng(0).uniform(size=1000000)
+
+    assert len(phn.histogram_bin_edges(x)) - 1 == phn.MAX_HISTOGRAM_BINS
+
+
+def test_batch_mode_restores_the_backend():
+    import matplotlib
+
+    backend = matplotlib.get_backend()
+    phn.set_batch_mode(True)
+    try:
+        assert matplotlib.get_backend().lower() == 'agg'
+        assert phn.BATCH_MODE
+    finally:
+        phn.set_batch_mode(False)
+
+    assert matplotlib.get_backend() == backend
+    assert not phn.BATCH_MODE
@@ -0,0 +1,40 @@
+from query_planner import QueryPlanner, replay_fixture
+
+
+def fixture():
+    #Tiers 0 and 1 never select an album, tier 2 selects one for the even movies and tier 3 for the odd ones
+    entries = []
+    for movie in range(8):
+        tier_uris = [None, None, f"soundtrack-{movie}" if movie % 2 == 0 else None, f"album-{movie}" if movie % 2 == 1 else None]
+        entries.append({'movie_wikipedia_id': movie, 'movie_name': 'Movie', 'release_year': '2000',
+                        'countries': ['India'], 'languages': ['Hindi Language'], 'tier_uris': tier_uris})
+
+    #Album found by tier 0 only: changed by the planner for movie 6 and lost for movie 7
+    entries[6]['tier_uris'][0] = 'rare-6'
+    entries[7]['tier_uris'] = ['rare-7', None, None, None]
+
+    return entries
+
+
+def test_replay_fixture():
+    planner = QueryPlanner(min_success_rate=0.1, min_attempts=3, explore_rate=0)
+
+    replay = replay_fixture(fixture(), planner)
+
+    assert replay['baseline_calls'] == 23
+    assert replay['planner_calls'] == 18
+    assert replay['calls_saved'] == 5
+    assert replay['baseline_albums'] == 8
+    assert replay['planner_albums'] == 7
+    assert replay['albums_lost'] == 1
+    assert replay['albums_changed'] == 1
+
+
+def test_tiers_are_skipped_only_after_min_attempts():
+    planner = QueryPlanner(min_success_rate=0.1, min_attempts=3, explore_rate=0)
+
+    replay_fixture(fixture(), planner)
+
+    assert [decision['skipped'] for decision in planner.decisions[:3]] == [[], [], []]
+    assert all(decision['skipped'] == [0, 1] for decision in planner.decisions[3:])
+    assert all(decision['tiers'] == [2, 3] for decision in planner.decisions[3:])
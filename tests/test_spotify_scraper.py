@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import spotify_scraper
+from spotify_scraper import movie_music_data_spotify_scraper
+
+
+AUDIO_FEATURES = {'acousticness': 0.1, 'danceability': 0.2, 'energy': 0.3, 'instrumentalness': 0.4, 'key': 5,
+                  'liveness': 0.6, 'loudness': -7.0, 'mode': 1, 'speechiness': 0.05, 'tempo': 120.0,
+                  'time_signature': 4, 'valence': 0.8}
+
+
+class FakeSpotify:
+    """
+    Spotify client returning one soundtrack album with three tracks.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.search_queries = []
+
+    def search(self, q, type):
+        self.search_queries.append(q)
+        albums = [{'name': 'Heat (Original Motion Picture Soundtrack)', 'release_date': '1995-12-12', 'uri': 'spotify:album:heat'}]
+        return {'albums': {'items': albums if 'Original Motion Picture Soundtrack' in q else []}}
+
+    def album(self, uri):
+        return {'name': 'Heat (Original Motion Picture Soundtrack)', 'release_date': '1995-12-12', 'genres': [],
+                'popularity': 40, 'total_tracks': 3,
+                'tracks': {'items': [{'name': f"Track {i}", 'duration_ms': 1000 * i, 'uri': f"spotify:track:{i}"} for i in range(3)]}}
+
+    def audio_features(self, uris):
+        return [dict(AUDIO_FEATURES)]
+
+
+@pytest.fixture
+def fake_spotify(monkeypatch):
+    monkeypatch.setattr(spotify_scraper.spotipy, 'Spotify', FakeSpotify)
+    monkeypatch.setattr(spotify_scraper, 'SpotifyClientCredentials', lambda *args: None)
+
+
+def test_scraper_keeps_every_track_of_the_album(fake_spotify):
+    rows = []
+    movie_music_df, error_wikipedia_movie_IDs = movie_music_data_spotify_scraper([1], ['Heat'], ['1995-12-15'], row_callback=rows.append)
+
+    assert error_wikipedia_movie_IDs == []
+    assert movie_music_df['Track_Name'].tolist() == ['Track 0', 'Track 1', 'Track 2']
+    assert (movie_music_df['Wikipedia_Movie_ID'] == 1).all()
+    assert len(rows) == 3
+
+
+def test_scraper_skips_movies_without_album(fake_spotify):
+    movie_music_df, error_wikipedia_movie_IDs = movie_music_data_spotify_scraper([2], ['Unknown Movie'], [np.nan])
+
+    assert len(movie_music_df) == 0
+    assert error_wikipedia_movie_IDs == []
+
+
+def test_row_callback_errors_are_not_scraping_errors(fake_spotify):
+    def failing_callback(music_dict):
+        raise RuntimeError('consumer error')
+
+    with pytest.raises(RuntimeError):
+        movie_music_data_spotify_scraper([1], ['Heat'], ['1995-12-15'], row_callback=failing_callback)
@@ -0,0 +1,40 @@
+import numpy as np
+from threshold_sweep import sweep_feature
+
+
+def test_sweep_matches_naive_filter_and_bootstrap():
+    rng = np.random.default_rng(0)
+    feature_values = rng.uniform(size=200)
+    revenues = 10 * feature_values + rng.normal(size=200)
+    feature_values[3] = np.nan
+    quantiles = [0.25, 0.5, 0.75]
+    n_bootstrap = 200
+
+    sweep_df = sweep_feature(feature_values, revenues, quantiles, n_bootstrap=n_bootstrap, seed=42)
+
+    valid = np.isfinite(feature_values)
+    order = np.argsort(feature_values[valid], kind='stable')
+    values, movie_revenues = feature_values[valid][order], revenues[valid][order]
+    #Same resamples as sweep_feature: n_bootstrap draws of the (sorted) movie indices
+    draws = np.random.default_rng(42).integers(0, len(values), size=(n_bootstrap, len(values)))
+
+    for row, quantile in zip(sweep_df.itertuples(), quantiles):
+        threshold = np.quantile(values, quantile)
+        treatment = values > threshold
+        assert row.Threshold == threshold
+        assert row.N_Treatment == treatment.sum()
+        assert np.isclose(row.Mean_Treatment, movie_revenues[treatment].mean())
+        assert np.isclose(row.Mean_Control, movie_revenues[~treatment].mean())
+
+        differences = [movie_revenues[draw][treatment[draw]].mean() - movie_revenues[draw][~treatment[draw]].mean() for draw in draws]
+        ci_lower, ci_upper = np.percentile(differences, [2.5, 97.5])
+        assert np.isclose(row.CI_Lower, ci_lower)
+        assert np.isclose(row.CI_Upper, ci_upper)
+
+
+def test_sweep_without_valid_rows_is_all_nan():
+    sweep_df = sweep_feature([np.nan, 1.0], [5.0, np.nan], quantiles=[0.5], n_bootstrap=10, seed=0)
+
+    assert len(sweep_df) == 1
+    assert sweep_df[['Threshold', 'Mean_Difference', 'CI_Lower', 'CI_Upper']].isna().all().all()
+    assert sweep_df[['N_Treatment', 'N_Control']].eq(0).all().all()
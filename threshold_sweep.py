@@ -0,0 +1,169 @@
+"""
+Vectorized treatment/control threshold sweep over the music features, for the analysis of movie success.
+
+For a feature and a threshold, the treatment group contains the movies whose feature value is above the
+threshold and the control group the other movies. The sweep evaluates the difference in mean box office
+revenue between the groups (with a bootstrap confidence interval) for a whole grid of quantile thresholds
+at once: each feature is sorted once, the group means of all the thresholds are read off cumulative sums,
+and the bootstrap resamples are drawn as batches of resampling counts over the sorted movies.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILES = np.linspace(0.01, 0.99, 100)
+
+#Maximum number of entries of a (resamples x movies) batch of resampling counts
+MAX_BATCH_ENTRIES = 2_000_000
+
+
+def sweep_feature(feature_values, revenues, quantiles=DEFAULT_QUANTILES, n_bootstrap=1000, alpha=0.05, seed=None):
+    """
+    Evaluate the treatment/control difference in mean revenue for every quantile threshold of one feature.
+
+    Parameters:
+    - feature_values (array-like): The feature value of each movie.
+    - revenues (array-like): The box office revenue of each movie.
+    - quantiles (array-like, optional): The quantiles of the feature used as thresholds. Default is DEFAULT_QUANTILES (100 quantiles from 0.01 to 0.99).
+    - n_bootstrap (int, optional): The number of bootstrap resamples. Default is 1000.
+    - alpha (float, optional): The confidence intervals are (1 - alpha) percentile intervals. Default is 0.05.
+    - seed (int or SeedSequence, optional): The seed of the bootstrap. Default is None.
+
+    Returns:
+    - DataFrame: One row per quantile with the threshold, the group sizes and means, the mean difference
+      (treatment - control) and its confidence interval (all NaN, with empty groups, if no movie has both values).
+    """
+    feature_values = np.asarray(feature_values, dtype=np.float64)
+    revenues = np.asarray(revenues, dtype=np.float64)
+
+    valid = np.isfinite(feature_values) & np.isfinite(revenues)
+    feature_values, revenues = feature_values[valid], revenues[valid]
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+
+    if not valid.any():
+        nan = np.full(len(quantiles), np.nan)
+        zero = np.zeros(len(quantiles), dtype=np.int64)
+        return pd.DataFrame({'Quantile': quantiles, 'Threshold': nan, 'N_Treatment': zero, 'N_Control': zero,
+                             'Mean_Treatment': nan, 'Mean_Control': nan, 'Mean_Difference': nan,
+                             'CI_Lower': nan, 'CI_Upper': nan})
+
+    #Sort the movies once by feature value: the control group of any threshold is then a prefix of the sorted movies
+    order = np.argsort(feature_values, kind='stable')
+    sorted_values = feature_values[order]
+    sorted_revenues = revenues[order]
+    n_movies = len(sorted_values)
+
+    thresholds = np.quantile(sorted_values, quantiles)
+    n_control = np.searchsorted(sorted_values, thresholds, side='right')
+
+    revenue_cumsum = np.concatenate(([0.], np.cumsum(sorted_revenues)))
+    mean_control, mean_treatment = group_means(revenue_cumsum[n_control], n_control, revenue_cumsum[-1], n_movies)
+
+    #Bootstrap: a resample is represented by the number of times each (sorted) movie is drawn
+    rng = np.random.default_rng(seed)
+    batch_size = max(1, min(n_bootstrap, MAX_BATCH_ENTRIES // max(n_movies, 1)))
+    bootstrap_differences = []
+
+    for start in range(0, n_bootstrap, batch_size):
+        n_resamples = min(batch_size, n_bootstrap - start)
+        draws = rng.integers(0, n_movies, size=(n_resamples, n_movies))
+        draws += (np.arange(n_resamples) * n_movies)[:, None]
+        counts = np.bincount(draws.ravel(), minlength=n_resamples * n_movies).reshape(n_resamples, n_movies)
+
+        count_cumsum = np.zeros((n_resamples, n_movies + 1))
+        np.cumsum(counts, axis=1, dtype=np.float64, out=count_cumsum[:, 1:])
+        weighted_cumsum = np.zeros((n_resamples, n_movies + 1))
+        np.cumsum(counts * sorted_revenues, axis=1, out=weighted_cumsum[:, 1:])
+
+        resample_control, resample_treatment = group_means(weighted_cumsum[:, n_control], count_cumsum[:, n_control],
+                                                           weighted_cumsum[:, -1:], count_cumsum[:, -1:])
+        bootstrap_differences.append(resample_treatment - resample_control)
+
+    bootstrap_differences = np.concatenate(bootstrap_differences)
+    ci_lower, ci_upper = np.nanpercentile(bootstrap_differences, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+
+    return pd.DataFrame({'Quantile': quantiles,
+                         'Threshold': thresholds,
+                         'N_Treatment': n_movies - n_control,
+                         'N_Control': n_control,
+                         'Mean_Treatment': mean_treatment,
+                         'Mean_Control': mean_control,
+                         'Mean_Difference': mean_treatment - mean_control,
+                         'CI_Lower': ci_lower,
+                         'CI_Upper': ci_upper})
+
+
+def group_means(control_sums, control_counts, total_sums, total_counts):
+    """
+    Compute the control and treatment means from the control sums and counts and the totals (NaN for empty groups).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_control = control_sums / control_counts
+        mean_treatment = (total_sums - control_sums) / (total_counts - control_counts)
+
+    return mean_control, mean_treatment
+
+
+def sweep_features_job(args):
+    """
+    Run sweep_feature for one feature (unpacks the arguments sent to a worker process).
+    """
+    feature, feature_values, revenues, quantiles, n_bootstrap, alpha, seed = args
+
+    sweep_df = sweep_feature(feature_values, revenues, quantiles, n_bootstrap, alpha, seed)
+    sweep_df.insert(0, 'Feature', feature)
+
+    return sweep_df
+
+
+def sweep_features(movie_df, features, revenue='Movie_Box_Office_Revenue', quantiles=DEFAULT_QUANTILES, n_bootstrap=1000, alpha=0.05, seed=0, n_jobs=None):
+    """
+    Run the threshold sweep for several features, in parallel across processes.
+
+    Parameters:
+    - movie_df (DataFrame): One row per movie with the features and the revenue.
+    - features (list of str): The feature columns to sweep.
+    - revenue (str, optional): The revenue column. Default is 'Movie_Box_Office_Revenue'.
+    - quantiles (array-like, optional): The quantiles of each feature used as thresholds. Default is DEFAULT_QUANTILES.
+    - n_bootstrap (int, optional): The number of bootstrap resamples. Default is 1000.
+    - alpha (float, optional): The confidence intervals are (1 - alpha) percentile intervals. Default is 0.05.
+    - seed (int, optional): The seed of the bootstrap (each feature gets an independent stream). Default is 0.
+    - n_jobs (int, optional): The number of worker processes. Default is None (number of CPUs); 1 runs in the current process.
+
+    Returns:
+    - DataFrame: The concatenated outputs of sweep_feature, with a Feature column.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(features))
+    revenues = movie_df[revenue].to_numpy(np.float64)
+
+    jobs = [(feature, movie_df[feature].to_numpy(np.float64), revenues, quantiles, n_bootstrap, alpha, feature_seed)
+            for feature, feature_seed in zip(features, seeds)]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(jobs))
+
+    if n_jobs <= 1:
+        sweep_dfs = [sweep_features_job(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            sweep_dfs = list(executor.map(sweep_features_job, jobs))
+
+    return pd.concat(sweep_dfs, ignore_index=True)
+
+
+def best_thresholds(sweep_df):
+    """
+    Select, for each feature, the threshold with the largest mean difference whose confidence interval is positive.
+
+    Parameters:
+    - sweep_df (DataFrame): The output of sweep_features.
+
+    Returns:
+    - DataFrame: One row per feature which has at least one threshold with a positive confidence interval.
+    """
+    positive_sweep_df = sweep_df[sweep_df['CI_Lower'] > 0]
+
+    best_idx = positive_sweep_df.groupby('Feature', sort=False)['Mean_Difference'].idxmax()
+
+    return positive_sweep_df.loc[best_idx].reset_index(drop=True)